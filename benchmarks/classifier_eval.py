@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Accuracy and latency evaluation of message classification.
+
+Compares the local nearest-neighbour classifier, the hybrid (local with LLM
+fallback below the margin threshold) and the LLM classifier on a labelled set
+of {"message", "label"} JSONL records. Each message is classified in a fresh
+session, so the LLM sees the same empty context as a first turn.
+
+Usage:
+  python -m benchmarks.classifier_eval --threshold 0.3
+"""
+
+import argparse
+import time
+import uuid
+from collections import defaultdict
+
+from benchmarks.common import latency_summary, load_jsonl, write_report
+from server.session_manager import session_manager
+
+DEFAULT_EVAL_SET = "benchmarks/fixtures/classification_eval.jsonl"
+
+
+def evaluate(records, threshold):
+    rows = []
+    for record in records:
+        message = record["message"]
+        session_id = f"classifier-eval-{uuid.uuid4()}"
+
+        started = time.perf_counter()
+        local_label, margin = session_manager.message_classifier.classify(message)
+        local_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        llm_label = session_manager.classify_message_with_llm(message, session_id)
+        llm_ms = (time.perf_counter() - started) * 1000
+        session_manager.clear_session(session_id)
+
+        used_local = margin >= threshold
+        rows.append(
+            {
+                "message": message,
+                "label": record["label"],
+                "local": local_label,
+                "margin": round(margin, 4),
+                "llm": llm_label,
+                "hybrid": local_label if used_local else llm_label,
+                "used_local": used_local,
+                "local_ms": local_ms,
+                "llm_ms": llm_ms,
+                "hybrid_ms": local_ms if used_local else local_ms + llm_ms,
+            }
+        )
+    return rows
+
+
+def accuracy(rows, key):
+    return round(sum(row[key] == row["label"] for row in rows) / len(rows), 4)
+
+
+def per_label_accuracy(rows, key):
+    totals, correct = defaultdict(int), defaultdict(int)
+    for row in rows:
+        totals[row["label"]] += 1
+        correct[row["label"]] += row[key] == row["label"]
+    return {label: round(correct[label] / totals[label], 4) for label in totals}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate message classifiers")
+    parser.add_argument("--eval-set", default=DEFAULT_EVAL_SET)
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--output", default="benchmarks/results/classifier_eval.json")
+    args = parser.parse_args()
+
+    from server.config import CLASSIFIER_MARGIN_THRESHOLD
+
+    threshold = CLASSIFIER_MARGIN_THRESHOLD if args.threshold is None else args.threshold
+    records = load_jsonl(args.eval_set)
+
+    # Embed the exemplar bank before timing anything
+    session_manager.message_classifier.classify("warm up")
+
+    print(f"🔍 Classifying {len(records)} labelled messages (threshold={threshold})")
+    rows = evaluate(records, threshold)
+
+    report = {
+        "config": {"eval_set": args.eval_set, "threshold": threshold},
+        "accuracy": {
+            "local": accuracy(rows, "local"),
+            "hybrid": accuracy(rows, "hybrid"),
+            "llm": accuracy(rows, "llm"),
+        },
+        "per_label_accuracy": {
+            "local": per_label_accuracy(rows, "local"),
+            "hybrid": per_label_accuracy(rows, "hybrid"),
+            "llm": per_label_accuracy(rows, "llm"),
+        },
+        "local_share": round(sum(row["used_local"] for row in rows) / len(rows), 4),
+        "latency": {
+            "local": latency_summary(row["local_ms"] for row in rows),
+            "hybrid": latency_summary(row["hybrid_ms"] for row in rows),
+            "llm": latency_summary(row["llm_ms"] for row in rows),
+        },
+        "misclassified_hybrid": [
+            {key: row[key] for key in ("message", "label", "hybrid", "margin")}
+            for row in rows
+            if row["hybrid"] != row["label"]
+        ],
+    }
+
+    print(f"\n{'Classifier':<10}{'accuracy':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name in ("local", "hybrid", "llm"):
+        latency = report["latency"][name]
+        print(
+            f"{name:<10}{report['accuracy'][name]:>10.2%}"
+            f"{latency['p50_ms']:>10}{latency['p95_ms']:>10}"
+        )
+    print(f"Served locally without an LLM call: {report['local_share']:.0%}")
+    write_report(args.output, report)
+
+
+if __name__ == "__main__":
+    main()
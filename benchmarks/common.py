@@ -0,0 +1,68 @@
+"""
+Shared helpers for the benchmark scripts: JSONL loading, latency statistics,
+JSON report writing and reading labelled metrics.
+"""
+
+import json
+import os
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+
+def load_jsonl(path: str, limit: Optional[int] = None) -> List[Dict]:
+    """Read a JSONL file into a list of dicts, skipping blank lines"""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+                if limit and len(records) >= limit:
+                    break
+    return records
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile (pct in 0-100) of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def latency_summary(latencies_ms: Iterable[float]) -> Dict:
+    """Count, mean and p50/p95/p99 of a series of latencies in milliseconds"""
+    values = list(latencies_ms)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50), 2),
+        "p95_ms": round(percentile(values, 95), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+    }
+
+
+METRIC_KEY = re.compile(r"^(?P<name>[\w.]+)\{(?P<labels>.*)\}$")
+
+
+def labelled_metrics(entries: Dict, name: str):
+    """Yield (labels, value) for every labelled entry of a metric in a metrics snapshot"""
+    for key, value in entries.items():
+        match = METRIC_KEY.match(key)
+        if match and match.group("name") == name:
+            labels = dict(item.split("=", 1) for item in match.group("labels").split(","))
+            yield labels, value
+
+
+def write_report(path: str, report: Dict):
+    """Write a benchmark report as pretty-printed JSON, stamping the run time"""
+    report.setdefault("generated_at", datetime.now().isoformat(timespec="seconds"))
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"📄 Report written to {path}")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Throughput of query embeddings with and without the micro-batcher.
+
+At each concurrency level, worker threads embed distinct query texts,
+first one call per query and then through MicroBatchingEmbeddings. Reports
+throughput, per-query latency and the number of embedding API calls made.
+
+Give the mock embedding endpoint a fixed per-call overhead (and optionally a
+small per-input cost), with small vectors so that serialising them does not
+dominate, e.g.:
+  python -m benchmarks.mock_services --port 8100 --embedding-latency-ms 50 \
+      --embedding-input-latency-ms 0.2 --dimensions 256
+  python -m benchmarks.embedding_batch_bench --concurrency 1 10 100
+"""
+
+import argparse
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import latency_summary, write_report
+from server.config import EMBEDDING_DIMENSIONS, EMBEDDING_MODEL
+from server.embeddings import MicroBatchingEmbeddings
+from server.llm_clients import create_embeddings
+from server.metrics import metrics
+
+
+def batch_calls():
+    return metrics.snapshot()["histograms"].get("embeddings.batch_size", {}).get("count", 0)
+
+
+def run(embeddings, concurrency, queries_per_worker, batched):
+    run_id = uuid.uuid4().hex[:8]
+
+    def worker(w):
+        latencies = []
+        for q in range(queries_per_worker):
+            text = f"I keep worrying about work and can't sleep ({run_id} {w} {q})"
+            started = time.perf_counter()
+            embeddings.embed_query(text)
+            latencies.append((time.perf_counter() - started) * 1000)
+        return latencies
+
+    calls_before = batch_calls()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = [ms for result in pool.map(worker, range(concurrency)) for ms in result]
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "mode": "batched" if batched else "single",
+        "queries": len(latencies),
+        "api_calls": batch_calls() - calls_before if batched else len(latencies),
+        "throughput_qps": round(len(latencies) / elapsed, 1),
+        "latency": latency_summary(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the query embedding micro-batcher")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--queries-per-worker", type=int, default=10)
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--output", default="benchmarks/results/embedding_batch_bench.json")
+    args = parser.parse_args()
+
+    client = create_embeddings(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS)
+    batcher = MicroBatchingEmbeddings(client, args.window_ms / 1000.0, args.max_batch)
+    # Warm up the connection pool so the first level is not charged for it
+    client.embed_query("warm up")
+
+    rows = []
+    for concurrency in args.concurrency:
+        print(f"🧮 {concurrency} concurrent workers x {args.queries_per_worker} queries")
+        rows.append(run(client, concurrency, args.queries_per_worker, batched=False))
+        rows.append(run(batcher, concurrency, args.queries_per_worker, batched=True))
+
+    print(f"\n{'Workers':>8}{'mode':>9}{'calls':>8}{'q/s':>9}{'p50 ms':>9}{'p95 ms':>9}")
+    for row in rows:
+        print(
+            f"{row['concurrency']:>8}{row['mode']:>9}{row['api_calls']:>8}{row['throughput_qps']:>9}"
+            f"{row['latency']['p50_ms']:>9}{row['latency']['p95_ms']:>9}"
+        )
+    write_report(args.output, {"config": vars(args), "runs": rows})
+
+
+if __name__ == "__main__":
+    main()
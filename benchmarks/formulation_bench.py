@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Per-turn cost of the assessment step: full reassessment vs. incremental formulation.
+
+Runs long therapeutic sessions built from the counseling fixture in-process,
+once with CLINICAL_FORMULATION=full and once with incremental (each mode in
+its own subprocess, since the mode is read at import). For each mode it
+reports, per therapeutic turn: prompt and completion tokens of the
+assessment step, its latency, tokens of the technique and response stages
+that consume it, and the overall turn latency.
+
+Start the mock with per-token latencies so output and prompt sizes show up in
+latency, e.g.:
+  python -m benchmarks.mock_services --port 8100 --chat-latency-ms 150 \\
+      --output-token-latency-ms 4 --prompt-token-latency-ms 0.2
+  python -m benchmarks.formulation_bench --sessions 3 --turns 10
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+
+from benchmarks.common import labelled_metrics, latency_summary, load_jsonl, write_report
+
+DEFAULT_FIXTURE = "benchmarks/fixtures/counseling_conversations.jsonl"
+MODES = ("full", "incremental")
+# LLM stages that make up the assessment step in either mode
+ASSESSMENT_STAGES = ("assessment", "formulation")
+
+
+def run_mode(fixture, sessions, turns, output_path):
+    """Child process: run the sessions under the mode set in the environment"""
+    from server.chat_model import ChatRequest
+    from server.metrics import metrics
+    from server.pipeline import background_executor, process_chat_turn
+    from server.session_manager import session_manager
+
+    messages = [record["Context"] for record in load_jsonl(fixture)]
+    turn_ms = []
+    therapeutic_turns = 0
+    for s in range(sessions):
+        session_id = f"formulation-{s}-{uuid.uuid4().hex[:8]}"
+        for t in range(turns):
+            message = messages[(s * turns + t) % len(messages)]
+            started = time.perf_counter()
+            response = process_chat_turn(ChatRequest(message=message, session_id=session_id))
+            if response.classification == "THERAPEUTIC":
+                therapeutic_turns += 1
+                turn_ms.append((time.perf_counter() - started) * 1000)
+        session_manager.clear_session(session_id)
+    background_executor.shutdown(wait=True)
+
+    stages = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+    for labels, value in labelled_metrics(metrics.counters, "llm.calls"):
+        stages[labels["stage"]]["calls"] += int(value)
+    for labels, value in labelled_metrics(metrics.counters, "llm.tokens"):
+        if labels["kind"] in ("prompt", "completion"):
+            stages[labels["stage"]][f"{labels['kind']}_tokens"] += int(value)
+    histograms = metrics.snapshot()["histograms"]
+    assessment_seconds = histograms.get("pipeline.stage_seconds{stage=assessment}", {})
+    updates = {
+        labels["result"]: int(value)
+        for labels, value in labelled_metrics(metrics.counters, "formulation.updates")
+    }
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "therapeutic_turns": therapeutic_turns,
+                "turn_ms": turn_ms,
+                "stages": stages,
+                "assessment_seconds": assessment_seconds,
+                "formulation_updates": updates,
+            },
+            f,
+        )
+
+
+def per_turn(value, turns):
+    return round(value / max(turns, 1), 1)
+
+
+def summarise(mode, result):
+    turns = result["therapeutic_turns"]
+    stages = result["stages"]
+    step = [stages[stage] for stage in ASSESSMENT_STAGES if stage in stages]
+    assessment_seconds = result["assessment_seconds"]
+    return {
+        "mode": mode,
+        "therapeutic_turns": turns,
+        "assessment_prompt_tokens_per_turn": per_turn(sum(s["prompt_tokens"] for s in step), turns),
+        "assessment_completion_tokens_per_turn": per_turn(
+            sum(s["completion_tokens"] for s in step), turns
+        ),
+        "assessment_ms": {
+            "mean": round(
+                assessment_seconds.get("sum", 0) / max(assessment_seconds.get("count", 0), 1) * 1000, 1
+            ),
+            "p50": round(assessment_seconds.get("p50", 0) * 1000, 1),
+            "p95": round(assessment_seconds.get("p95", 0) * 1000, 1),
+        },
+        "downstream_tokens_per_turn": {
+            stage: per_turn(stages[stage]["prompt_tokens"] + stages[stage]["completion_tokens"], turns)
+            for stage in ("technique", "response")
+            if stage in stages
+        },
+        "turn_latency": latency_summary(result["turn_ms"]),
+        "formulation_updates": result["formulation_updates"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full assessment with incremental formulation")
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--turns", type=int, default=10, help="Therapeutic messages per session")
+    parser.add_argument("--output", default="benchmarks/results/formulation_bench.json")
+    parser.add_argument("--run-mode-output", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode_output:
+        run_mode(args.fixture, args.sessions, args.turns, args.run_mode_output)
+        return
+
+    rows = []
+    for mode in MODES:
+        print(f"🩺 Running {args.sessions} sessions of {args.turns} turns with CLINICAL_FORMULATION={mode}...")
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+            result_path = tmp.name
+        completed = subprocess.run(
+            [
+                sys.executable, "-m", "benchmarks.formulation_bench",
+                "--fixture", args.fixture,
+                "--sessions", str(args.sessions),
+                "--turns", str(args.turns),
+                "--run-mode-output", result_path,
+            ],
+            env={**os.environ, "CLINICAL_FORMULATION": mode},
+            stdout=subprocess.DEVNULL,
+        )
+        if completed.returncode != 0:
+            print(f"❌ Mode '{mode}' failed (exit {completed.returncode})")
+            sys.exit(1)
+        with open(result_path, encoding="utf-8") as f:
+            rows.append(summarise(mode, json.load(f)))
+        os.remove(result_path)
+
+    print(
+        f"\n{'Mode':<13}{'turns':>7}{'step in':>9}{'step out':>10}{'step ms':>9}"
+        f"{'technique':>11}{'response':>10}{'turn p50':>10}{'turn p95':>10}"
+    )
+    for row in rows:
+        downstream, latency = row["downstream_tokens_per_turn"], row["turn_latency"]
+        print(
+            f"{row['mode']:<13}{row['therapeutic_turns']:>7}"
+            f"{row['assessment_prompt_tokens_per_turn']:>9}{row['assessment_completion_tokens_per_turn']:>10}"
+            f"{row['assessment_ms']['mean']:>9}{downstream.get('technique', 0):>11}"
+            f"{downstream.get('response', 0):>10}{latency['p50_ms']:>10}{latency['p95_ms']:>10}"
+        )
+    print("(tokens per therapeutic turn; step = assessment step, mean ms)")
+
+    full, incremental = rows
+    report = {
+        "config": vars(args),
+        "modes": rows,
+        "assessment_tokens_saved_per_turn": round(
+            full["assessment_prompt_tokens_per_turn"]
+            + full["assessment_completion_tokens_per_turn"]
+            - incremental["assessment_prompt_tokens_per_turn"]
+            - incremental["assessment_completion_tokens_per_turn"],
+            1,
+        ),
+        "assessment_ms_saved_per_turn": round(
+            full["assessment_ms"]["mean"] - incremental["assessment_ms"]["mean"], 1
+        ),
+    }
+    print(
+        f"\nIncremental formulation saves {report['assessment_tokens_saved_per_turn']} tokens "
+        f"and {report['assessment_ms_saved_per_turn']} ms per therapeutic turn in the assessment step"
+    )
+    write_report(args.output, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Duplicate-turn check for idempotency keys.
+
+Against a running server, posts the same message several times at once with
+one Idempotency-Key and checks that the turn ran once: every copy gets the
+same reply, exactly one is not marked Idempotent-Replayed and the session
+history grows by one exchange. Also checks replay after completion and the
+422 for a key reused with a different message, then compares LLM calls
+against the same duplicates sent without a key. Exits non-zero on failure.
+
+  python -m benchmarks.mock_services --port 8100 --chat-latency-ms 200
+  uvicorn server.main:app --port 8000   (with the offline env from the README)
+  python -m benchmarks.idempotency_check --duplicates 5
+"""
+
+import argparse
+import asyncio
+import sys
+import uuid
+
+import httpx
+
+from benchmarks.common import labelled_metrics, write_report
+
+MESSAGE = "I've been feeling anxious every morning before work and I can't shake it."
+
+
+def llm_calls(metrics_snapshot):
+    return sum(value for _, value in labelled_metrics(metrics_snapshot["counters"], "llm.calls"))
+
+
+async def post_duplicates(client, session_id, count, key):
+    headers = {"Idempotency-Key": key} if key else {}
+    return await asyncio.gather(
+        *[
+            client.post(
+                "/chat", json={"message": MESSAGE, "session_id": session_id}, headers=headers
+            )
+            for _ in range(count)
+        ]
+    )
+
+
+async def message_count(client, session_id):
+    return (await client.get(f"/sessions/{session_id}")).json()["message_count"]
+
+
+async def run_batch(client, count, keyed):
+    """Send `count` copies of a turn to a fresh session; return (responses, key, session, LLM calls)"""
+    session_id = f"idem-{uuid.uuid4().hex[:8]}"
+    # A greeting first, so the duplicated message is a therapeutic turn
+    await client.post("/chat", json={"message": "Hi doctor", "session_id": session_id})
+    before = llm_calls((await client.get("/metrics")).json())
+    key = str(uuid.uuid4()) if keyed else None
+    responses = await post_duplicates(client, session_id, count, key)
+    after = llm_calls((await client.get("/metrics")).json())
+    return responses, key, session_id, after - before
+
+
+async def check(args):
+    failures = []
+    async with httpx.AsyncClient(base_url=args.api_url, timeout=120) as client:
+        responses, key, session_id, keyed_calls = await run_batch(client, args.duplicates, True)
+        statuses = [r.status_code for r in responses]
+        if statuses != [200] * args.duplicates:
+            failures.append(f"duplicate statuses {statuses}")
+        texts = {r.json()["response"] for r in responses if r.status_code == 200}
+        if len(texts) != 1:
+            failures.append(f"{len(texts)} distinct replies to one keyed message")
+        originals = sum(1 for r in responses if "idempotent-replayed" not in r.headers)
+        if originals != 1:
+            failures.append(f"{originals} responses computed instead of 1")
+        # Greeting exchange plus one keyed exchange
+        if await message_count(client, session_id) != 4:
+            failures.append("session history did not grow by exactly one exchange")
+
+        replay = await client.post(
+            "/chat",
+            json={"message": MESSAGE, "session_id": session_id},
+            headers={"Idempotency-Key": key},
+        )
+        if replay.headers.get("idempotent-replayed") != "true" or replay.json()["response"] not in texts:
+            failures.append("completed turn was not replayed")
+
+        conflict = await client.post(
+            "/chat",
+            json={"message": "Something else entirely", "session_id": session_id},
+            headers={"Idempotency-Key": key},
+        )
+        if conflict.status_code != 422:
+            failures.append(f"key reuse with a different message returned {conflict.status_code}")
+
+        _, _, unkeyed_session, unkeyed_calls = await run_batch(client, args.duplicates, False)
+        unkeyed_messages = await message_count(client, unkeyed_session)
+
+    report = {
+        "config": vars(args),
+        "llm_calls_with_key": keyed_calls,
+        "llm_calls_without_key": unkeyed_calls,
+        "history_messages_without_key": unkeyed_messages,
+        "failures": failures,
+    }
+    print(
+        f"\n{args.duplicates} duplicate posts: {keyed_calls:g} LLM calls with a key, "
+        f"{unkeyed_calls:g} without (history {unkeyed_messages} messages instead of 4)"
+    )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check duplicate suppression with idempotency keys")
+    parser.add_argument("--api-url", default="http://localhost:8000")
+    parser.add_argument("--duplicates", type=int, default=5)
+    parser.add_argument("--output", default="benchmarks/results/idempotency_check.json")
+    args = parser.parse_args()
+
+    print(f"🔁 Posting {args.duplicates} copies of one turn with and without an Idempotency-Key")
+    report = asyncio.run(check(args))
+    write_report(args.output, report)
+    if report["failures"]:
+        for failure in report["failures"]:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ Duplicates were answered from a single turn")
+
+
+if __name__ == "__main__":
+    main()
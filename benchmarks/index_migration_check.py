@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+End-to-end check of `manage_indexes.py migrate` on the local stand-in store.
+
+Seeds a source index with the counseling fixture embedded by the current
+model, then migrates it to a new model/dimension (re-embedding in batches),
+and checks that:
+  - the new index holds every record at the new dimension,
+  - recall@k against the source index meets the threshold and the active
+    index pointer was switched,
+  - a migration held to an unreachable recall is refused and leaves the
+    pointer alone,
+  - rollback restores the previous index.
+Exits non-zero on any failure.
+
+Needs an embeddings endpoint that honours "dimensions", e.g. the mock:
+  python -m benchmarks.mock_services --port 8100
+  OPENAI_BASE_URL=http://127.0.0.1:8100/v1 python -m benchmarks.index_migration_check
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import load_jsonl, write_report
+from manage_indexes import LocalIndexStore, read_active_index
+from server.llm_clients import create_embeddings
+
+DEFAULT_FIXTURE = "benchmarks/fixtures/counseling_conversations.jsonl"
+SOURCE_INDEX = "therapy-simulator"
+
+
+def seed_source(store, records, model):
+    embeddings = create_embeddings(model)
+    texts = [f"Client: {r['Context']}\nTherapist: {r['Response']}" for r in records]
+    vectors = embeddings.embed_documents(texts)
+    store.create(SOURCE_INDEX, len(vectors[0]))
+    store.upsert(
+        SOURCE_INDEX,
+        [
+            (
+                f"conversation-{i}",
+                vector,
+                {"text": text, "client_message": r["Context"], "therapist_response": r["Response"]},
+            )
+            for i, (r, text, vector) in enumerate(zip(records, texts, vectors))
+        ],
+    )
+    return len(vectors[0])
+
+
+def run_migration(store_dir, pointer, target, args, min_recall, source=None):
+    """Run the migrate command; without a source it migrates from the index the pointer names"""
+    source_args = ["--source", source, "--source-model", args.source_model] if source else []
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [
+            sys.executable, "manage_indexes.py", "migrate", target,
+            *source_args,
+            "--model", args.model,
+            "--dimensions", str(args.dimensions),
+            "--batch-size", str(args.batch_size),
+            "-k", str(args.k),
+            "--min-recall", str(min_recall),
+            "--settle-seconds", "0",
+            "--local-store", store_dir,
+            "--pointer", pointer,
+        ],
+        env={**os.environ, "ACTIVE_INDEX_PATH": pointer},
+        capture_output=True,
+        text=True,
+    )
+    print(completed.stdout.rstrip())
+    if completed.stderr.strip():
+        print(completed.stderr.rstrip())
+    return completed.returncode, completed.stdout, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the blue/green index migration on a local store")
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+    parser.add_argument("--source-model", default="text-embedding-ada-002")
+    parser.add_argument("--model", default="text-embedding-3-small")
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--min-recall", type=float, default=0.5)
+    parser.add_argument("--output", default="benchmarks/results/index_migration_check.json")
+    args = parser.parse_args()
+
+    records = load_jsonl(args.fixture)
+    failures = []
+    with tempfile.TemporaryDirectory() as store_dir:
+        pointer = os.path.join(store_dir, "active_index.json")
+        store = LocalIndexStore(store_dir)
+        source_dimension = seed_source(store, records, args.source_model)
+        print(f"🗂️ Seeded '{SOURCE_INDEX}' with {len(records)} records ({source_dimension} dims)\n")
+
+        target = f"{SOURCE_INDEX}-{args.dimensions}"
+        code, output, seconds = run_migration(
+            store_dir, pointer, target, args, args.min_recall, source=SOURCE_INDEX
+        )
+        active = read_active_index(pointer)
+        if code != 0:
+            failures.append(f"migration exited {code}")
+        if not store.exists(target) or store.count(target) != len(records):
+            failures.append(f"'{target}' does not hold all {len(records)} records")
+        elif store.dimension(target) != args.dimensions:
+            failures.append(f"'{target}' has {store.dimension(target)} dims, expected {args.dimensions}")
+        if not active or active["index_name"] != target:
+            failures.append("active index pointer was not switched to the new index")
+        recall = active.get("recall_at_k") if active else None
+
+        # A second migration, from the now active index, held to a recall it cannot reach
+        print()
+        refused_target = f"{SOURCE_INDEX}-refused"
+        code, output, _ = run_migration(store_dir, pointer, refused_target, args, 1.01)
+        if code == 0 or "Recall below" not in output:
+            failures.append("migration below the recall threshold was not refused")
+        if read_active_index(pointer) != active:
+            failures.append("refused migration changed the active index pointer")
+
+        rollback = subprocess.run(
+            [sys.executable, "manage_indexes.py", "rollback", pointer],
+            env={**os.environ, "ACTIVE_INDEX_PATH": pointer},
+            capture_output=True,
+            text=True,
+        )
+        print(rollback.stdout.rstrip())
+        restored = read_active_index(pointer)
+        if rollback.returncode != 0 or not restored or restored["index_name"] != SOURCE_INDEX:
+            failures.append("rollback did not restore the source index")
+
+    report = {
+        "config": vars(args),
+        "records": len(records),
+        "source_dimension": source_dimension,
+        "target_dimension": args.dimensions,
+        f"recall_at_{args.k}": recall,
+        "migration_seconds": round(seconds, 2),
+        "failures": failures,
+    }
+    print(
+        f"\nMigrated {len(records)} records {source_dimension} -> {args.dimensions} dims "
+        f"in {seconds:.2f}s, recall@{args.k} {recall}"
+    )
+    write_report(args.output, report)
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ Migration validated recall, switched the pointer, refused a failing run and rolled back")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Load test for the /chat API.
+
+Replays multi-turn conversations against a running server at a configurable
+concurrency and conversation arrival rate, then reports p50/p95/p99 latency per
+classification path, throughput and error rate. Results are saved as JSON and
+can be compared against a previous run.
+
+Conversations are built from records in the
+'Amod/mental_health_counseling_conversations' format ('Context'/'Response'),
+either from the HuggingFace dataset or a local JSONL fixture. A fixture line may
+instead hold an explicit {"turns": [...]} list of user messages.
+
+Offline run (local stand-ins for OpenAI and Pinecone):
+  python -m benchmarks.mock_services --port 8100
+  OPENAI_BASE_URL=http://127.0.0.1:8100/v1 VECTOR_STORE_BACKEND=memory \\
+      VECTOR_STORE_SEED_PATH=benchmarks/fixtures/counseling_conversations.jsonl \\
+      uvicorn server.main:app --port 8000
+  python -m benchmarks.load_test --conversations 20 --concurrency 8 --rate 2
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import latency_summary, load_jsonl, write_report
+
+DEFAULT_FIXTURE = "benchmarks/fixtures/counseling_conversations.jsonl"
+
+OPENERS = ["Hi doctor", "Hello, nice to meet you", "Hey, good morning"]
+PROCEDURAL_TURNS = ["How does this work?", "Should we start?", "What do we do now?"]
+SMALL_TALK_TURNS = [
+    "The weather has been lovely this week.",
+    "Any plans for the weekend?",
+    "I am doing great, how are you doing?",
+]
+CLOSERS = [
+    "Thanks for today, see you next week.",
+    "That's all for today, have a good day doc.",
+    "I think I feel ok now, bye.",
+]
+
+
+def load_records(args) -> List[Dict]:
+    """Load counseling records from a local fixture or the HuggingFace dataset"""
+    if args.dataset:
+        from datasets import load_dataset
+
+        dataset = load_dataset(args.dataset, split="train")
+        dataset = dataset.select(range(min(args.limit, len(dataset))))
+        return [dict(item) for item in dataset]
+    return load_jsonl(args.fixture, limit=args.limit)
+
+
+def build_conversations(
+    records: List[Dict], count: int, therapeutic_turns: int, rng: random.Random
+) -> List[List[str]]:
+    """Assemble scripted multi-turn conversations from counseling records"""
+    scripted = [record["turns"] for record in records if record.get("turns")]
+    contexts = [record["Context"] for record in records if record.get("Context")]
+
+    conversations = []
+    for i in range(count):
+        if scripted and (not contexts or i % 2 == 0):
+            conversations.append(list(scripted[i % len(scripted)]))
+            continue
+
+        turns = [rng.choice(OPENERS)]
+        if rng.random() < 0.5:
+            turns.append(rng.choice(PROCEDURAL_TURNS))
+        turns.extend(rng.sample(contexts, min(therapeutic_turns, len(contexts))))
+        if rng.random() < 0.5:
+            turns.append(rng.choice(SMALL_TALK_TURNS))
+        turns.append(rng.choice(CLOSERS))
+        conversations.append(turns)
+
+    return conversations
+
+
+async def run_conversation(
+    client: httpx.AsyncClient,
+    url: str,
+    turns: List[str],
+    semaphore: asyncio.Semaphore,
+    results: List[Dict],
+    timeout: float,
+):
+    """Send a conversation's turns in order, recording one result per request"""
+    session_id = f"loadtest-{uuid.uuid4()}"
+    for message in turns:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    url,
+                    json={"message": message, "session_id": session_id},
+                    timeout=timeout,
+                )
+                latency_ms = (time.perf_counter() - start) * 1000
+                ok = response.status_code == 200
+                data = response.json() if ok else {}
+                results.append(
+                    {
+                        "path": data.get("classification") or "UNKNOWN",
+                        "latency_ms": latency_ms,
+                        "ok": ok,
+                        "status": str(response.status_code),
+                    }
+                )
+                if data.get("is_session_ended"):
+                    return
+            except httpx.HTTPError as e:
+                results.append(
+                    {
+                        "path": "UNKNOWN",
+                        "latency_ms": (time.perf_counter() - start) * 1000,
+                        "ok": False,
+                        "status": type(e).__name__,
+                    }
+                )
+
+
+async def run_load(args, conversations: List[List[str]]) -> Dict:
+    """Start conversations at the configured arrival rate and gather results"""
+    url = f"{args.url.rstrip('/')}/chat"
+    semaphore = asyncio.Semaphore(args.concurrency)
+    results: List[Dict] = []
+    rng = random.Random(args.seed)
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits) as client:
+        start = time.perf_counter()
+        tasks = []
+        for turns in conversations:
+            tasks.append(
+                asyncio.create_task(
+                    run_conversation(
+                        client, url, turns, semaphore, results, args.timeout
+                    )
+                )
+            )
+            # Poisson arrivals: exponential gaps between conversation starts
+            if args.rate > 0:
+                await asyncio.sleep(rng.expovariate(args.rate))
+        await asyncio.gather(*tasks)
+        duration = time.perf_counter() - start
+
+    return build_report(args, results, duration, len(conversations))
+
+
+def build_report(args, results: List[Dict], duration: float, conversations: int) -> Dict:
+    by_path = defaultdict(list)
+    errors_by_path = defaultdict(int)
+    status_codes = defaultdict(int)
+    for result in results:
+        status_codes[result["status"]] += 1
+        if result["ok"]:
+            by_path[result["path"]].append(result["latency_ms"])
+        else:
+            errors_by_path[result["path"]] += 1
+
+    paths = {}
+    for path in sorted(set(by_path) | set(errors_by_path)):
+        paths[path] = latency_summary(by_path[path])
+        paths[path]["errors"] = errors_by_path[path]
+
+    errors = sum(1 for result in results if not result["ok"])
+    return {
+        "config": {
+            "url": args.url,
+            "conversations": conversations,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "therapeutic_turns": args.therapeutic_turns,
+            "source": args.dataset or args.fixture,
+            "seed": args.seed,
+        },
+        "summary": {
+            "requests": len(results),
+            "errors": errors,
+            "error_rate": round(errors / len(results), 4) if results else 0.0,
+            "duration_s": round(duration, 2),
+            "throughput_rps": round(len(results) / duration, 2) if duration else 0.0,
+            "overall": latency_summary(
+                result["latency_ms"] for result in results if result["ok"]
+            ),
+        },
+        "paths": paths,
+        "status_codes": dict(status_codes),
+    }
+
+
+def print_report(report: Dict, baseline: Dict = None):
+    summary = report["summary"]
+    print("\n📊 Load test results")
+    print(
+        f"   Requests: {summary['requests']}  Errors: {summary['errors']} "
+        f"({summary['error_rate']:.2%})  Throughput: {summary['throughput_rps']} req/s"
+    )
+    print(f"   {'Path':<14}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for path, stats in report["paths"].items():
+        line = (
+            f"   {path:<14}{stats['count']:>7}{stats['p50_ms']:>10}"
+            f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['errors']:>8}"
+        )
+        if baseline and path in baseline.get("paths", {}):
+            delta = stats["p95_ms"] - baseline["paths"][path]["p95_ms"]
+            line += f"   (p95 {delta:+.1f} ms vs baseline)"
+        print(line)
+    if baseline:
+        delta = summary["throughput_rps"] - baseline["summary"]["throughput_rps"]
+        print(f"   Throughput vs baseline: {delta:+.2f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /chat API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+    parser.add_argument(
+        "--dataset",
+        default=None,
+        help="HuggingFace dataset in the counseling format, e.g. Amod/mental_health_counseling_conversations",
+    )
+    parser.add_argument("--limit", type=int, default=300)
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--therapeutic-turns", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=2.0,
+        help="Conversation arrivals per second (0 starts them all at once)",
+    )
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmarks/results/load_test.json")
+    parser.add_argument("--baseline", default=None, help="Previous report to compare with")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    records = load_records(args)
+    conversations = build_conversations(
+        records, args.conversations, args.therapeutic_turns, rng
+    )
+    print(
+        f"🚀 Replaying {len(conversations)} conversations against {args.url} "
+        f"(concurrency={args.concurrency}, rate={args.rate}/s)"
+    )
+
+    report = asyncio.run(run_load(args, conversations))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    write_report(args.output, report)
+
+
+if __name__ == "__main__":
+    main()
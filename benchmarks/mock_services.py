@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI API used by offline benchmarks.
+
+Serves OpenAI-compatible /v1/chat/completions and /v1/embeddings endpoints
+with configurable latency (a fixed part plus per-prompt-token and
+per-output-token parts, or per-input for embeddings) and honour max_tokens,
+stop sequences and streaming.
+Prompt prefixes are cached the way the provider does it (from 1024 tokens, in
+128-token steps) and reported as cached_tokens; cached tokens skip the
+per-prompt-token latency. Classification prompts get a keyword-based label so
+that load tests exercise every pipeline path, formulation delta prompts get a
+small keyword-based JSON reply, and embeddings are deterministic
+hashed bag-of-words vectors so similarity search behaves sensibly. Optional
+RPM/TPM limits are enforced the way the provider quantises them (per second)
+and answered with 429 + retry-after-ms.
+
+Point the server at it with:
+  OPENAI_BASE_URL=http://127.0.0.1:8100/v1 VECTOR_STORE_BACKEND=memory
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import re
+import time
+import uuid
+from collections import deque
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CLASSIFICATION_MARKER = "Respond with ONLY the category name"
+FORMULATION_MARKER = "Return ONLY a JSON object"
+
+SESSION_END_PATTERNS = [
+    "see you",
+    "bye",
+    "that's all",
+    "thanks for today",
+    "good day",
+    "i should go",
+    "ready to end",
+]
+PROCEDURAL_PATTERNS = [
+    "how does this work",
+    "should we start",
+    "what do we do",
+    "how long",
+]
+SMALL_TALK_PATTERNS = ["weather", "weekend", "doing great", "traffic"]
+GREETING_PATTERNS = ["hi", "hello", "hey", "nice to meet", "good morning"]
+
+# Keyword -> formulation item, for the formulation delta stand-in
+FORMULATION_KEYWORDS = {
+    "distortions": {
+        "something bad": "catastrophising",
+        "everyone": "mind reading",
+        "comparing": "unfavourable comparison",
+        "never": "all-or-nothing thinking",
+    },
+    "triggers": {
+        "work": "work",
+        "boss": "boss's criticism",
+        "breakup": "breakup",
+        "friends": "friends' achievements",
+        "morning": "mornings",
+    },
+    "emotions": {
+        "anxious": "anxiety",
+        "worr": "worry",
+        "sad": "sadness",
+        "don't want to": "low mood",
+        "lonely": "loneliness",
+    },
+}
+
+FILLER_SENTENCE = (
+    "It sounds like this has been weighing on you, and it makes sense that you "
+    "feel this way given everything you have described. "
+)
+
+
+def classify_text(message: str) -> str:
+    """Keyword classifier mirroring the categories of SessionManager.classify_message"""
+    text = message.lower()
+    if any(pattern in text for pattern in SESSION_END_PATTERNS):
+        return "SESSION_END"
+    if any(pattern in text for pattern in PROCEDURAL_PATTERNS):
+        return "PROCEDURAL"
+    if any(pattern in text for pattern in SMALL_TALK_PATTERNS):
+        return "SMALL_TALK"
+    words = re.findall(r"[a-z']+", text)
+    if len(words) <= 6 and any(pattern in text for pattern in GREETING_PATTERNS):
+        return "GREETING"
+    return "THERAPEUTIC"
+
+
+def formulation_delta(message: str, previous_reply: str) -> str:
+    """Keyword stand-in for the formulation delta call's JSON reply"""
+    text = message.lower()
+    delta = {
+        field: [item for keyword, item in keywords.items() if keyword in text]
+        for field, keywords in FORMULATION_KEYWORDS.items()
+    }
+    delta["techniques_tried"] = ["validation"] if previous_reply.strip() else []
+    return json.dumps(delta)
+
+
+def hashed_embedding(text: str, dimensions: int) -> list:
+    """Deterministic, L2-normalised hashed bag-of-words embedding"""
+    vector = [0.0] * dimensions
+    for word in re.findall(r"[a-z']+", str(text).lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dimensions
+        vector[bucket] += 1.0 if digest[4] % 2 == 0 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class UsageWindow:
+    """Sliding one-second window enforcing per-minute limits quantised per second"""
+
+    def __init__(self, rpm: float = 0, tpm: float = 0):
+        self.request_limit = rpm / 60.0
+        self.token_limit = tpm / 60.0
+        self.events = deque()  # (timestamp, tokens)
+        self.accepted = 0
+        self.rejected = 0
+
+    def admit(self, tokens: int) -> bool:
+        now = time.monotonic()
+        while self.events and now - self.events[0][0] >= 1.0:
+            self.events.popleft()
+        used_tokens = sum(t for _, t in self.events)
+        if (self.request_limit and len(self.events) + 1 > self.request_limit) or (
+            self.token_limit and used_tokens + tokens > self.token_limit
+        ):
+            self.rejected += 1
+            return False
+        self.events.append((now, tokens))
+        self.accepted += 1
+        return True
+
+    def retry_after_ms(self) -> int:
+        if not self.events:
+            return 100
+        return max(1, int((1.0 - (time.monotonic() - self.events[0][0])) * 1000))
+
+
+PREFIX_CACHE_MIN_TOKENS = 1024
+PREFIX_CACHE_STEP_TOKENS = 128
+
+
+class PrefixCache:
+    """Provider-style prompt prefix cache keyed by hashes of prefix lengths"""
+
+    def __init__(self, max_entries: int = 200000):
+        self.max_entries = max_entries
+        self.seen = set()
+
+    def lookup(self, prompt: str) -> int:
+        """Return the cached prefix length in tokens and remember this prompt's prefixes"""
+        lengths = range(
+            PREFIX_CACHE_MIN_TOKENS * 4, len(prompt) + 1, PREFIX_CACHE_STEP_TOKENS * 4
+        )
+        hashes = [hashlib.sha1(prompt[:n].encode("utf-8")).hexdigest() for n in lengths]
+        cached = 0
+        for length, digest in zip(lengths, hashes):
+            if digest not in self.seen:
+                break
+            cached = length
+        if len(self.seen) > self.max_entries:
+            self.seen.clear()
+        self.seen.update(hashes)
+        return cached // 4
+
+
+def rate_limited_response(window: UsageWindow) -> JSONResponse:
+    return JSONResponse(
+        {
+            "error": {
+                "message": "Rate limit reached (mock)",
+                "type": "requests",
+                "code": "rate_limit_exceeded",
+            }
+        },
+        status_code=429,
+        headers={"retry-after-ms": str(window.retry_after_ms())},
+    )
+
+
+def create_app(
+    chat_latency_ms: float = 200.0,
+    embedding_latency_ms: float = 30.0,
+    completion_words: int = 120,
+    dimensions: int = 1536,
+    rpm: float = 0,
+    tpm: float = 0,
+    output_token_latency_ms: float = 0.0,
+    prompt_token_latency_ms: float = 0.0,
+    embedding_input_latency_ms: float = 0.0,
+) -> FastAPI:
+    app = FastAPI(title="Mock OpenAI")
+    app.state.usage = UsageWindow(rpm=rpm, tpm=tpm)
+    app.state.prefix_cache = PrefixCache()
+
+    def completion_text(prompt: str) -> str:
+        if CLASSIFICATION_MARKER in prompt:
+            match = re.search(r'Patient message: "(.*?)"', prompt, re.DOTALL)
+            return classify_text(match.group(1) if match else prompt)
+        if FORMULATION_MARKER in prompt:
+            message = re.search(r"New patient message: (.*)", prompt, re.DOTALL)
+            reply = re.search(r"Your previous reply: (.*?)\n\nNew patient message", prompt, re.DOTALL)
+            return formulation_delta(
+                message.group(1) if message else prompt,
+                reply.group(1) if reply and reply.group(1) != "(none yet)" else "",
+            )
+        words = FILLER_SENTENCE.split()
+        repeated = (words * (completion_words // len(words) + 1))[:completion_words]
+        return " ".join(repeated)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(payload: dict):
+        prompt = "\n".join(
+            str(message.get("content", "")) for message in payload.get("messages", [])
+        )
+        content, finish_reason = completion_text(prompt), "stop"
+        stops = payload.get("stop") or []
+        for stop in [stops] if isinstance(stops, str) else stops:
+            content = content.split(stop)[0]
+        max_tokens = payload.get("max_completion_tokens") or payload.get("max_tokens")
+        if max_tokens and estimate_tokens(content) > max_tokens:
+            content = content[: max_tokens * 4].rsplit(" ", 1)[0]
+            finish_reason = "length"
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(content)
+        charged = prompt_tokens + (max_tokens or completion_tokens)
+        if not app.state.usage.admit(charged):
+            return rate_limited_response(app.state.usage)
+
+        cached_tokens = min(app.state.prefix_cache.lookup(prompt), prompt_tokens)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+        prefill_ms = chat_latency_ms + prompt_token_latency_ms * (prompt_tokens - cached_tokens)
+        if payload.get("stream"):
+            return StreamingResponse(
+                stream_chunks(payload, content, finish_reason, usage, prefill_ms),
+                media_type="text/event-stream",
+            )
+
+        await asyncio.sleep(
+            (prefill_ms + output_token_latency_ms * completion_tokens) / 1000.0
+        )
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "mock"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": finish_reason,
+                }
+            ],
+            "usage": usage,
+        }
+
+    async def stream_chunks(payload, content, finish_reason, usage, prefill_ms):
+        """Server-sent chat.completion.chunk events, one per word"""
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        def chunk(delta, finish=None, chunk_usage=None):
+            body = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": payload.get("model", "mock"),
+                "choices": [],
+            }
+            if chunk_usage:
+                body["usage"] = chunk_usage
+            else:
+                body["choices"].append({"index": 0, "delta": delta, "finish_reason": finish})
+            return f"data: {json.dumps(body)}\n\n"
+
+        await asyncio.sleep(prefill_ms / 1000.0)
+        yield chunk({"role": "assistant", "content": ""})
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(output_token_latency_ms * estimate_tokens(word) / 1000.0)
+            yield chunk({"content": word if i == 0 else f" {word}"})
+        yield chunk({}, finish=finish_reason)
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            yield chunk(None, chunk_usage=usage)
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/embeddings")
+    async def embeddings(payload: dict):
+        inputs = payload.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        tokens = sum(estimate_tokens(str(text)) for text in inputs)
+        if not app.state.usage.admit(tokens):
+            return rate_limited_response(app.state.usage)
+
+        await asyncio.sleep((embedding_latency_ms + embedding_input_latency_ms * len(inputs)) / 1000.0)
+        data = [
+            {
+                "object": "embedding",
+                "index": i,
+                "embedding": hashed_embedding(text, payload.get("dimensions") or dimensions),
+            }
+            for i, text in enumerate(inputs)
+        ]
+        return JSONResponse(
+            {
+                "object": "list",
+                "data": data,
+                "model": payload.get("model", "mock-embedding"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            }
+        )
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local OpenAI stand-in for benchmarks")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--chat-latency-ms", type=float, default=200.0)
+    parser.add_argument("--output-token-latency-ms", type=float, default=0.0)
+    parser.add_argument("--prompt-token-latency-ms", type=float, default=0.0)
+    parser.add_argument("--embedding-latency-ms", type=float, default=30.0)
+    parser.add_argument("--embedding-input-latency-ms", type=float, default=0.0)
+    parser.add_argument("--completion-words", type=int, default=120)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--rpm", type=float, default=0, help="Requests per minute (0 = unlimited)")
+    parser.add_argument("--tpm", type=float, default=0, help="Tokens per minute (0 = unlimited)")
+    args = parser.parse_args()
+
+    app = create_app(
+        chat_latency_ms=args.chat_latency_ms,
+        embedding_latency_ms=args.embedding_latency_ms,
+        completion_words=args.completion_words,
+        dimensions=args.dimensions,
+        rpm=args.rpm,
+        tpm=args.tpm,
+        output_token_latency_ms=args.output_token_latency_ms,
+        prompt_token_latency_ms=args.prompt_token_latency_ms,
+        embedding_input_latency_ms=args.embedding_input_latency_ms,
+    )
+    print(f"🧪 Mock OpenAI listening on http://127.0.0.1:{args.port}/v1")
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Latency and token-cost matrix across model routing profiles.
+
+Runs the scripted sessions in-process once per profile of the routing file
+(each profile in its own subprocess, since stage models are built at import)
+and reports turn latency per classification path plus calls, prompt and
+completion tokens and estimated cost per stage.
+
+Start the mock with a per-output-token latency so output caps show up in
+latency, e.g.:
+  python -m benchmarks.mock_services --port 8100 --chat-latency-ms 150 --output-token-latency-ms 4
+  python -m benchmarks.model_routing_matrix --profiles baseline capped quality
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+
+from benchmarks.common import labelled_metrics, latency_summary, write_report
+
+DEFAULT_TRANSCRIPTS = "benchmarks/fixtures/scripted_sessions.jsonl"
+
+# USD per million tokens (input, output); extend for other models
+MODEL_PRICES = {
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# Cached prompt tokens are billed at a fraction of the input price
+CACHED_INPUT_DISCOUNT = 0.25
+
+
+def run_profile(transcripts_path, limit, output_path):
+    """Child process: run the sessions under the profile set in the environment"""
+    from server.chat_model import ChatRequest
+    from server.metrics import metrics
+    from server.pipeline import background_executor, process_chat_turn
+    from server.session_manager import session_manager
+    from simulate_sessions import load_transcripts
+
+    turns = []
+    for transcript in load_transcripts(transcripts_path)[:limit]:
+        session_id = f"routing-{transcript['id']}-{uuid.uuid4().hex[:8]}"
+        requests = [ChatRequest(message=m, session_id=session_id) for m in transcript["turns"]]
+        if transcript["end_session"]:
+            requests.append(
+                ChatRequest(
+                    message="Please provide a session conclusion.",
+                    session_id=session_id,
+                    end_session=True,
+                )
+            )
+        for request in requests:
+            started = time.perf_counter()
+            response = process_chat_turn(request)
+            turns.append(
+                {
+                    "path": response.classification,
+                    "ms": (time.perf_counter() - started) * 1000,
+                    "chars": len(response.response),
+                }
+            )
+            if response.is_session_ended:
+                break
+        session_manager.clear_session(session_id)
+
+    # Background work (drafts, follow-ups) is part of the cost too
+    background_executor.shutdown(wait=True)
+
+    stages = defaultdict(
+        lambda: {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+    )
+    for labels, value in labelled_metrics(metrics.counters, "llm.calls"):
+        stages[labels["stage"]]["calls"] += int(value)
+        stages[labels["stage"]]["model"] = labels["model"]
+    for labels, value in labelled_metrics(metrics.counters, "llm.tokens"):
+        stages[labels["stage"]][f"{labels['kind']}_tokens"] += int(value)
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"turns": turns, "stages": stages}, f)
+
+
+def stage_cost(stage):
+    input_price, output_price = MODEL_PRICES.get(stage.get("model"), (0.0, 0.0))
+    uncached = stage["prompt_tokens"] - stage["cached_tokens"]
+    return (
+        uncached * input_price
+        + stage["cached_tokens"] * input_price * CACHED_INPUT_DISCOUNT
+        + stage["completion_tokens"] * output_price
+    ) / 1_000_000
+
+
+def summarise(profile, result):
+    by_path = defaultdict(list)
+    for turn in result["turns"]:
+        by_path[turn["path"]].append(turn["ms"])
+    stages = result["stages"]
+    for stage in stages.values():
+        stage["cost_usd"] = round(stage_cost(stage), 6)
+    return {
+        "profile": profile,
+        "turn_latency": latency_summary(turn["ms"] for turn in result["turns"]),
+        "latency_by_path": {path: latency_summary(ms) for path, ms in sorted(by_path.items())},
+        "mean_response_chars": round(
+            sum(turn["chars"] for turn in result["turns"]) / max(len(result["turns"]), 1)
+        ),
+        "stages": stages,
+        "total_tokens": sum(s["prompt_tokens"] + s["completion_tokens"] for s in stages.values()),
+        "total_cost_usd": round(sum(s["cost_usd"] for s in stages.values()), 6),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare model routing profiles")
+    parser.add_argument("--profiles", nargs="+", default=None)
+    parser.add_argument("--transcripts", default=DEFAULT_TRANSCRIPTS)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--output", default="benchmarks/results/model_routing_matrix.json")
+    parser.add_argument("--run-profile-output", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_profile_output:
+        run_profile(args.transcripts, args.limit, args.run_profile_output)
+        return
+
+    from server.config import MODEL_ROUTING_PATH
+
+    with open(MODEL_ROUTING_PATH, encoding="utf-8") as f:
+        profiles = args.profiles or list(json.load(f)["profiles"])
+
+    rows = []
+    for profile in profiles:
+        print(f"🔀 Running profile '{profile}'...")
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+            result_path = tmp.name
+        command = [
+            sys.executable, "-m", "benchmarks.model_routing_matrix",
+            "--transcripts", args.transcripts,
+            "--run-profile-output", result_path,
+        ]
+        if args.limit:
+            command += ["--limit", str(args.limit)]
+        completed = subprocess.run(
+            command,
+            env={**os.environ, "MODEL_ROUTING_PROFILE": profile},
+            stdout=subprocess.DEVNULL,
+        )
+        if completed.returncode != 0:
+            print(f"❌ Profile '{profile}' failed (exit {completed.returncode})")
+            sys.exit(1)
+        with open(result_path, encoding="utf-8") as f:
+            rows.append(summarise(profile, json.load(f)))
+        os.remove(result_path)
+
+    print(f"\n{'Profile':<12}{'p50 ms':>10}{'p95 ms':>10}{'tokens':>10}{'cost $':>12}{'chars':>8}")
+    for row in rows:
+        latency = row["turn_latency"]
+        print(
+            f"{row['profile']:<12}{latency['p50_ms']:>10}{latency['p95_ms']:>10}"
+            f"{row['total_tokens']:>10}{row['total_cost_usd']:>12.6f}{row['mean_response_chars']:>8}"
+        )
+    print(f"\n{'Profile':<12}{'Stage':<20}{'model':<16}{'calls':>7}{'out tok':>10}{'cost $':>12}")
+    for row in rows:
+        for stage, usage in sorted(row["stages"].items()):
+            print(
+                f"{row['profile']:<12}{stage:<20}{usage.get('model', '?'):<16}"
+                f"{usage['calls']:>7}{usage['completion_tokens']:>10}{usage['cost_usd']:>12.6f}"
+            )
+
+    write_report(args.output, {"config": vars(args), "profiles": rows})
+
+
+if __name__ == "__main__":
+    main()
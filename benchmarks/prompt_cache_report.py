@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Provider-side prompt prefix cache report.
+
+Runs the scripted sessions in-process (optionally several passes) and reports,
+per stage: calls, cache hit rate (calls with cached_tokens > 0), the share of
+prompt tokens served from the cache, mean call latency for hits vs. misses and
+the time saved, estimated as hits x (mean miss latency - mean hit latency).
+
+Against the mock, give prompt tokens a prefill cost so cache hits show up in
+latency:
+  python -m benchmarks.mock_services --port 8100 --prompt-token-latency-ms 0.2
+  python -m benchmarks.prompt_cache_report --passes 2
+"""
+
+import argparse
+import uuid
+from collections import defaultdict
+
+from benchmarks.common import labelled_metrics, write_report
+from server.chat_model import ChatRequest
+from server.metrics import metrics
+from server.pipeline import background_executor, process_chat_turn
+from server.session_manager import session_manager
+from simulate_sessions import load_transcripts
+
+DEFAULT_TRANSCRIPTS = "benchmarks/fixtures/scripted_sessions.jsonl"
+
+
+def run_sessions(transcripts):
+    for transcript in transcripts:
+        session_id = f"cache-{transcript['id']}-{uuid.uuid4().hex[:8]}"
+        ended = False
+        for message in transcript["turns"]:
+            response = process_chat_turn(ChatRequest(message=message, session_id=session_id))
+            ended = response.is_session_ended
+            if ended:
+                break
+        if transcript["end_session"] and not ended:
+            process_chat_turn(
+                ChatRequest(
+                    message="Please provide a session conclusion.",
+                    session_id=session_id,
+                    end_session=True,
+                )
+            )
+        session_manager.clear_session(session_id)
+
+
+def stage_report(snapshot):
+    stages = defaultdict(
+        lambda: {"calls": 0, "hits": 0, "prompt_tokens": 0, "cached_tokens": 0}
+    )
+    for labels, value in labelled_metrics(snapshot["counters"], "llm.prompt_cache"):
+        stages[labels["stage"]]["calls"] += int(value)
+        if labels["result"] == "hit":
+            stages[labels["stage"]]["hits"] += int(value)
+    for labels, value in labelled_metrics(snapshot["counters"], "llm.tokens"):
+        if labels["kind"] in ("prompt", "cached"):
+            stages[labels["stage"]][f"{labels['kind']}_tokens"] += int(value)
+
+    latency = defaultdict(dict)
+    for labels, histogram in labelled_metrics(snapshot["histograms"], "llm.call_seconds"):
+        if histogram["count"]:
+            latency[labels["stage"]][labels["cache"]] = histogram["sum"] / histogram["count"]
+
+    for stage, row in stages.items():
+        row["hit_rate"] = round(row["hits"] / row["calls"], 4) if row["calls"] else 0.0
+        row["cached_token_share"] = (
+            round(row["cached_tokens"] / row["prompt_tokens"], 4) if row["prompt_tokens"] else 0.0
+        )
+        hit_mean, miss_mean = latency[stage].get("hit"), latency[stage].get("miss")
+        row["mean_hit_ms"] = round(hit_mean * 1000, 2) if hit_mean is not None else None
+        row["mean_miss_ms"] = round(miss_mean * 1000, 2) if miss_mean is not None else None
+        row["time_saved_s"] = (
+            round(row["hits"] * max(miss_mean - hit_mean, 0.0), 3)
+            if hit_mean is not None and miss_mean is not None
+            else 0.0
+        )
+    return dict(sorted(stages.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report prompt prefix cache hits per stage")
+    parser.add_argument("--transcripts", default=DEFAULT_TRANSCRIPTS)
+    parser.add_argument("--passes", type=int, default=2)
+    parser.add_argument("--output", default="benchmarks/results/prompt_cache_report.json")
+    args = parser.parse_args()
+
+    transcripts = load_transcripts(args.transcripts)
+    print(f"🧊 Running {len(transcripts)} sessions x {args.passes} passes")
+    for _ in range(args.passes):
+        run_sessions(transcripts)
+    background_executor.shutdown(wait=True)
+
+    stages = stage_report(metrics.snapshot())
+    calls = sum(row["calls"] for row in stages.values())
+    prompt_tokens = sum(row["prompt_tokens"] for row in stages.values())
+    report = {
+        "config": vars(args),
+        "hit_rate": round(sum(row["hits"] for row in stages.values()) / max(calls, 1), 4),
+        "cached_token_share": round(
+            sum(row["cached_tokens"] for row in stages.values()) / max(prompt_tokens, 1), 4
+        ),
+        "time_saved_s": round(sum(row["time_saved_s"] for row in stages.values()), 3),
+        "stages": stages,
+    }
+
+    print(f"\n{'Stage':<20}{'calls':>7}{'hit rate':>10}{'cached':>9}{'hit ms':>10}{'miss ms':>10}{'saved s':>9}")
+    for stage, row in stages.items():
+        print(
+            f"{stage:<20}{row['calls']:>7}{row['hit_rate']:>10.0%}{row['cached_token_share']:>9.0%}"
+            f"{row['mean_hit_ms'] or '-':>10}{row['mean_miss_ms'] or '-':>10}{row['time_saved_s']:>9}"
+        )
+    print(
+        f"\nOverall hit rate {report['hit_rate']:.0%}, cached prompt tokens "
+        f"{report['cached_token_share']:.0%}, time saved {report['time_saved_s']}s"
+    )
+    write_report(args.output, report)
+
+
+if __name__ == "__main__":
+    main()
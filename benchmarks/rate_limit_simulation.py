@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Rate limit simulation against a local mock that enforces RPM/TPM limits.
+
+Runs the same burst of chat and embedding calls from several concurrent
+clients twice: once with independent SDK retries (the old behaviour) and once
+through the shared token-bucket limiter. Reports provider-side 429s, failed
+calls and achieved throughput for each mode. Exits non-zero if any call fails
+under the shared limiter.
+
+Usage:
+  python -m benchmarks.rate_limit_simulation --rpm 600 --tpm 60000 --calls 60
+"""
+
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import uvicorn
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from benchmarks.common import write_report
+from benchmarks.mock_services import create_app
+from server.rate_limiter import RateLimitedTransport, RateLimiter
+
+PROMPT = "I have been feeling overwhelmed at work and I can't switch off at night. " * 4
+
+
+def start_mock(port: int, rpm: float, tpm: float):
+    app = create_app(chat_latency_ms=50, embedding_latency_ms=10, rpm=rpm, tpm=tpm)
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return app, server
+
+
+def build_clients(base_url: str, clients: int, http_client=None, max_retries: int = 2):
+    """Several independent model clients plus one embedding client"""
+    common = {"api_key": "mock", "base_url": base_url, "max_retries": max_retries}
+    if http_client is not None:
+        common["http_client"] = http_client
+    models = [
+        ChatOpenAI(model="gpt-4.1-nano", max_tokens=200, **common) for _ in range(clients)
+    ]
+    embeddings = OpenAIEmbeddings(
+        model="text-embedding-ada-002", check_embedding_ctx_length=False, **common
+    )
+    return models, embeddings
+
+
+def run_burst(models, embeddings, calls: int, workers: int):
+    """Fire `calls` requests spread across the clients; return (successes, failures)"""
+
+    def one_call(i):
+        try:
+            if i % 5 == 4:
+                embeddings.embed_query(PROMPT)
+            else:
+                models[i % len(models)].invoke(PROMPT)
+            return True
+        except Exception:
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(one_call, range(calls)))
+    return results.count(True), results.count(False)
+
+
+def run_mode(name, app, models, embeddings, args):
+    app.state.usage.accepted = 0
+    app.state.usage.rejected = 0
+    # Let the previous mode's usage window drain
+    time.sleep(1.1)
+
+    started = time.perf_counter()
+    successes, failures = run_burst(models, embeddings, args.calls, args.workers)
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "successes": successes,
+        "failures": failures,
+        "provider_429s": app.state.usage.rejected,
+        "elapsed_s": round(elapsed, 2),
+        "calls_per_s": round(successes / elapsed, 2) if elapsed else 0.0,
+    }
+    print(
+        f"   {name:<16} ok={successes:<4} failed={failures:<4} "
+        f"429s={result['provider_429s']:<5} {result['calls_per_s']} calls/s"
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate OpenAI RPM/TPM limits")
+    parser.add_argument("--port", type=int, default=8199)
+    parser.add_argument("--rpm", type=float, default=600)
+    parser.add_argument("--tpm", type=float, default=60000)
+    parser.add_argument("--calls", type=int, default=60)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--output", default="benchmarks/results/rate_limit_simulation.json")
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}/v1"
+    app, server = start_mock(args.port, args.rpm, args.tpm)
+    print(f"🧪 Mock enforcing {args.rpm:.0f} RPM / {args.tpm:.0f} TPM, {args.calls} calls")
+
+    models, embeddings = build_clients(base_url, args.clients)
+    independent = run_mode("independent", app, models, embeddings, args)
+
+    limiter = RateLimiter(requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+    shared_client = httpx.Client(transport=RateLimitedTransport(limiter, max_retries=8))
+    models, embeddings = build_clients(
+        base_url, args.clients, http_client=shared_client, max_retries=0
+    )
+    shared = run_mode("shared limiter", app, models, embeddings, args)
+
+    server.should_exit = True
+    write_report(
+        args.output,
+        {
+            "config": vars(args),
+            "independent_retries": independent,
+            "shared_limiter": shared,
+        },
+    )
+
+    if shared["failures"]:
+        print("❌ Calls failed under the shared limiter")
+        sys.exit(1)
+    print("✅ All calls succeeded under the shared limiter")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Coverage and latency evaluation of the pre-generated response bank.
+
+Takes the GREETING, PROCEDURAL and SMALL_TALK messages of a labelled
+{"message", "label"} set and answers each one with generate_simple_response,
+once as a first turn and once in an ongoing session. Reports the share of
+simple turns served from the bank without an LLM call and the latency of bank
+vs. LLM replies, and checks that no reply repeats within a session.
+
+Usage:
+  python -m benchmarks.response_bank_eval
+"""
+
+import argparse
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+from benchmarks.common import latency_summary, load_jsonl, write_report
+from server.session_manager import session_manager
+
+DEFAULT_EVAL_SET = "benchmarks/fixtures/classification_eval.jsonl"
+SIMPLE_LABELS = ("GREETING", "PROCEDURAL", "SMALL_TALK")
+
+
+def answer(message, label, session_id):
+    started = time.perf_counter()
+    reply = session_manager.generate_simple_response(message, session_id, label)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    from_bank = reply in session_manager.get_session(session_id).bank_replies_used
+    return reply, from_bank, elapsed_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the response bank")
+    parser.add_argument("--eval-set", default=DEFAULT_EVAL_SET)
+    parser.add_argument("--output", default="benchmarks/results/response_bank_eval.json")
+    args = parser.parse_args()
+
+    if session_manager.response_bank is None:
+        print("❌ RESPONSE_BANK_PATH is empty; the response bank is disabled")
+        sys.exit(1)
+
+    records = [r for r in load_jsonl(args.eval_set) if r["label"] in SIMPLE_LABELS]
+    # Embed the bank cues before timing anything
+    session_manager.response_bank.match_intent("warm up", "GREETING")
+
+    rows = []
+    for state in ("first_turn", "ongoing"):
+        for record in records:
+            session_id = f"bank-eval-{uuid.uuid4()}"
+            if state == "ongoing":
+                session_manager.add_message(session_id, "user", "Hi doctor")
+                session_manager.add_message(session_id, "assistant", "Hello, how are you today?")
+            session_manager.add_message(session_id, "user", record["message"])
+            _, from_bank, elapsed_ms = answer(record["message"], record["label"], session_id)
+            session_manager.clear_session(session_id)
+            rows.append(
+                {
+                    "message": record["message"],
+                    "label": record["label"],
+                    "state": state,
+                    "from_bank": from_bank,
+                    "ms": elapsed_ms,
+                }
+            )
+
+    # One long session of greetings: replies must not repeat
+    session_id = f"bank-eval-{uuid.uuid4()}"
+    replies = []
+    for _ in range(8):
+        session_manager.add_message(session_id, "user", "Hello")
+        reply, from_bank, _ = answer("Hello", "GREETING", session_id)
+        session_manager.add_message(session_id, "assistant", reply)
+        if from_bank:
+            replies.append(reply)
+    session_manager.clear_session(session_id)
+    repeats = len(replies) - len(set(replies))
+
+    per_label = defaultdict(list)
+    for row in rows:
+        per_label[f"{row['label']}/{row['state']}"].append(row["from_bank"])
+
+    report = {
+        "config": vars(args),
+        "simple_turns": len(rows),
+        "served_without_llm": round(sum(r["from_bank"] for r in rows) / len(rows), 4),
+        "served_without_llm_by_label": {
+            key: round(sum(values) / len(values), 4) for key, values in sorted(per_label.items())
+        },
+        "latency": {
+            "bank": latency_summary(r["ms"] for r in rows if r["from_bank"]),
+            "llm": latency_summary(r["ms"] for r in rows if not r["from_bank"]),
+        },
+        "repeated_replies_in_session": repeats,
+        "uncovered": [
+            {key: row[key] for key in ("message", "label", "state")}
+            for row in rows
+            if not row["from_bank"]
+        ],
+    }
+
+    print(f"💬 Response bank on {len(rows)} simple turns")
+    print(f"   Served without an LLM call: {report['served_without_llm']:.0%}")
+    for key, share in report["served_without_llm_by_label"].items():
+        print(f"   {key:<24}{share:>6.0%}")
+    bank, llm = report["latency"]["bank"], report["latency"]["llm"]
+    print(f"   Bank p50/p95: {bank['p50_ms']} / {bank['p95_ms']} ms")
+    print(f"   LLM p50/p95:  {llm['p50_ms']} / {llm['p95_ms']} ms")
+    write_report(args.output, report)
+
+    if repeats:
+        print(f"❌ {repeats} bank replies repeated within one session")
+        sys.exit(1)
+    print("✅ No repeated replies within a session")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Quality and latency of `retrieve_therapist_responses` per backend and chunking strategy.
+
+Loads the counseling fixture (plus the CBT knowledge base, as setup_rag.py
+does) into each vector store backend with each chunking strategy, then
+runs a fixed labelled query set: held-out paraphrases of the fixture's
+client messages, each labelled with the conversation whose therapist
+response should come back. For every configuration it reports recall@k,
+MRR, the duplicate rate (share of returned responses repeating one already
+in the same result list, e.g. two chunks of one conversation) and p50/p95
+query latency end to end, split into the query embedding and the store
+query (the retrieval call once the embedding is cached). Each
+configuration runs in its own subprocess, since chunking and backend are
+read at import.
+
+The in-memory backend needs only an embeddings endpoint, e.g. the mock:
+  python -m benchmarks.mock_services --port 8100
+  OPENAI_BASE_URL=http://127.0.0.1:8100/v1 python -m benchmarks.retrieval_quality_bench
+
+The Pinecone backend (--backends memory pinecone) loads the fixture into a
+dedicated index (--pinecone-index, create it first with
+`python manage_indexes.py create <name> [dims]`) and empties it before
+every strategy, so never point it at the live index.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import latency_summary, load_jsonl, write_report
+
+DEFAULT_FIXTURE = "benchmarks/fixtures/counseling_conversations.jsonl"
+DEFAULT_QUERIES = "benchmarks/fixtures/retrieval_queries.jsonl"
+# Chunking strategies as chunk_size/chunk_overlap in characters; 500/50 is the default
+DEFAULT_STRATEGIES = ["500/50", "200/40", "100/20"]
+DEFAULT_PINECONE_INDEX = "therapy-simulator-bench"
+
+
+def wait_for_pinecone(rag, expected, timeout=120):
+    """Pinecone makes upserts visible asynchronously"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if rag.index.describe_index_stats().total_vector_count >= expected:
+            return
+        time.sleep(2)
+    raise RuntimeError(f"index did not reach {expected} vectors within {timeout}s")
+
+
+def run_config(args, output_path):
+    """Child process: load the corpus and run the query set under the configuration in the environment"""
+    from server.config import VECTOR_STORE_BACKEND
+    from server.metrics import metrics
+    from server.rag_engine import RAGEngine
+    from server.technique_selector import CBT_TECHNIQUES
+
+    rag = RAGEngine(index_name=args.pinecone_index if VECTOR_STORE_BACKEND == "pinecone" else None)
+    records = load_jsonl(args.fixture)
+    documents, _ = rag._conversation_documents(records, args.fixture)
+    chunks = sum(
+        len(rag.text_splitter.split_text(text))
+        for text in documents + [item["text"] for item in CBT_TECHNIQUES]
+    )
+    if rag.index is not None:
+        try:
+            rag.index.delete(delete_all=True)
+        except Exception:
+            pass  # already empty
+    rag.add_cbt_knowledge_base()
+    rag.load_conversations_from_file(args.fixture)
+    if rag.index is not None:
+        wait_for_pinecone(rag, chunks)
+
+    responses_by_context = {r["Context"]: r["Response"] for r in records}
+    queries = load_jsonl(args.queries)
+    max_k = max(args.k)
+    rag.retrieve_therapist_responses("warm up the query path", k=max_k, timeout=args.timeout)
+    timeouts_before = metrics.counters.get("retrieval.queries{result=timeout}", 0)
+
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        rag.embeddings.embed_query(query["query"])
+        embedded = time.perf_counter()
+        responses = rag.retrieve_therapist_responses(query["query"], k=max_k, timeout=args.timeout)
+        finished = time.perf_counter()
+        expected = responses_by_context[query["source_context"]]
+        rank = responses.index(expected) + 1 if expected in responses else None
+        results.append(
+            {
+                "rank": rank,
+                "returned": len(responses),
+                "duplicates": len(responses) - len(set(responses)),
+                "ms": (finished - started) * 1000,
+                "embedding_ms": (embedded - started) * 1000,
+                "store_ms": (finished - embedded) * 1000,
+            }
+        )
+
+    timeouts = metrics.counters.get("retrieval.queries{result=timeout}", 0) - timeouts_before
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"chunks": chunks, "results": results, "timeouts": int(timeouts)}, f)
+
+
+def summarise(backend, strategy, ks, result):
+    results = result["results"]
+    returned = sum(r["returned"] for r in results)
+    return {
+        "backend": backend,
+        "chunking": strategy,
+        "chunks": result["chunks"],
+        "queries": len(results),
+        "recall_at_k": {
+            str(k): round(sum(1 for r in results if r["rank"] and r["rank"] <= k) / len(results), 3)
+            for k in ks
+        },
+        "mrr": round(sum(1.0 / r["rank"] for r in results if r["rank"]) / len(results), 3),
+        "duplicate_rate": round(sum(r["duplicates"] for r in results) / max(returned, 1), 3),
+        "latency": latency_summary(r["ms"] for r in results),
+        "embedding_latency": latency_summary(r["embedding_ms"] for r in results),
+        "store_latency": latency_summary(r["store_ms"] for r in results),
+        "timeouts": result["timeouts"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency")
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+    parser.add_argument("--queries", default=DEFAULT_QUERIES)
+    parser.add_argument("--backends", nargs="+", default=["memory"], choices=["memory", "pinecone"])
+    parser.add_argument(
+        "--strategies", nargs="+", default=DEFAULT_STRATEGIES, help="chunk_size/chunk_overlap pairs"
+    )
+    parser.add_argument("-k", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--timeout", type=float, default=10.0, help="Per-query deadline in seconds")
+    parser.add_argument("--pinecone-index", default=DEFAULT_PINECONE_INDEX)
+    parser.add_argument("--output", default="benchmarks/results/retrieval_quality_bench.json")
+    parser.add_argument("--run-config-output", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_config_output:
+        run_config(args, args.run_config_output)
+        return
+
+    rows = []
+    for backend in args.backends:
+        for strategy in args.strategies:
+            chunk_size, chunk_overlap = strategy.split("/")
+            print(f"🔍 Running {backend} backend with {strategy} chunking...")
+            with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+                result_path = tmp.name
+            completed = subprocess.run(
+                [
+                    sys.executable, "-m", "benchmarks.retrieval_quality_bench",
+                    "--fixture", args.fixture,
+                    "--queries", args.queries,
+                    "-k", *map(str, args.k),
+                    "--timeout", str(args.timeout),
+                    "--pinecone-index", args.pinecone_index,
+                    "--run-config-output", result_path,
+                ],
+                env={
+                    **os.environ,
+                    "VECTOR_STORE_BACKEND": backend,
+                    "VECTOR_STORE_SEED_PATH": "",
+                    "RAG_CHUNK_SIZE": chunk_size,
+                    "RAG_CHUNK_OVERLAP": chunk_overlap,
+                },
+                stdout=subprocess.DEVNULL,
+            )
+            if completed.returncode != 0:
+                print(f"❌ {backend} with {strategy} chunking failed (exit {completed.returncode})")
+                sys.exit(1)
+            with open(result_path, encoding="utf-8") as f:
+                rows.append(summarise(backend, strategy, args.k, json.load(f)))
+            os.remove(result_path)
+
+    recall_headers = "".join(f"{f'R@{k}':>7}" for k in args.k)
+    print(
+        f"\n{'Backend':<10}{'chunking':<10}{'chunks':>7}{recall_headers}{'MRR':>7}{'dup':>7}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'store p50':>11}{'store p95':>11}"
+    )
+    for row in rows:
+        recalls = "".join(f"{row['recall_at_k'][str(k)]:>7}" for k in args.k)
+        print(
+            f"{row['backend']:<10}{row['chunking']:<10}{row['chunks']:>7}{recalls}{row['mrr']:>7}"
+            f"{row['duplicate_rate']:>7}{row['latency']['p50_ms']:>9}{row['latency']['p95_ms']:>9}"
+            f"{row['store_latency']['p50_ms']:>11}{row['store_latency']['p95_ms']:>11}"
+        )
+    print("(R@k = recall@k, dup = share of returned responses repeating one in the same result list)")
+
+    write_report(args.output, {"config": vars(args), "results": rows})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tail latency of example retrieval: blocking vs. deadline-bounded vs. hedged.
+
+Seeds the in-memory vector store from the counseling fixture and puts a
+simulated network in front of it: most queries take a log-normal latency
+around --base-ms, and a --stall-rate share stall for --stall-ms (a slow
+replica or a dropped packet). The same query stream then runs three ways:
+  blocking  the previous path, waiting for every query however long it takes
+  deadline  queries abandoned after --timeout-ms (the turn gets no examples)
+  hedged    deadline plus a second query once the first exceeds the p95
+Reports p50/p95/p99/max latency, the share of turns left without examples
+and how many hedges were sent.
+
+Embeddings come from the mock:
+  python -m benchmarks.mock_services --port 8100
+  OPENAI_BASE_URL=http://127.0.0.1:8100/v1 VECTOR_STORE_BACKEND=memory \\
+      python -m benchmarks.retrieval_tail_latency --queries 400 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import latency_summary, load_jsonl, write_report
+from server.embeddings import shared_embeddings
+from server.metrics import metrics
+from server.rag_engine import RAGEngine
+from server.vector_query import HedgedVectorQuery
+
+DEFAULT_FIXTURE = "benchmarks/fixtures/counseling_conversations.jsonl"
+
+
+def simulated_store(engine, args, rng):
+    """Wrap the in-memory query with simulated network latency and stalls"""
+
+    async def query(vector, k):
+        if rng.random() < args.stall_rate:
+            delay = args.stall_ms
+        else:
+            delay = rng.lognormvariate(0, 0.4) * args.base_ms
+        await asyncio.sleep(delay / 1000.0)
+        return await engine._query_matches(vector, k)
+
+    return query
+
+
+def run(runner, vectors, timeout, concurrency):
+    hedges_before = metrics.counters.get("retrieval.hedges", 0)
+
+    def one(vector):
+        started = time.perf_counter()
+        matches = runner.query(vector, 4, timeout)
+        return (time.perf_counter() - started) * 1000, matches is None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, vectors))
+    latencies = [ms for ms, _ in results]
+    return {
+        "latency": {**latency_summary(latencies), "max_ms": round(max(latencies), 2)},
+        "no_examples_share": round(sum(missed for _, missed in results) / len(results), 4),
+        "hedges": int(metrics.counters.get("retrieval.hedges", 0) - hedges_before),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare retrieval tail latency with deadlines and hedging")
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--base-ms", type=float, default=40.0)
+    parser.add_argument("--stall-rate", type=float, default=0.03)
+    parser.add_argument("--stall-ms", type=float, default=2000.0)
+    parser.add_argument("--timeout-ms", type=float, default=500.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="benchmarks/results/retrieval_tail_latency.json")
+    args = parser.parse_args()
+
+    engine = RAGEngine()
+    engine.load_conversations_from_file(args.fixture)
+    messages = [record["Context"] for record in load_jsonl(args.fixture)]
+    vectors = [shared_embeddings.embed_query(messages[i % len(messages)]) for i in range(args.queries)]
+
+    modes = {
+        "blocking": (0, None),
+        "deadline": (0, args.timeout_ms / 1000.0),
+        "hedged": (95, args.timeout_ms / 1000.0),
+    }
+    rows = {}
+    for mode, (percentile, timeout) in modes.items():
+        print(f"🔎 {mode}: {args.queries} queries at concurrency {args.concurrency}")
+        runner = HedgedVectorQuery(
+            simulated_store(engine, args, random.Random(args.seed)), hedge_percentile=percentile
+        )
+        # Warm-up queries give the hedge delay its latency history
+        run(runner, vectors[:40], timeout, args.concurrency)
+        rows[mode] = run(runner, vectors, timeout, args.concurrency)
+
+    print(f"\n{'Mode':<10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'no ex.':>8}{'hedges':>8}")
+    for mode, row in rows.items():
+        latency = row["latency"]
+        print(
+            f"{mode:<10}{latency['p50_ms']:>9}{latency['p95_ms']:>9}{latency['p99_ms']:>9}"
+            f"{latency['max_ms']:>9}{row['no_examples_share']:>8.1%}{row['hedges']:>8}"
+        )
+    write_report(args.output, {"config": vars(args), "modes": rows})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for session storage and conversation-context building.
+
+For sessions of 10, 100 and 1000 messages, compares the previous layout (a
+dict holding a list of pydantic ChatMessage objects, context re-rendered with
+string concatenation on every call) with SessionRecord and the versioned
+context cache in SessionManager. Reports:
+  - per-session memory (tracemalloc, message contents included)
+  - time per turn: append a message, then build the context twice (as the
+    classifier and the CBT chain do)
+  - time to build the context on a cache hit
+
+No LLM calls are made; set OPENAI_API_KEY to any value so the clients import.
+  python -m benchmarks.session_context_bench --sizes 10 100 1000
+"""
+
+import argparse
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.common import write_report
+from server.chat_model import ChatMessage
+from server.session_manager import session_manager
+from server.session_record import SessionRecord
+
+SUMMARY = "Patient reports morning anxiety before work and rumination about a recent meeting."
+
+
+def message_text(i):
+    return f"Message {i}: I keep replaying the meeting at work and worrying about what they think of me."
+
+
+def role_of(i):
+    return "user" if i % 2 == 0 else "assistant"
+
+
+def legacy_session(count):
+    return {
+        "messages": [ChatMessage(role=role_of(i), content=message_text(i)) for i in range(count)],
+        "summary": SUMMARY,
+        "created_at": datetime.now(),
+        "last_updated": datetime.now(),
+        "message_count": count,
+    }
+
+
+def legacy_context(session):
+    """Context rendering as it was before SessionRecord"""
+    messages = session["messages"]
+    if len(messages) <= 6:
+        context = "Full conversation history:\n"
+        for msg in messages:
+            context += f"{msg.role.title()}: {msg.content}\n"
+    else:
+        context = f"Conversation Summary: {session['summary']}\n\n"
+        context += "Recent conversation:\n"
+        for msg in messages[-4:]:
+            context += f"{msg.role.title()}: {msg.content}\n"
+    if len(messages) == 0:
+        context += "\nCONVERSATION STATE: This is the very first interaction with this patient. A greeting is appropriate."
+    elif len(messages) >= 2:
+        context += f"\nCONVERSATION STATE: This is an ongoing conversation with {len(messages)//2} previous exchanges. The therapeutic relationship is already established. Do NOT greet the patient again."
+    return context
+
+
+def record_session(count):
+    record = SessionRecord()
+    for i in range(count):
+        record.append(role_of(i), message_text(i))
+    record.summary = SUMMARY
+    return record
+
+
+def session_memory(build, count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    session = build(count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del session
+    return after - before
+
+
+def per_call_us(fn, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - started) / repeats * 1e6
+
+
+def measure(count, repeats):
+    legacy = legacy_session(count)
+    session_id = f"context-bench-{count}"
+    session_manager.sessions[session_id] = record_session(count)
+    record = session_manager.sessions[session_id]
+
+    def legacy_turn():
+        legacy["messages"].append(ChatMessage(role="user", content=message_text(count)))
+        legacy_context(legacy)
+        legacy_context(legacy)
+
+    def record_turn():
+        record.append("user", message_text(count))
+        session_manager.get_conversation_context(session_id)
+        session_manager.get_conversation_context(session_id)
+
+    row = {
+        "messages": count,
+        "memory_bytes": {
+            "legacy": session_memory(legacy_session, count),
+            "session_record": session_memory(record_session, count),
+        },
+        "turn_us": {
+            "legacy": round(per_call_us(legacy_turn, repeats), 2),
+            "session_record": round(per_call_us(record_turn, repeats), 2),
+        },
+        "cached_context_us": round(
+            per_call_us(lambda: session_manager.get_conversation_context(session_id), repeats), 3
+        ),
+    }
+    session_manager.clear_session(session_id)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark session storage and context building")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=2000)
+    parser.add_argument("--output", default="benchmarks/results/session_context_bench.json")
+    args = parser.parse_args()
+
+    rows = [measure(count, args.repeats) for count in args.sizes]
+
+    print(f"{'Messages':>9}{'legacy KB':>11}{'record KB':>11}{'legacy us':>11}{'record us':>11}{'cached us':>11}")
+    for row in rows:
+        memory, turn = row["memory_bytes"], row["turn_us"]
+        print(
+            f"{row['messages']:>9}{memory['legacy'] / 1024:>11.1f}{memory['session_record'] / 1024:>11.1f}"
+            f"{turn['legacy']:>11}{turn['session_record']:>11}{row['cached_context_us']:>11}"
+        )
+    write_report(args.output, {"config": vars(args), "sizes": rows})
+
+
+if __name__ == "__main__":
+    main()
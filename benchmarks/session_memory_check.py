@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Context size and recall check for per-session turn memory.
+
+Builds sessions of 10, 100 and 1000 messages from the counseling fixture, with
+one distinctive early exchange planted near the start and a closing user
+message that refers back to it. For each size it reports the estimated
+tokens (characters / 4, as the rate limiter counts them) of the context the
+pipeline would send (summary + relevant earlier turns + recent messages)
+against sending the whole history. Exits non-zero if the context
+grows with the session or the planted exchange is not recalled.
+
+Needs an embeddings endpoint, e.g. the mock:
+  python -m benchmarks.mock_services --port 8100
+  OPENAI_BASE_URL=http://127.0.0.1:8100/v1 VECTOR_STORE_BACKEND=memory \\
+      python -m benchmarks.session_memory_check
+"""
+
+import argparse
+import sys
+import uuid
+
+from benchmarks.common import load_jsonl, write_report
+from server.session_manager import session_manager
+
+DEFAULT_FIXTURE = "benchmarks/fixtures/counseling_conversations.jsonl"
+PLANTED_TURN = (
+    "My sister Anna is getting married in June and I have to give the speech at the wedding.",
+    "Giving a speech at your sister's wedding is a big moment. What goes through your mind when you picture standing up to speak?",
+)
+CLOSING_TURN = "I can't stop panicking about the speech at Anna's wedding in June."
+# 300-word cap of the summary prompt
+SUMMARY = " ".join(["Patient discussed anxiety, self-criticism and avoidance at work and home."] * 27)
+# Tolerated growth of the context from the smallest to the largest session
+MAX_GROWTH = 1.25
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def build_session(records, count):
+    session_id = f"memory-check-{count}-{uuid.uuid4().hex[:8]}"
+    session = session_manager.get_session(session_id)
+    exchanges = [(r["Context"], r["Response"]) for r in records]
+    for i in range(count // 2 - 1):
+        user, assistant = PLANTED_TURN if i == 1 else exchanges[i % len(exchanges)]
+        session.append("user", user)
+        session_manager.remember_turn(session_id, len(session) - 1)
+        session.append("assistant", assistant)
+    session.append("user", CLOSING_TURN)
+    session_manager.remember_turn(session_id, len(session) - 1)
+    session.set_summary(SUMMARY)
+    return session_id, session
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that session memory keeps context size constant")
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--output", default="benchmarks/results/session_memory_check.json")
+    args = parser.parse_args()
+
+    records = load_jsonl(args.fixture)
+    rows = []
+    print(f"🧠 Building sessions of {', '.join(map(str, args.sizes))} messages")
+    for count in args.sizes:
+        session_id, session = build_session(records, count)
+        context = session_manager.get_conversation_context(session_id)
+        rows.append(
+            {
+                "messages": len(session),
+                "context_tokens": estimate_tokens(context),
+                "full_history_tokens": estimate_tokens(session.render()),
+                "planted_turn_recalled": PLANTED_TURN[0] in context,
+            }
+        )
+        session_manager.clear_session(session_id)
+
+    print(f"\n{'Messages':>9}{'context tok':>13}{'full tok':>10}{'recalled':>10}")
+    for row in rows:
+        print(
+            f"{row['messages']:>9}{row['context_tokens']:>13}{row['full_history_tokens']:>10}"
+            f"{'yes' if row['planted_turn_recalled'] else 'no':>10}"
+        )
+
+    failures = []
+    smallest, largest = rows[0]["context_tokens"], rows[-1]["context_tokens"]
+    if largest > smallest * MAX_GROWTH:
+        failures.append(f"context grew from {smallest} to {largest} tokens")
+    failures += [
+        f"planted turn not recalled at {row['messages']} messages"
+        for row in rows
+        if not row["planted_turn_recalled"]
+    ]
+    write_report(args.output, {"config": vars(args), "sizes": rows, "failures": failures})
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ Context size stays constant and the relevant early turn is recalled")
+
+
+if __name__ == "__main__":
+    main()
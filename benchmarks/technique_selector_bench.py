@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Latency of the technique step: LLM technique planning vs. local selection.
+
+Runs therapeutic sessions built from the counseling fixture in-process, once
+with TECHNIQUE_SELECTOR=llm and once with local (each mode in its own
+subprocess, since the mode is read at import). Reports the technique step's
+latency, its LLM calls and tokens, how often the local selector fell back to
+the LLM, which techniques it picked, and the overall turn latency.
+
+Start the mock with a per-output-token latency so the LLM step's output
+shows up in latency. The mock's hashed bag-of-words embeddings score far
+lower than ada-002, so lower the selector's threshold to match, e.g.:
+  python -m benchmarks.mock_services --port 8100 --chat-latency-ms 150 --output-token-latency-ms 4
+  python -m benchmarks.technique_selector_bench --sessions 2 --turns 8 --min-similarity 0.1
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from benchmarks.common import labelled_metrics, latency_summary, load_jsonl, write_report
+
+DEFAULT_FIXTURE = "benchmarks/fixtures/counseling_conversations.jsonl"
+MODES = ("llm", "local")
+
+
+def run_mode(fixture, sessions, turns, output_path):
+    """Child process: run the sessions under the mode set in the environment"""
+    from server.chat_model import ChatRequest
+    from server.metrics import metrics
+    from server.pipeline import background_executor, process_chat_turn
+    from server.session_manager import session_manager
+
+    messages = [record["Context"] for record in load_jsonl(fixture)]
+    turn_ms = []
+    for s in range(sessions):
+        session_id = f"technique-{s}-{uuid.uuid4().hex[:8]}"
+        for t in range(turns):
+            message = messages[(s * turns + t) % len(messages)]
+            started = time.perf_counter()
+            response = process_chat_turn(ChatRequest(message=message, session_id=session_id))
+            if response.classification == "THERAPEUTIC":
+                turn_ms.append((time.perf_counter() - started) * 1000)
+        session_manager.clear_session(session_id)
+    background_executor.shutdown(wait=True)
+
+    def by_label(name, label):
+        return {
+            labels[label]: int(value)
+            for labels, value in labelled_metrics(metrics.counters, name)
+        }
+
+    technique_tokens = {
+        labels["kind"]: int(value)
+        for labels, value in labelled_metrics(metrics.counters, "llm.tokens")
+        if labels["stage"] == "technique"
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "turn_ms": turn_ms,
+                "technique_seconds": metrics.snapshot()["histograms"].get(
+                    "pipeline.stage_seconds{stage=technique}", {}
+                ),
+                "technique_llm_calls": sum(
+                    value for stage, value in by_label("llm.calls", "stage").items() if stage == "technique"
+                ),
+                "technique_tokens": technique_tokens,
+                "decisions": by_label("technique_selector.decisions", "source"),
+                "selected": by_label("technique_selector.selected", "technique"),
+            },
+            f,
+        )
+
+
+def summarise(mode, result):
+    seconds = result["technique_seconds"]
+    return {
+        "mode": mode,
+        "technique_ms": {
+            "mean": round(seconds.get("sum", 0) / max(seconds.get("count", 0), 1) * 1000, 1),
+            "p50": round(seconds.get("p50", 0) * 1000, 1),
+            "p95": round(seconds.get("p95", 0) * 1000, 1),
+        },
+        "technique_llm_calls": result["technique_llm_calls"],
+        "technique_tokens": result["technique_tokens"],
+        "decisions": result["decisions"],
+        "selected": result["selected"],
+        "turn_latency": latency_summary(result["turn_ms"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare LLM technique planning with local selection")
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+    parser.add_argument("--sessions", type=int, default=2)
+    parser.add_argument("--turns", type=int, default=8, help="Messages per session")
+    parser.add_argument(
+        "--min-similarity", type=float, default=None, help="TECHNIQUE_SELECTOR_MIN_SIMILARITY override"
+    )
+    parser.add_argument("--output", default="benchmarks/results/technique_selector_bench.json")
+    parser.add_argument("--run-mode-output", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode_output:
+        run_mode(args.fixture, args.sessions, args.turns, args.run_mode_output)
+        return
+
+    overrides = {}
+    if args.min_similarity is not None:
+        overrides["TECHNIQUE_SELECTOR_MIN_SIMILARITY"] = str(args.min_similarity)
+    rows = []
+    for mode in MODES:
+        print(f"🧩 Running {args.sessions} sessions of {args.turns} turns with TECHNIQUE_SELECTOR={mode}...")
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+            result_path = tmp.name
+        completed = subprocess.run(
+            [
+                sys.executable, "-m", "benchmarks.technique_selector_bench",
+                "--fixture", args.fixture,
+                "--sessions", str(args.sessions),
+                "--turns", str(args.turns),
+                "--run-mode-output", result_path,
+            ],
+            env={**os.environ, **overrides, "TECHNIQUE_SELECTOR": mode},
+            stdout=subprocess.DEVNULL,
+        )
+        if completed.returncode != 0:
+            print(f"❌ Mode '{mode}' failed (exit {completed.returncode})")
+            sys.exit(1)
+        with open(result_path, encoding="utf-8") as f:
+            rows.append(summarise(mode, json.load(f)))
+        os.remove(result_path)
+
+    print(
+        f"\n{'Mode':<8}{'step mean':>11}{'step p95':>10}{'LLM calls':>11}{'local':>7}"
+        f"{'turn p50':>10}{'turn p95':>10}"
+    )
+    for row in rows:
+        step, latency = row["technique_ms"], row["turn_latency"]
+        print(
+            f"{row['mode']:<8}{step['mean']:>11}{step['p95']:>10}{row['technique_llm_calls']:>11}"
+            f"{row['decisions'].get('local', 0):>7}{latency['p50_ms']:>10}{latency['p95_ms']:>10}"
+        )
+    llm, local = rows
+    print(f"\nSelected locally: {', '.join(f'{t} x{n}' for t, n in sorted(local['selected'].items()))}")
+
+    report = {
+        "config": vars(args),
+        "modes": rows,
+        "technique_ms_saved_per_turn": round(llm["technique_ms"]["mean"] - local["technique_ms"]["mean"], 1),
+        "turn_p50_ms_saved": round(llm["turn_latency"]["p50_ms"] - local["turn_latency"]["p50_ms"], 1),
+    }
+    print(
+        f"Local selection saves {report['technique_ms_saved_per_turn']} ms per therapeutic turn "
+        f"in the technique step ({report['turn_p50_ms_saved']} ms at turn p50)"
+    )
+    write_report(args.output, report)
+
+
+if __name__ == "__main__":
+    main()
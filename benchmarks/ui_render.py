@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Streamlit UI render time for long sessions.
+
+Runs the frontend headlessly with Streamlit's AppTest for sessions of 10, 100
+and 1000 messages and reports p50/p95 time for:
+  full_run      a full app run with the windowed history (HISTORY_WINDOW)
+  full_run_all  a full app run drawing every message (window widened to the session)
+  turn          submitting one chat message
+  turn_n        the --turns'th message of one ongoing session
+
+AppTest reruns the whole script on every interaction, while in a browser a
+turn reruns only the conversation fragment. turn_n therefore runs the app
+through fragment_app(), which renders just that fragment after the first
+run and goes back to a full run when the app calls st.rerun(), as Streamlit
+would.
+
+No server is needed: with nothing listening on the API port the turn fails
+fast, so its time is the UI's own work rather than the model's.
+  python -m benchmarks.ui_render --sizes 10 100 1000 --repeats 5 --turns 45
+"""
+
+import argparse
+import os
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.common import latency_summary, write_report
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend")
+APP_PATH = os.path.join(FRONTEND_DIR, "main.py")
+
+
+def session_messages(count):
+    return [
+        {
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"Message {i}: I keep replaying the meeting at work and worrying about what they think of me.",
+        }
+        for i in range(count)
+    ]
+
+
+def fragment_app(frontend_dir):
+    """The frontend page, rerunning only the conversation fragment on a turn"""
+    import sys
+
+    sys.path.insert(0, frontend_dir)
+    import streamlit as st
+    from chat_interface import ChatInterface
+    from sidebar import Sidebar
+
+    # st.rerun() leaves the run before the flag is set, so the next run is a full one
+    full_run = st.session_state.pop("fragment_only", False) is False
+    chat_interface = ChatInterface()
+    if full_run:
+        Sidebar().render()
+        chat_interface.render()
+    else:
+        chat_interface._render_conversation()
+    st.session_state.fragment_only = True
+
+
+def new_app(count, window=None, fragments=False):
+    if fragments:
+        app = AppTest.from_function(fragment_app, default_timeout=60, args=(FRONTEND_DIR,))
+    else:
+        app = AppTest.from_file(APP_PATH, default_timeout=60)
+    app.session_state["session_id"] = f"ui-render-{count}"
+    app.session_state["messages"] = session_messages(count)
+    app.session_state["has_therapeutic_content"] = True
+    if window is not None:
+        app.session_state["history_window"] = window
+    return app
+
+
+def timed(run):
+    started = time.perf_counter()
+    run()
+    return (time.perf_counter() - started) * 1000
+
+
+def submit(app):
+    app.chat_input[0].set_value("I can't stop worrying about work").run()
+    if app.exception:
+        raise RuntimeError(f"App raised: {app.exception}")
+
+
+def measure(count, repeats, turns):
+    samples = {"full_run": [], "full_run_all": [], "turn": [], "turn_n": []}
+    for _ in range(repeats):
+        app = new_app(count)
+        samples["full_run"].append(timed(app.run))
+        samples["turn"].append(timed(lambda: submit(app)))
+
+        app = new_app(count, fragments=True)
+        app.run()
+        for _ in range(turns - 1):
+            submit(app)
+        samples["turn_n"].append(timed(lambda: submit(app)))
+
+        app = new_app(count, window=count)
+        samples["full_run_all"].append(timed(app.run))
+    return {
+        "messages": count,
+        **{name: latency_summary(values) for name, values in samples.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Streamlit UI render time")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--turns", type=int, default=45, help="Turn of the ongoing session timed as turn_n")
+    parser.add_argument("--output", default="benchmarks/results/ui_render.json")
+    args = parser.parse_args()
+
+    rows = []
+    for count in args.sizes:
+        print(f"🖥️  Rendering a {count}-message session x {args.repeats}...")
+        rows.append(measure(count, args.repeats, args.turns))
+
+    turn_n = f"turn {args.turns}"
+    print(
+        f"\n{'Messages':>9}{'full p50':>11}{'all p50':>11}{'turn p50':>11}{'turn p95':>11}"
+        f"{f'{turn_n} p50':>14}{f'{turn_n} p95':>14}"
+    )
+    for row in rows:
+        print(
+            f"{row['messages']:>9}{row['full_run']['p50_ms']:>11}{row['full_run_all']['p50_ms']:>11}"
+            f"{row['turn']['p50_ms']:>11}{row['turn']['p95_ms']:>11}"
+            f"{row['turn_n']['p50_ms']:>14}{row['turn_n']['p95_ms']:>14}"
+        )
+    write_report(args.output, {"config": vars(args), "sizes": rows})
+
+
+if __name__ == "__main__":
+    main()
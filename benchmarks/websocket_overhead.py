@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Per-turn transport overhead: HTTP vs. the session WebSocket.
+
+Replays the scripted sessions against a running server three ways and reports
+per-turn latency for each:
+  http_per_request  a new connection per turn, as requests.post in the frontend
+  http_keepalive    one pooled connection per session (requests.Session)
+  websocket         one /ws/{session_id} connection per session; also reports
+                    time to the first visible text (first token or reply)
+
+Run against a zero-latency mock so the transport is what shows up:
+  python -m benchmarks.mock_services --port 8100 --chat-latency-ms 0
+  uvicorn server.main:app --port 8000   (with the offline env from the README)
+  python -m benchmarks.websocket_overhead --passes 3
+"""
+
+import argparse
+import json
+import time
+import uuid
+
+import requests
+from websockets.sync.client import connect
+
+from benchmarks.common import latency_summary, load_jsonl, write_report
+
+DEFAULT_TRANSCRIPTS = "benchmarks/fixtures/scripted_sessions.jsonl"
+TRANSPORTS = ("http_per_request", "http_keepalive", "websocket")
+
+
+def session_turns(transcript):
+    turns = [{"message": message} for message in transcript["turns"]]
+    if transcript.get("end_session"):
+        turns.append({"message": "Please provide a session conclusion.", "end_session": True})
+    return turns
+
+
+def run_http(api_url, transcript, keepalive):
+    session_id = f"ws-bench-{uuid.uuid4().hex[:8]}"
+    client = requests.Session() if keepalive else requests
+    latencies = []
+    for turn in session_turns(transcript):
+        started = time.perf_counter()
+        response = client.post(
+            f"{api_url}/chat", json={**turn, "session_id": session_id}, timeout=120
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+        if response.json()["is_session_ended"]:
+            break
+    if keepalive:
+        client.close()
+    return {"turn_ms": latencies, "first_text_ms": latencies}
+
+
+def run_websocket(api_url, transcript):
+    session_id = f"ws-bench-{uuid.uuid4().hex[:8]}"
+    latencies, first_text = [], []
+    with connect(f"{api_url.replace('http', 'ws', 1)}/ws/{session_id}") as socket:
+        for turn in session_turns(transcript):
+            turn_id = uuid.uuid4().hex
+            started = time.perf_counter()
+            socket.send(json.dumps({"type": "user_turn", "turn_id": turn_id, **turn}))
+            first = None
+            while True:
+                event = json.loads(socket.recv(timeout=120))
+                if event["type"] == "token" and first is None:
+                    first = time.perf_counter()
+                if event.get("turn_id") != turn_id:
+                    continue
+                if event["type"] == "error":
+                    raise RuntimeError(f"Turn failed: {event}")
+                if event["type"] == "turn_complete":
+                    break
+            finished = time.perf_counter()
+            latencies.append((finished - started) * 1000)
+            first_text.append(((first or finished) - started) * 1000)
+            if event["is_session_ended"]:
+                break
+    return {"turn_ms": latencies, "first_text_ms": first_text}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare HTTP and WebSocket per-turn latency")
+    parser.add_argument("--api-url", default="http://localhost:8000")
+    parser.add_argument("--transcripts", default=DEFAULT_TRANSCRIPTS)
+    parser.add_argument("--passes", type=int, default=3)
+    parser.add_argument("--output", default="benchmarks/results/websocket_overhead.json")
+    args = parser.parse_args()
+
+    transcripts = load_jsonl(args.transcripts)
+    samples = {transport: {"turn_ms": [], "first_text_ms": []} for transport in TRANSPORTS}
+    print(f"🔌 Replaying {len(transcripts)} sessions x {args.passes} passes per transport")
+    for _ in range(args.passes):
+        # Interleave transports so server warm-up and drift affect each equally
+        for transcript in transcripts:
+            for transport in TRANSPORTS:
+                if transport == "websocket":
+                    result = run_websocket(args.api_url, transcript)
+                else:
+                    result = run_http(
+                        args.api_url, transcript, keepalive=transport == "http_keepalive"
+                    )
+                for key, values in result.items():
+                    samples[transport][key].extend(values)
+
+    rows = {
+        transport: {
+            "turn_latency": latency_summary(values["turn_ms"]),
+            "first_text_latency": latency_summary(values["first_text_ms"]),
+        }
+        for transport, values in samples.items()
+    }
+    print(f"\n{'Transport':<20}{'turns':>7}{'p50 ms':>10}{'p95 ms':>10}{'first p50':>11}{'first p95':>11}")
+    for transport, row in rows.items():
+        turn, first = row["turn_latency"], row["first_text_latency"]
+        print(
+            f"{transport:<20}{turn['count']:>7}{turn['p50_ms']:>10}{turn['p95_ms']:>10}"
+            f"{first['p50_ms']:>11}{first['p95_ms']:>11}"
+        )
+    write_report(args.output, {"config": vars(args), "transports": rows})
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
+import uuid
+
 import requests
 import streamlit as st
+from opentelemetry.trace import SpanKind, Status, StatusCode
 
 from constants import *
+from config import *
+from session_content import has_therapeutic_content
+from session_socket import SessionSocket
+from tracing import trace_headers, tracer
 
 
 class ChatInterface:
@@ -13,18 +20,87 @@ class ChatInterface:
         if "messages" not in st.session_state:
             st.session_state.messages = []
         if "session_id" not in st.session_state:
-            import uuid
+            # The session id is kept in the URL so a page reload resumes the session
+            session_id = st.query_params.get("session")
+            if session_id:
+                st.session_state.session_id = session_id
+                self._restore_session()
+            else:
+                st.session_state.session_id = str(uuid.uuid4())
+                st.query_params["session"] = st.session_state.session_id
 
-            st.session_state.session_id = str(uuid.uuid4())
+    def _restore_session(self):
+        """Load the latest page of a server-side session after a page reload"""
+        try:
+            info = requests.get(
+                f"{self.api_url}/sessions/{st.session_state.session_id}", timeout=10
+            )
+            if info.status_code != 200:
+                return
+            page = self._fetch_history_page()
+        except requests.exceptions.RequestException:
+            return
+        if page is None:
+            return
+
+        messages = self._to_display_messages(page["messages"])
+        if info.json()["is_session_ended"]:
+            st.session_state.session_ended = True
+            # The session's last assistant message is its conclusion
+            for message in reversed(messages):
+                if message["role"] == "assistant":
+                    message["is_conclusion"] = True
+                    break
+        st.session_state.messages = messages
+        st.session_state.history_cursor = page["next_cursor"]
+        self._update_therapeutic_content()
+
+    def _fetch_history_page(self, before=None):
+        params = {"limit": HISTORY_PAGE_SIZE}
+        if before is not None:
+            params["before"] = before
+        response = requests.get(
+            f"{self.api_url}/sessions/{st.session_state.session_id}/messages",
+            params=params,
+            timeout=10,
+        )
+        return response.json() if response.status_code == 200 else None
+
+    def _to_display_messages(self, history):
+        # The conclusion request is sent by this client, not typed by the user
+        return [
+            {"role": message["role"], "content": message["content"]}
+            for message in history
+            if not (message["role"] == "user" and message["content"] == CONCLUSION_REQUEST)
+        ]
+
+    def _load_earlier_messages(self):
+        """Prepend the page of history before the oldest message on screen"""
+        try:
+            page = self._fetch_history_page(before=st.session_state.history_cursor)
+        except requests.exceptions.RequestException:
+            st.error("Couldn't load earlier messages. Please try again.")
+            return
+        if page is None:
+            return
+        earlier = self._to_display_messages(page["messages"])
+        st.session_state.messages = earlier + st.session_state.messages
+        st.session_state.history_cursor = page["next_cursor"]
+        # Keep the fragments' split point on the same message
+        st.session_state.turn_start += len(earlier)
+        st.session_state.history_window = (
+            st.session_state.get("history_window", HISTORY_WINDOW) + len(earlier)
+        )
 
     def render(self):
         # Always render header first to keep it at top
         self._render_header()
 
-        # Chat content
-        self._display_messages()
-        self._handle_input()
-        self._render_session_completion_message()
+        # Messages up to now are drawn once per full run; turns add to the
+        # conversation fragment, which reruns on its own
+        st.session_state.turn_start = len(st.session_state.messages)
+        self._render_history()
+        self._render_conversation()
 
     def _render_header(self):
         # Create a prominent header that stays at top
@@ -34,18 +110,55 @@ class ChatInterface:
         )
         st.markdown("---")  # Add separator after header
 
-    def _display_messages(self):
-        for message in st.session_state.messages:
-            if message["role"] == "user":
-                st.chat_message("user").write(message["content"])
-            else:
-                if message.get("is_conclusion", False):
-                    # Style the conclusion differently
-                    st.chat_message("assistant").markdown(
-                        f"🎯 **Session Conclusion:**\n\n{message['content']}"
-                    )
-                else:
-                    st.chat_message("assistant").write(message["content"])
+    @st.fragment
+    def _render_history(self):
+        """Messages from before the last full run, windowed for long sessions"""
+        history = st.session_state.messages[: st.session_state.turn_start]
+        window = st.session_state.get("history_window", HISTORY_WINDOW)
+        hidden = max(len(history) - window, 0)
+
+        # Hidden messages are shown a window at a time; older history is fetched from the server
+        if hidden or st.session_state.get("history_cursor"):
+            st.button(
+                LOAD_EARLIER_BUTTON,
+                use_container_width=True,
+                on_click=self._show_earlier_messages,
+                args=(hidden,),
+            )
+
+        for message in history[hidden:]:
+            self._render_message(message)
+
+    @st.fragment
+    def _render_conversation(self):
+        """Messages since the last full run, the chat input and the turn in progress.
+
+        Submitting a message reruns only this fragment, so a turn draws just the
+        messages added since the last full run (at most CONVERSATION_WINDOW)
+        instead of the whole history.
+        """
+        for message in st.session_state.messages[st.session_state.turn_start :]:
+            self._render_message(message)
+        self._handle_input()
+        self._render_session_completion_message()
+
+    def _render_message(self, message):
+        if message["role"] == "user":
+            st.chat_message("user").write(message["content"])
+        elif message.get("is_conclusion", False):
+            # Style the conclusion differently
+            st.chat_message("assistant").markdown(
+                f"🎯 **Session Conclusion:**\n\n{message['content']}"
+            )
+        else:
+            st.chat_message("assistant").write(message["content"])
+
+    def _show_earlier_messages(self, hidden):
+        if hidden:
+            window = st.session_state.get("history_window", HISTORY_WINDOW)
+            st.session_state.history_window = window + HISTORY_WINDOW
+        else:
+            self._load_earlier_messages()
 
     def _render_session_completion_message(self):
         # Only show completion message if session is ended
@@ -65,7 +178,7 @@ class ChatInterface:
             delattr(st.session_state, "end_session_requested")
 
             # Check if there's therapeutic content before ending
-            if not self._has_therapeutic_content():
+            if not st.session_state.get("has_therapeutic_content", False):
                 st.error(
                     "⚠️ Cannot end session without meaningful therapeutic conversation. Please share your thoughts or concerns first."
                 )
@@ -85,100 +198,124 @@ class ChatInterface:
                 {"role": "assistant", "content": conclusion, "is_conclusion": True}
             )
             st.session_state.session_ended = True
+            # Full rerun to remove the input and update the sidebar
             st.rerun()
             return
 
-        if user_input := st.chat_input(CHAT_INPUT_PLACEHOLDER):
-            # Add user message and display it immediately
-            self._add_user_message(user_input)
-            st.rerun()
-
-        # Check if we need to process a bot response
-        if hasattr(st.session_state, "pending_user_input"):
-            user_input = st.session_state.pending_user_input
-            delattr(st.session_state, "pending_user_input")
+        user_input = st.chat_input(CHAT_INPUT_PLACEHOLDER)
+        if not user_input:
+            return
 
-            # Show typing indicator while getting response
-            with st.chat_message("assistant"):
+        # Display the user message immediately and answer it in the same run
+        st.session_state.messages.append({"role": "user", "content": user_input})
+        st.chat_message("user").write(user_input)
+        # Sent as the idempotency key, so retries of this message are answered once
+        message_id = str(uuid.uuid4())
+
+        # One trace per turn, from submitting the message to the reply being shown
+        with tracer.start_as_current_span(
+            "chat.turn",
+            attributes={"session.id": st.session_state.session_id, "websocket": USE_WEBSOCKET},
+        ), st.chat_message("assistant"):
+            if USE_WEBSOCKET:
+                # Stream stage progress and reply tokens as the server produces them
+                bot_response = self._stream_bot_response(user_input, message_id)
+            else:
+                # Show typing indicator while getting response
                 with st.spinner("Thinking..."):
                     # Get the response from API first
-                    bot_response = self._get_bot_response(user_input)
+                    bot_response = self._get_bot_response(user_input, message_id)
 
                 # Now stream the response with typing effect
                 self._stream_response(bot_response)
 
-            # Check if this was a natural session conclusion
-            if st.session_state.get("is_natural_conclusion", False):
-                # Add the response as a conclusion to messages
-                st.session_state.messages.append(
-                    {
-                        "role": "assistant",
-                        "content": bot_response,
-                        "is_conclusion": True,
-                    }
-                )
-                delattr(st.session_state, "is_natural_conclusion")
-            else:
-                # Add the response to messages normally
+        # Check if this was a natural session conclusion
+        if st.session_state.get("is_natural_conclusion", False):
+            # Add the response as a conclusion to messages
+            st.session_state.messages.append(
+                {
+                    "role": "assistant",
+                    "content": bot_response,
+                    "is_conclusion": True,
+                }
+            )
+            delattr(st.session_state, "is_natural_conclusion")
+        else:
+            # Add the response to messages normally
+            st.session_state.messages.append(
+                {"role": "assistant", "content": bot_response}
+            )
+
+        # A crisis safety response is followed by a fuller reply generated in the background
+        if st.session_state.get("awaiting_follow_up", False):
+            delattr(st.session_state, "awaiting_follow_up")
+            with st.chat_message("assistant"):
+                with st.spinner("Thinking..."):
+                    follow_ups = self._get_follow_up_messages()
+                for follow_up in follow_ups:
+                    self._stream_response(follow_up)
+            for follow_up in follow_ups:
                 st.session_state.messages.append(
-                    {"role": "assistant", "content": bot_response}
+                    {"role": "assistant", "content": follow_up}
                 )
 
+        # The sidebar only changes when the session ends or becomes endable, so
+        # only those turns need a full rerun; one is also made once the fragment
+        # holds CONVERSATION_WINDOW messages, moving them into the windowed history
+        became_endable = self._update_therapeutic_content()
+        turn_messages = len(st.session_state.messages) - st.session_state.turn_start
+        if (
+            became_endable
+            or st.session_state.get("session_ended", False)
+            or turn_messages >= CONVERSATION_WINDOW
+        ):
             st.rerun()
 
-    def _add_user_message(self, content):
-        st.session_state.messages.append({"role": "user", "content": content})
-        # Set flag to process bot response on next rerun
-        st.session_state.pending_user_input = content
-
-    def _has_therapeutic_content(self):
-        """Check if the session has meaningful therapeutic content"""
-        messages = st.session_state.get("messages", [])
+    def _update_therapeutic_content(self):
+        """Refresh the cached therapeutic-content flag; True if it just turned on.
 
-        # Need at least one user message and one assistant response for therapeutic content
-        if len(messages) < 2:
+        Messages only grow, so once the flag is set it stays set and the
+        heuristic is not run again.
+        """
+        if st.session_state.get("has_therapeutic_content", False):
             return False
-
-        # Check if there are any user messages that seem therapeutic
-        user_messages = [msg for msg in messages if msg["role"] == "user"]
-
-        # Simple heuristic: if user has sent more than just greetings/procedural messages
-        # or if there are multiple exchanges, assume therapeutic content exists
-        if len(user_messages) >= 2:
-            return True
-
-        # Check if the single user message seems substantive (not just greeting)
-        if len(user_messages) == 1:
-            user_msg = user_messages[0]["content"].lower().strip()
-            greeting_patterns = [
-                "hi",
-                "hello",
-                "hey",
-                "good morning",
-                "good afternoon",
-                "nice to meet",
-                "should we start",
-                "how are you",
-                "doctor",
-            ]
-            # If message is longer than 20 chars and doesn't match greeting patterns, consider it therapeutic
-            if len(user_msg) > 20 and not any(
-                pattern in user_msg for pattern in greeting_patterns
-            ):
-                return True
-
-        return False
+        st.session_state.has_therapeutic_content = has_therapeutic_content(
+            st.session_state.messages
+        )
+        return st.session_state.has_therapeutic_content
+
+    def _post_chat(self, payload, message_id, timeout):
+        """POST a turn, retrying timeouts and dropped connections with the same key.
+
+        The Idempotency-Key makes a retry wait for (or replay) the original
+        turn on the server instead of running it a second time.
+        """
+        for attempt in range(BOT_RESPONSE_RETRIES + 1):
+            with tracer.start_as_current_span(
+                "POST /chat",
+                kind=SpanKind.CLIENT,
+                attributes={"http.request.method": "POST", "attempt": attempt},
+            ) as span:
+                try:
+                    response = requests.post(
+                        f"{self.api_url}/chat",
+                        json={**payload, "session_id": st.session_state.session_id},
+                        headers={"Idempotency-Key": message_id, **trace_headers()},
+                        timeout=timeout,
+                    )
+                    span.set_attribute("http.response.status_code", response.status_code)
+                    return response
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    span.set_status(Status(StatusCode.ERROR, type(e).__name__))
+                    if attempt == BOT_RESPONSE_RETRIES:
+                        raise
 
     def _get_session_conclusion(self):
         """Get session conclusion from the API"""
         try:
-            response = requests.post(
-                f"{self.api_url}/chat",
-                json={
-                    "message": "Please provide a session conclusion.",
-                    "session_id": st.session_state.session_id,
-                    "end_session": True,
-                },
+            response = self._post_chat(
+                {"message": CONCLUSION_REQUEST, "end_session": True},
+                message_id=str(uuid.uuid4()),
                 timeout=60,
             )
 
@@ -190,34 +327,125 @@ class ChatInterface:
         except requests.exceptions.RequestException:
             return "Thank you for our conversation today. Take care of yourself and remember that seeking help is a sign of strength."
 
-    def _get_bot_response(self, user_input):
+    def _get_bot_response(self, user_input, message_id):
         try:
             # Call FastAPI backend
-            response = requests.post(
-                f"{self.api_url}/chat",
-                json={
-                    "message": user_input,
-                    "session_id": st.session_state.session_id,
-                },
-                timeout=120,
+            response = self._post_chat(
+                {"message": user_input, "deadline_seconds": RESPONSE_DEADLINE_SECONDS},
+                message_id=message_id,
+                timeout=BOT_RESPONSE_TIMEOUT,
             )
 
             if response.status_code == 200:
-                response_data = response.json()
-
-                # Check if the session was naturally ended by the bot
-                if response_data.get("is_session_ended", False):
-                    st.session_state.session_ended = True
-                    # Mark this as a conclusion for special formatting
-                    st.session_state.is_natural_conclusion = True
-
-                return response_data["response"]
+                return self._apply_turn_result(response.json())
+            elif response.status_code == 429:
+                return SERVER_BUSY_RESPONSE
             else:
                 return "Sorry, I'm having trouble connecting right now."
 
         except requests.exceptions.RequestException:
             return "Connection error. Please check if the server is running."
 
+    def _apply_turn_result(self, response_data):
+        """Record the session flags carried by a chat response and return its text"""
+        # The server is still generating a follow-up (e.g. after a crisis response)
+        if response_data.get("follow_up_pending", False):
+            st.session_state.awaiting_follow_up = True
+
+        # Check if the session was naturally ended by the bot
+        if response_data.get("is_session_ended", False):
+            st.session_state.session_ended = True
+            # Mark this as a conclusion for special formatting
+            st.session_state.is_natural_conclusion = True
+
+        return response_data["response"]
+
+    def _get_session_socket(self):
+        """Reuse the session's WebSocket across reruns, replacing it for a new session"""
+        socket = st.session_state.get("session_socket")
+        if socket is None or socket.session_id != st.session_state.session_id:
+            if socket is not None:
+                socket.close()
+            socket = SessionSocket(self.api_url, st.session_state.session_id)
+            st.session_state.session_socket = socket
+        return socket
+
+    def _stream_bot_response(self, user_input, message_id):
+        """Stream a turn over the session WebSocket, falling back to HTTP"""
+        status = st.empty()
+        status.caption("Thinking...")
+        result = {}
+
+        def event_stream():
+            streamed = False
+            try:
+                for event in self._get_session_socket().turn_events(
+                    user_input,
+                    timeout=BOT_RESPONSE_TIMEOUT,
+                    deadline_seconds=RESPONSE_DEADLINE_SECONDS,
+                    client_message_id=message_id,
+                    trace_context=trace_headers(),
+                ):
+                    if event["type"] == "stage":
+                        status.caption(STAGE_LABELS.get(event["stage"], "Thinking..."))
+                    elif event["type"] == "token":
+                        streamed = True
+                        yield event["delta"]
+                    elif event["type"] == "turn_complete":
+                        result["response"] = self._apply_turn_result(event)
+                        if not streamed:
+                            yield result["response"]
+                    elif event.get("status") == 429:
+                        result["response"] = SERVER_BUSY_RESPONSE
+                        yield SERVER_BUSY_RESPONSE
+                    else:
+                        result["response"] = "Sorry, I'm having trouble connecting right now."
+                        yield result["response"]
+            except ConnectionError:
+                if streamed:
+                    result["response"] = "Connection error. Please check if the server is running."
+                else:
+                    # The socket is unavailable, so send the turn over HTTP instead; the
+                    # same message id keeps a turn the socket did deliver from running twice
+                    status.caption("Thinking...")
+                    result["response"] = self._get_bot_response(user_input, message_id)
+                yield result["response"]
+
+        st.write_stream(event_stream())
+        status.empty()
+        return result.get("response", "Sorry, I'm having trouble connecting right now.")
+
+    def _get_follow_up_messages(self):
+        """Collect follow-up messages generated in the background"""
+        import time
+
+        # Connected sockets get the follow-up pushed instead of polling for it
+        socket = st.session_state.get("session_socket")
+        if USE_WEBSOCKET and socket is not None and socket.connected:
+            event = socket.wait_for(("follow_up", "follow_up_failed"), BOT_RESPONSE_TIMEOUT)
+            if event is not None and event["type"] == "follow_up":
+                return [event["message"]]
+            return []
+
+        messages = []
+        deadline = time.time() + BOT_RESPONSE_TIMEOUT
+        while time.time() < deadline:
+            try:
+                response = requests.get(
+                    f"{self.api_url}/sessions/{st.session_state.session_id}/pending",
+                    timeout=10,
+                )
+                if response.status_code != 200:
+                    break
+                data = response.json()
+                messages.extend(data["messages"])
+                if not data["in_progress"]:
+                    break
+            except requests.exceptions.RequestException:
+                break
+            time.sleep(FOLLOW_UP_POLL_INTERVAL)
+        return messages
+
     def _stream_response(self, bot_response):
         import time
 
@@ -1,3 +1,23 @@
+import os
+
 # Layout Settings
 LAYOUT = "wide"
 SIDEBAR_STATE = "expanded"
+
+# API Settings
+BOT_RESPONSE_TIMEOUT = 120  # Seconds to wait for a chat response
+BOT_RESPONSE_RETRIES = 1  # Retries after a timeout or dropped connection (same idempotency key)
+RESPONSE_DEADLINE_SECONDS = 100  # Server-side budget, kept below the client timeout
+FOLLOW_UP_POLL_INTERVAL = 2  # Seconds between polls for background follow-ups
+USE_WEBSOCKET = True  # Stream turns over the session WebSocket, falling back to HTTP
+HISTORY_PAGE_SIZE = 20  # Messages restored on reload and per 'load earlier' page
+
+# Rendering Settings
+HISTORY_WINDOW = 50  # Earlier messages drawn on a full run; more are shown on demand
+CONVERSATION_WINDOW = 20  # Messages a turn redraws before a full run moves them into the history
+SESSION_INFO_REFRESH_SECONDS = 2  # Sidebar message count refresh interval
+
+# Tracing Settings (same variables as the server; "otlp", "console", "file" or "none")
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACING_FILE_PATH = os.getenv("TRACING_FILE_PATH", "traces.jsonl")
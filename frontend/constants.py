@@ -11,3 +11,18 @@ MESSAGES_METRIC = "Message count"
 # Chat Text
 CHAT_INPUT_PLACEHOLDER = "Type your message here."
 DEFAULT_BOT_RESPONSE = "I hear you saying: {}. Tell me more about that."
+LOAD_EARLIER_BUTTON = "⬆️ Load earlier messages"
+CONCLUSION_REQUEST = "Please provide a session conclusion."
+SERVER_BUSY_RESPONSE = "I'm with a lot of patients right now. Please send your message again in a moment."
+
+# Progress shown while a turn streams over the session WebSocket
+STAGE_LABELS = {
+    "queued": "Waiting for a free therapist...",
+    "classification": "Reading your message...",
+    "simple_response": "Thinking...",
+    "assessment": "Understanding what you're going through...",
+    "technique": "Choosing an approach...",
+    "retrieval": "Recalling similar conversations...",
+    "response": "Writing a reply...",
+    "conclusion": "Preparing your session conclusion...",
+}
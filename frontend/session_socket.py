@@ -0,0 +1,119 @@
+import json
+import time
+import uuid
+
+from websockets.exceptions import WebSocketException
+from websockets.sync.client import connect
+
+# Events that belong to a single turn; the server tags them with its turn_id
+TURN_EVENTS = ("stage", "token", "turn_complete", "error")
+
+
+class SessionSocket:
+    """Client for the server's /ws/{session_id} channel.
+
+    Kept in st.session_state so one connection is reused across turns and
+    reruns. Events that arrive outside a turn (follow-ups, summary and draft
+    updates) are buffered until the interface asks for them.
+    """
+
+    def __init__(self, api_url: str, session_id: str, open_timeout: float = 5):
+        self.url = f"{api_url.replace('http', 'ws', 1)}/ws/{session_id}"
+        self.session_id = session_id
+        self.open_timeout = open_timeout
+        self.connection = None
+        self.buffered = []
+
+    def _ensure_connection(self):
+        if self.connection is None:
+            self.connection = connect(self.url, open_timeout=self.open_timeout)
+
+    def _receive(self, timeout):
+        try:
+            return json.loads(self.connection.recv(timeout=timeout))
+        except TimeoutError:
+            return None
+
+    def turn_events(
+        self,
+        message,
+        timeout,
+        end_session=False,
+        deadline_seconds=None,
+        client_message_id=None,
+        trace_context=None,
+    ):
+        """Send a user turn and yield its events until turn_complete or error.
+
+        Raises ConnectionError if the socket cannot be used, so callers can
+        fall back to HTTP. trace_context (W3C traceparent headers) makes the
+        server's spans for the turn part of the caller's trace.
+        """
+        turn_id = str(uuid.uuid4())
+        payload = {
+            "type": "user_turn",
+            "turn_id": turn_id,
+            "message": message,
+            "end_session": end_session,
+            "deadline_seconds": deadline_seconds,
+            "client_message_id": client_message_id,
+            "trace_context": trace_context,
+        }
+        try:
+            self._ensure_connection()
+            self.connection.send(json.dumps(payload))
+            expires_at = time.time() + timeout
+            while time.time() < expires_at:
+                event = self._receive(timeout=max(expires_at - time.time(), 0))
+                if event is None:
+                    break
+                if event["type"] in TURN_EVENTS and event.get("turn_id") not in (None, turn_id):
+                    # Another turn on the session, e.g. one sent from a second tab
+                    continue
+                if event["type"] in ("stage", "token"):
+                    yield event
+                elif event.get("turn_id") == turn_id and event["type"] in (
+                    "turn_complete",
+                    "error",
+                ):
+                    yield event
+                    return
+                else:
+                    self.buffered.append(event)
+        except (OSError, WebSocketException) as e:
+            self.close()
+            raise ConnectionError(str(e)) from e
+        yield {"type": "error", "turn_id": turn_id, "status": 504, "detail": "Timed out"}
+
+    @property
+    def connected(self):
+        return self.connection is not None
+
+    def wait_for(self, event_types, timeout):
+        """Return the next event of the given types, buffered or pushed within the timeout"""
+        for event in self.buffered:
+            if event["type"] in event_types:
+                self.buffered.remove(event)
+                return event
+        if not self.connected:
+            return None
+        try:
+            expires_at = time.time() + timeout
+            while time.time() < expires_at:
+                event = self._receive(timeout=max(expires_at - time.time(), 0))
+                if event is None:
+                    return None
+                if event["type"] in event_types:
+                    return event
+                self.buffered.append(event)
+        except (OSError, WebSocketException):
+            self.close()
+        return None
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except (OSError, WebSocketException):
+                pass
+            self.connection = None
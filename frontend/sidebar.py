@@ -1,6 +1,7 @@
 import streamlit as st
 
 from constants import *
+from config import *
 
 
 class Sidebar:
@@ -16,44 +17,6 @@ class Sidebar:
     def _render_header(self):
         st.header(SIDEBAR_HEADER)
 
-    def _has_therapeutic_content(self):
-        """Check if the session has meaningful therapeutic content"""
-        messages = st.session_state.get("messages", [])
-
-        # Need at least one user message and one assistant response for therapeutic content
-        if len(messages) < 2:
-            return False
-
-        # Check if there are any user messages that seem therapeutic
-        user_messages = [msg for msg in messages if msg["role"] == "user"]
-
-        # Simple heuristic: if user has sent more than just greetings/procedural messages
-        # or if there are multiple exchanges, assume therapeutic content exists
-        if len(user_messages) >= 2:
-            return True
-
-        # Check if the single user message seems substantive (not just greeting)
-        if len(user_messages) == 1:
-            user_msg = user_messages[0]["content"].lower().strip()
-            greeting_patterns = [
-                "hi",
-                "hello",
-                "hey",
-                "good morning",
-                "good afternoon",
-                "nice to meet",
-                "should we start",
-                "how are you",
-                "doctor",
-            ]
-            # If message is longer than 20 chars and doesn't match greeting patterns, consider it therapeutic
-            if len(user_msg) > 20 and not any(
-                pattern in user_msg for pattern in greeting_patterns
-            ):
-                return True
-
-        return False
-
     def _render_session_controls(self):
         # Check if session is active
         session_active = not st.session_state.get("session_ended", False)
@@ -62,8 +25,8 @@ class Sidebar:
             # Active session controls
             st.markdown("**Current Session**")
 
-            # Check if there's therapeutic content to end
-            has_therapeutic_content = self._has_therapeutic_content()
+            # Kept up to date by the chat interface as messages are added
+            has_therapeutic_content = st.session_state.get("has_therapeutic_content", False)
 
             # End session button
             with st.expander("End Session", expanded=False):
@@ -71,15 +34,14 @@ class Sidebar:
                     st.caption(
                         "The bot can naturally detect when you want to end the session, or you can manually end it here."
                     )
-                    if st.button(
+                    st.button(
                         "End Session Manually",
                         type="secondary",
                         help="Manually end the session and get a therapeutic conclusion",
                         use_container_width=True,
                         key="end_session_sidebar",
-                    ):
-                        st.session_state.end_session_requested = True
-                        st.rerun()
+                        on_click=self._request_end_session,
+                    )
                 else:
                     st.caption(
                         "⚠️ Start a conversation with meaningful content before ending the session. The bot needs therapeutic context to provide a proper conclusion."
@@ -96,23 +58,45 @@ class Sidebar:
             st.markdown("---")
 
             # New session button (for starting fresh)
-            if st.button(
-                "🆕 Start New Session", use_container_width=True, type="primary"
-            ):
-                st.session_state.clear()
-                st.rerun()
+            st.button(
+                "🆕 Start New Session",
+                use_container_width=True,
+                type="primary",
+                on_click=self._reset_session,
+            )
 
         else:
             # Session ended - show restart option
             st.markdown("**Session Ended**")
-            if st.button(
-                "🔄 Start New Session", use_container_width=True, type="primary"
-            ):
-                st.session_state.clear()
-                st.rerun()
+            st.button(
+                "🔄 Start New Session",
+                use_container_width=True,
+                type="primary",
+                on_click=self._reset_session,
+            )
+
+    # Button callbacks run before the next full run, so no extra st.rerun() is needed
+    def _request_end_session(self):
+        st.session_state.end_session_requested = True
+
+    def _reset_session(self):
+        # Close the old session's WebSocket before its state is dropped
+        if "session_socket" in st.session_state:
+            st.session_state.session_socket.close()
+        st.session_state.clear()
+        # Drop the resumable session id from the URL too
+        st.query_params.clear()
 
     def _render_session_info(self):
         st.markdown("---")
         st.subheader(SESSION_INFO_HEADER)
-        message_count = len(st.session_state.get("messages", []))
+        self._render_message_count()
+
+    @st.fragment(run_every=SESSION_INFO_REFRESH_SECONDS)
+    def _render_message_count(self):
+        # Turns rerun only the chat fragment, so the count refreshes on its own timer.
+        # Messages before the history cursor are on the server but not loaded yet.
+        message_count = len(st.session_state.get("messages", [])) + (
+            st.session_state.get("history_cursor") or 0
+        )
         st.metric(MESSAGES_METRIC, message_count)
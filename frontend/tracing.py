@@ -0,0 +1,63 @@
+import json
+import threading
+
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+
+from config import *
+
+SERVICE_NAME = "therapy-simulator-frontend"
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends finished spans to a file, one JSON object per line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        lines = "".join(json.dumps(json.loads(span.to_json())) + "\n" for span in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+def _create_exporter():
+    if TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter(endpoint=TRACING_OTLP_ENDPOINT)
+    if TRACING_EXPORTER == "console":
+        return ConsoleSpanExporter()
+    if TRACING_EXPORTER == "file":
+        return JsonLinesSpanExporter(TRACING_FILE_PATH)
+    return None
+
+
+# Streamlit re-runs the page script on every interaction but imports this
+# module once per process, so the provider is installed a single time
+_exporter = _create_exporter()
+if _exporter is not None:
+    _provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+    _provider.add_span_processor(BatchSpanProcessor(_exporter))
+    trace.set_tracer_provider(_provider)
+
+tracer = trace.get_tracer("therapy-simulator.frontend")
+
+
+def trace_headers():
+    """W3C trace context of the current span, for requests to the server"""
+    carrier = {}
+    propagate.inject(carrier)
+    return carrier
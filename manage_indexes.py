@@ -2,14 +2,26 @@
 """
 Pinecone Index Management Script
 This script helps you manage your Pinecone indexes for the therapy simulator.
+
+`migrate` moves the corpus to a new index built with another embedding model
+or dimension (blue/green): it re-embeds every record in batches, compares
+retrieval on a query set against the old index, and only then switches the
+server to the new index by atomically rewriting the active index pointer
+(server/active_index.json). `rollback` switches the pointer back. With
+--local-store, indexes are JSON files in a directory instead of Pinecone.
 """
 
 import sys
 import os
+import argparse
+import json
+from datetime import datetime
 from dotenv import load_dotenv
 from pinecone import Pinecone, ServerlessSpec
 import time
 
+import numpy as np
+
 # Load environment variables
 load_dotenv()
 
@@ -100,7 +112,264 @@ def create_index(
         return False
 
 
+class PineconeIndexStore:
+    """Index operations needed by migrate, on Pinecone"""
+
+    def __init__(self, pc):
+        self.pc = pc
+
+    def exists(self, index_name):
+        return index_name in self.pc.list_indexes().names()
+
+    def create(self, index_name, dimension):
+        if not create_index(self.pc, index_name, dimension=dimension):
+            raise RuntimeError(f"could not create index {index_name}")
+
+    def dimension(self, index_name):
+        return self.pc.describe_index(index_name).dimension
+
+    def count(self, index_name):
+        return self.pc.Index(index_name).describe_index_stats().total_vector_count
+
+    def records(self, index_name, batch_size):
+        """Yield batches of (id, metadata) for every record in the index"""
+        index = self.pc.Index(index_name)
+        for ids in index.list(limit=batch_size):
+            fetched = index.fetch(ids=ids).vectors
+            yield [(record_id, dict(vector.metadata or {})) for record_id, vector in fetched.items()]
+
+    def upsert(self, index_name, records):
+        self.pc.Index(index_name).upsert(
+            vectors=[
+                {"id": record_id, "values": values, "metadata": metadata}
+                for record_id, values, metadata in records
+            ]
+        )
+
+    def query(self, index_name, vector, k):
+        response = self.pc.Index(index_name).query(vector=vector, top_k=k)
+        return [match.id for match in response.matches]
+
+
+class LocalIndexStore:
+    """Stand-in for Pinecone with the same operations: one JSON file per index in a directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._indexes = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, index_name):
+        return os.path.join(self.directory, f"{index_name}.json")
+
+    def _load(self, index_name):
+        if index_name not in self._indexes:
+            with open(self._path(index_name), encoding="utf-8") as f:
+                self._indexes[index_name] = json.load(f)
+        return self._indexes[index_name]
+
+    def _save(self, index_name):
+        with open(self._path(index_name), "w", encoding="utf-8") as f:
+            json.dump(self._indexes[index_name], f)
+
+    def exists(self, index_name):
+        return os.path.exists(self._path(index_name))
+
+    def create(self, index_name, dimension):
+        self._indexes[index_name] = {"dimension": dimension, "records": {}}
+        self._save(index_name)
+
+    def dimension(self, index_name):
+        return self._load(index_name)["dimension"]
+
+    def count(self, index_name):
+        return len(self._load(index_name)["records"])
+
+    def records(self, index_name, batch_size):
+        items = list(self._load(index_name)["records"].items())
+        for start in range(0, len(items), batch_size):
+            yield [
+                (record_id, record["metadata"]) for record_id, record in items[start : start + batch_size]
+            ]
+
+    def upsert(self, index_name, records):
+        index = self._load(index_name)
+        for record_id, values, metadata in records:
+            if len(values) != index["dimension"]:
+                raise ValueError(
+                    f"vector of dimension {len(values)} does not match index {index_name} ({index['dimension']})"
+                )
+            index["records"][record_id] = {"values": list(values), "metadata": metadata}
+        self._save(index_name)
+
+    def query(self, index_name, vector, k):
+        records = self._load(index_name)["records"]
+        ids = list(records)
+        if not ids:
+            return []
+        matrix = np.array([records[i]["values"] for i in ids], dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        query = np.array(vector, dtype=np.float32)
+        scores = matrix @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        return [ids[i] for i in np.argsort(-scores)[:k]]
+
+
+def read_active_index(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_active_index(path, pointer):
+    """Replace the active index pointer atomically, so the server never reads a partial file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(pointer, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_queries(path, limit):
+    """Query texts from a JSONL file ("query", "message" or "Context" field)"""
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                text = record.get("query") or record.get("message") or record.get("Context")
+                if text:
+                    queries.append(text)
+    return queries[:limit]
+
+
+def recall_at_k(store, source, target, source_embeddings, target_embeddings, queries, k):
+    """Mean share of the old index's top-k ids that the new index also returns"""
+    recalls = []
+    for query in queries:
+        expected = set(store.query(source, source_embeddings.embed_query(query), k))
+        if expected:
+            found = set(store.query(target, target_embeddings.embed_query(query), k))
+            recalls.append(len(expected & found) / len(expected))
+    return sum(recalls) / len(recalls) if recalls else 0.0
+
+
+def migrate(store, args):
+    """Build the target index with the new embeddings, validate recall and switch the pointer"""
+    from server.config import EMBEDDING_DIMENSIONS, EMBEDDING_MODEL, PINECONE_INDEX_NAME
+    from server.llm_clients import create_embeddings
+
+    source = args.source or PINECONE_INDEX_NAME
+    source_model = args.source_model or EMBEDDING_MODEL
+    source_dimensions = args.source_dimensions or EMBEDDING_DIMENSIONS
+    if not store.exists(source):
+        print(f"❌ Source index '{source}' not found")
+        return False
+    if store.exists(args.target):
+        print(f"❌ Target index '{args.target}' already exists; pick a new name or delete it first")
+        return False
+
+    source_embeddings = create_embeddings(source_model, source_dimensions)
+    target_embeddings = create_embeddings(args.model, args.dimensions)
+    dimension = args.dimensions or len(target_embeddings.embed_query("dimension probe"))
+    print(f"🔁 Migrating '{source}' ({source_model}, {store.dimension(source)} dims)")
+    print(f"   -> '{args.target}' ({args.model}, {dimension} dims)")
+    store.create(args.target, dimension)
+
+    total, texts_for_queries = 0, []
+    for batch in store.records(source, args.batch_size):
+        batch = [(record_id, metadata) for record_id, metadata in batch if metadata.get("text")]
+        if not batch:
+            continue
+        vectors = target_embeddings.embed_documents([metadata["text"] for _, metadata in batch])
+        store.upsert(
+            args.target,
+            [(record_id, vector, metadata) for (record_id, metadata), vector in zip(batch, vectors)],
+        )
+        total += len(batch)
+        texts_for_queries.extend(
+            metadata.get("client_message") or metadata["text"] for _, metadata in batch
+        )
+        print(f"   re-embedded {total} records")
+
+    # Pinecone makes upserts visible asynchronously
+    waited = 0
+    while store.count(args.target) < total and waited < args.settle_seconds:
+        time.sleep(2)
+        waited += 2
+
+    queries = load_queries(args.queries, args.sample) if args.queries else texts_for_queries[: args.sample]
+    recall = recall_at_k(store, source, args.target, source_embeddings, target_embeddings, queries, args.k)
+    print(f"📏 Recall@{args.k} of '{args.target}' against '{source}' on {len(queries)} queries: {recall:.3f}")
+    if recall < args.min_recall:
+        print(f"❌ Recall below {args.min_recall}; keeping '{source}' active (the new index is left for inspection)")
+        return False
+
+    write_active_index(
+        args.pointer,
+        {
+            "index_name": args.target,
+            "embedding_model": args.model,
+            "dimensions": args.dimensions,
+            "recall_at_k": round(recall, 4),
+            "switched_at": datetime.now().isoformat(timespec="seconds"),
+            "previous": {
+                "index_name": source,
+                "embedding_model": source_model,
+                "dimensions": source_dimensions,
+            },
+        },
+    )
+    print(f"✅ Switched {args.pointer} to '{args.target}'; restart the server to pick it up")
+    return True
+
+
+def rollback(pointer_path):
+    """Point the server back at the index that was active before the last migration"""
+    pointer = read_active_index(pointer_path)
+    if pointer is None or not pointer.get("previous"):
+        print("❌ No previous index recorded")
+        return False
+    write_active_index(pointer_path, {**pointer["previous"], "previous": None})
+    print(f"✅ Switched {pointer_path} back to '{pointer['previous']['index_name']}'")
+    return True
+
+
+def migration_arguments(argv):
+    from server.config import ACTIVE_INDEX_PATH
+
+    parser = argparse.ArgumentParser(prog="manage_indexes.py migrate")
+    parser.add_argument("target", help="Name of the new index")
+    parser.add_argument("--model", default="text-embedding-3-small")
+    parser.add_argument("--dimensions", type=int, default=None, help="Shortened output size (text-embedding-3-*)")
+    parser.add_argument("--source", default=None, help="Index to migrate from (default: the active index)")
+    parser.add_argument("--source-model", default=None)
+    parser.add_argument("--source-dimensions", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--queries", default=None, help="JSONL query set (default: a sample of the corpus)")
+    parser.add_argument("--sample", type=int, default=50)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--min-recall", type=float, default=0.8)
+    parser.add_argument("--settle-seconds", type=int, default=120)
+    parser.add_argument("--pointer", default=ACTIVE_INDEX_PATH)
+    parser.add_argument("--local-store", default=None, help="Directory of local stand-in indexes")
+    return parser.parse_args(argv)
+
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1].lower() == "migrate":
+        args = migration_arguments(sys.argv[2:])
+        store = (
+            LocalIndexStore(args.local_store)
+            if args.local_store
+            else PineconeIndexStore(get_pinecone_client())
+        )
+        sys.exit(0 if migrate(store, args) else 1)
+    if len(sys.argv) > 1 and sys.argv[1].lower() == "rollback":
+        from server.config import ACTIVE_INDEX_PATH
+
+        pointer_path = sys.argv[2] if len(sys.argv) > 2 else ACTIVE_INDEX_PATH
+        sys.exit(0 if rollback(pointer_path) else 1)
+
     if len(sys.argv) < 2:
         print(
             """
@@ -109,14 +378,18 @@ def main():
 Usage:
   python manage_indexes.py list                    - List all indexes
   python manage_indexes.py delete <index_name>     - Delete an index
-  python manage_indexes.py create <index_name>     - Create new index (1536 dims)
+  python manage_indexes.py create <index_name> [dims] - Create new index (default 1536 dims)
   python manage_indexes.py recreate <index_name>   - Delete and recreate index
+  python manage_indexes.py migrate <new_index> [--model M] [--dimensions N] [--local-store DIR]
+                                                   - Re-embed into a new index, validate recall, switch
+  python manage_indexes.py rollback [pointer_path] - Switch back to the previous index
 
 Examples:
   python manage_indexes.py list
   python manage_indexes.py delete therapy-simulator
   python manage_indexes.py create therapy-simulator-1536
   python manage_indexes.py recreate therapy-simulator
+  python manage_indexes.py migrate therapy-simulator-3s-512 --model text-embedding-3-small --dimensions 512
 """
         )
         sys.exit(1)
@@ -139,7 +412,8 @@ Examples:
             print("❌ Please provide index name to create")
             sys.exit(1)
         index_name = sys.argv[2]
-        create_index(pc, index_name)
+        dimension = int(sys.argv[3]) if len(sys.argv) > 3 else 1536
+        create_index(pc, index_name, dimension=dimension)
 
     elif command == "recreate":
         if len(sys.argv) < 3:
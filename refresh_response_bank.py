@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Offline refresh of the pre-generated response bank.
+Regenerates the reply pools in server/response_bank.json with the LLM, one pool
+per classification, intent and conversation state, keeping the cue messages
+that define each intent's coverage. Run it whenever the reply tone should change
+or the pools feel repetitive; the server picks up the file on its next start.
+
+Usage:
+  python refresh_response_bank.py --variants 6
+"""
+
+import sys
+import os
+import argparse
+import json
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain.prompts import ChatPromptTemplate
+from server.config import RESPONSE_BANK_PATH
+from server.llm_clients import create_chat_model
+from server.response_bank import FIRST_TURN, ONGOING
+
+# Mirrors the guidance in SessionManager.generate_simple_response
+RESPONSE_GUIDANCE = {
+    "GREETING": "acknowledges the greeting warmly, keeps professional boundaries and opens with light small talk (1-2 sentences)",
+    "PROCEDURAL": "answers the procedural question, reassures them about the process and encourages them to share what's on their mind (1-3 sentences)",
+    "SMALL_TALK": "acknowledges the comment politely, shows interest in their wellbeing and gently redirects toward therapeutic topics (1-2 sentences)",
+}
+
+STATE_GUIDANCE = {
+    FIRST_TURN: "This is the very first interaction with this patient. A greeting is appropriate.",
+    ONGOING: "This is an ongoing conversation. The therapeutic relationship is already established. Do NOT greet the patient again or re-introduce yourself.",
+}
+
+refresh_prompt = ChatPromptTemplate.from_template(
+    """
+    You are a warm, professional CBT therapist writing reusable replies.
+
+    The patient has just said something like:
+    {cues}
+
+    {state}
+
+    Write {variants} different replies, each of which {guidance}.
+    Every reply must make sense for any of the example messages above, so do not
+    refer to details that only one of them mentions. Vary wording and structure.
+
+    Respond with one reply per line and nothing else.
+    """
+)
+
+
+def generate_replies(llm, classification, intent, state, variants):
+    """Ask the LLM for a fresh pool of replies for one intent and state"""
+    result = (refresh_prompt | llm).invoke(
+        {
+            "cues": "\n".join(f'- "{cue}"' for cue in intent["cues"]),
+            "state": STATE_GUIDANCE[state],
+            "variants": variants,
+            "guidance": RESPONSE_GUIDANCE[classification],
+        }
+    )
+    replies = []
+    for line in result.content.splitlines():
+        reply = line.strip().lstrip("-*0123456789.) ").strip().strip('"')
+        if reply and reply not in replies:
+            replies.append(reply)
+    return replies[:variants]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate the response bank reply pools")
+    parser.add_argument("--bank", default=RESPONSE_BANK_PATH)
+    parser.add_argument("--variants", type=int, default=6)
+    parser.add_argument("--temperature", type=float, default=0.9)
+    args = parser.parse_args()
+
+    with open(args.bank, encoding="utf-8") as f:
+        bank = json.load(f)
+    llm = create_chat_model(temperature=args.temperature)
+
+    print(f"🔄 Refreshing response bank at {args.bank}")
+    for classification, intents in bank.items():
+        for intent in intents:
+            for state in (FIRST_TURN, ONGOING):
+                try:
+                    replies = generate_replies(
+                        llm, classification, intent, state, args.variants
+                    )
+                except Exception as e:
+                    print(f"⚠️ Kept existing {classification}/{intent['intent']}/{state}: {e}")
+                    continue
+                if replies:
+                    intent["replies"][state] = replies
+                    print(f"✅ {classification}/{intent['intent']}/{state}: {len(replies)} replies")
+
+    with open(args.bank, "w", encoding="utf-8") as f:
+        json.dump(bank, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    print("🎉 Response bank refreshed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from server.config import *
+from server.metrics import metrics
+
+# Request priorities (lower value is admitted first)
+PRIORITY_CONCLUSION = 0  # Session conclusions
+PRIORITY_THERAPEUTIC = 1  # Turns in a session that already has therapeutic content
+PRIORITY_DEFAULT = 2  # Greetings, small talk and new sessions
+
+PRIORITY_NAMES = {
+    PRIORITY_CONCLUSION: "conclusion",
+    PRIORITY_THERAPEUTIC: "therapeutic",
+    PRIORITY_DEFAULT: "default",
+}
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; maps to HTTP 429"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Request rejected by admission control: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Global concurrency limiter with a bounded, priority-ordered wait queue.
+
+    At most `max_concurrent` requests run the LLM pipeline at once. Others wait
+    in a queue of at most `max_queue` entries, ordered by priority then arrival.
+    A waiter that is not admitted within `queue_timeout` seconds is rejected,
+    and when the queue is full a new request either displaces the newest
+    lower-priority waiter or is rejected immediately.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiting = []  # heap of [priority, sequence, future]
+        self._sequence = itertools.count()
+        self._service_time = 5.0  # EWMA of pipeline time, seeds Retry-After
+        self._loop = None  # Event loop serving requests; all state changes happen on it
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for entry in self._waiting if not entry[2].done())
+
+    def retry_after(self) -> int:
+        """Estimate seconds until a slot frees up for a newly queued request"""
+        backlog = self.queue_depth + 1
+        return max(1, math.ceil(backlog * self._service_time / self.max_concurrent))
+
+    def _record_gauges(self):
+        metrics.set_gauge("admission.active", self.active)
+        metrics.set_gauge("admission.queue_depth", self.queue_depth)
+
+    def _reject(self, reason: str, priority: int) -> AdmissionRejected:
+        metrics.increment(
+            "admission.rejected", reason=reason, priority=PRIORITY_NAMES[priority]
+        )
+        return AdmissionRejected(reason, self.retry_after())
+
+    def _displace_lower_priority(self, priority: int) -> bool:
+        """Reject the newest waiter with lower priority than `priority`, if any"""
+        candidates = [
+            entry
+            for entry in self._waiting
+            if not entry[2].done() and entry[0] > priority
+        ]
+        if not candidates:
+            return False
+        victim = max(candidates, key=lambda entry: (entry[0], entry[1]))
+        victim[2].set_exception(self._reject("displaced", victim[0]))
+        return True
+
+    async def acquire(self, priority: int = PRIORITY_DEFAULT, timeout: float = None):
+        self._loop = asyncio.get_running_loop()
+        queued_at = time.perf_counter()
+        if self.active < self.max_concurrent and self.queue_depth == 0:
+            self.active += 1
+            self._record_wait(priority, queued_at)
+            return
+
+        if self.queue_depth >= self.max_queue and not self._displace_lower_priority(
+            priority
+        ):
+            raise self._reject("queue_full", priority)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, [priority, next(self._sequence), future])
+        self._record_gauges()
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(future),
+                self.queue_timeout if timeout is None else min(timeout, self.queue_timeout),
+            )
+        except asyncio.TimeoutError:
+            # The slot may have been handed over in the same tick as the timeout
+            if not self._granted(future):
+                future.cancel()
+                self._record_gauges()
+                raise self._reject("queue_timeout", priority)
+        except asyncio.CancelledError:
+            # Client went away while queued: give back a slot we were handed
+            if self._granted(future):
+                self.release()
+            else:
+                future.cancel()
+            raise
+        self._record_wait(priority, queued_at)
+
+    @staticmethod
+    def _granted(future) -> bool:
+        return future.done() and not future.cancelled() and future.exception() is None
+
+    def _record_wait(self, priority: int, queued_at: float):
+        metrics.observe(
+            "admission.wait_seconds",
+            time.perf_counter() - queued_at,
+            priority=PRIORITY_NAMES[priority],
+        )
+        self._record_gauges()
+
+    def release(self, service_time: float = None):
+        if service_time is not None:
+            self._service_time = 0.8 * self._service_time + 0.2 * service_time
+
+        # Hand the slot directly to the highest-priority live waiter
+        while self._waiting:
+            entry = heapq.heappop(self._waiting)
+            if not entry[2].done():
+                entry[2].set_result(True)
+                self._record_gauges()
+                return
+        self.active -= 1
+        self._record_gauges()
+
+    @asynccontextmanager
+    async def admit(self, priority: int = PRIORITY_DEFAULT, timeout: float = None):
+        await self.acquire(priority, timeout)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    @contextmanager
+    def admit_from_thread(self, priority: int = PRIORITY_DEFAULT):
+        """admit() for LLM work on a worker thread, such as background jobs.
+
+        The slot is taken and given back on the serving event loop. Before that
+        loop has admitted anything (in-process runners) there are no requests
+        to share slots with, and the work runs unadmitted.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            yield
+            return
+        asyncio.run_coroutine_threadsafe(self.acquire(priority), loop).result()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            try:
+                loop.call_soon_threadsafe(self.release, time.perf_counter() - started)
+            except RuntimeError:
+                # The loop has closed along with the server
+                pass
+
+
+# Global admission controller for LLM-bound work
+admission_controller = AdmissionController(
+    max_concurrent=MAX_CONCURRENT_LLM_REQUESTS,
+    max_queue=ADMISSION_QUEUE_SIZE,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+)
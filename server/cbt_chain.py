@@ -1,23 +1,275 @@
+import logging
 import os
+import time
 from dotenv import load_dotenv
 from langchain.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
 from langchain_core.runnables import RunnableSequence, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
+from opentelemetry import trace
 
 from server.config import *
+from server.deadline import stage_latency
+from server.formulation import Formulation, parse_formulation_delta
+from server.llm_clients import create_stage_model
+from server.metrics import metrics
+from server.embeddings import shared_embeddings
 from server.rag_engine import RAGEngine
+from server.technique_selector import TechniqueSelector, format_techniques
+from server.tracing import stage_span
 
-# Configure LangChain LLM
-llm_model = ChatOpenAI(
-    api_key=OPENAI_API_KEY,
-    model=MODEL_CONFIG["model"],
-    temperature=MODEL_CONFIG["temperature"],
-)
+logger = logging.getLogger(__name__)
+
+# Configure one LangChain LLM per stage, as set by the model routing profile
+assessment_llm = create_stage_model("assessment")
+formulation_llm = create_stage_model("formulation")
+technique_llm = create_stage_model("technique")
+response_llm = create_stage_model("response")
 
 # Initialize RAG Engine
 rag_engine = RAGEngine()
 
+# Local technique selection over the CBT knowledge base
+technique_selector = TechniqueSelector(
+    shared_embeddings, k=TECHNIQUE_SELECTOR_K, min_similarity=TECHNIQUE_SELECTOR_MIN_SIMILARITY
+)
+
+
+# Prompt templates, built once at import. Each stage sends a byte-identical
+# system message with its static instructions first and the per-turn variables
+# after it, so the provider can reuse the cached prompt prefix across calls.
+
+# Step 1: Initial Assessment and Validation
+assessment_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are a professional CBT therapist conducting an ongoing assessment. Your task is to analyze the patient's input within the context of your ongoing therapeutic relationship.
+
+Based on the patient's current message and conversation history based on the following:
+
+1. CONVERSATION STATE: Determine if this is a first interaction or continuation of an ongoing therapeutic relationship
+2. EMOTIONAL STATE: What emotions are being expressed in this message and how do they relate to previous sessions?
+3. COGNITIVE PATTERNS: What thought patterns, beliefs, or cognitive distortions are evident? Any patterns from previous conversations?
+4. BEHAVIORAL ASPECTS: What behaviors or avoidance patterns are described? Any changes from earlier discussions?
+5. TRIGGERS & CONTEXT: What situations or events seem to trigger these responses? Connection to previous sessions?
+6. THERAPEUTIC PROGRESS: How does this message show progress or challenges compared to earlier conversations?
+7. SEVERITY & IMPACT: How significantly is this affecting their daily functioning?
+
+IMPORTANT: Pay special attention to the conversation context to determine:
+- Is this the patient's first message in the session?
+- Are they continuing a previous topic or introducing something new?
+- What therapeutic rapport has already been established?
+
+Summarize the assessment not exceeding 300 words.""",
+        ),
+        (
+            "human",
+            """Conversation context (summary and recent history):
+{conversation_context}
+
+Current patient message: {message}""",
+        ),
+    ]
+)
+
+# Step 1 (incremental): update the session's structured formulation with only
+# what the new message adds, instead of a full reassessment every turn
+formulation_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are a professional CBT therapist keeping a structured case formulation of your patient up to date.
+
+You will be given the current formulation, your previous reply to the patient and the patient's new message. Identify only what is NEW compared to the formulation:
+- distortions: cognitive distortions or unhelpful beliefs evident in the new message
+- triggers: situations, people or events that set off the patient's difficulties
+- emotions: emotions the patient expresses
+- techniques_tried: CBT techniques your previous reply used with the patient
+
+Keep each item to a few words. Leave out anything the formulation already covers and use empty lists when nothing is new.
+
+Return ONLY a JSON object of the form {{"distortions": [], "triggers": [], "emotions": [], "techniques_tried": []}}""",
+        ),
+        (
+            "human",
+            """Current formulation:
+{formulation}
+
+Your previous reply: {previous_reply}
+
+New patient message: {message}""",
+        ),
+    ]
+)
+
+# Step 2: CBT Technique Application
+technique_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are a professional CBT therapist selecting and planning evidence-based interventions.
+
+Based on the clinical formulation and the patient's current message, identify appropriate CBT techniques:
+
+1. TECHNIQUE SELECTION: Identify 2-3 most appropriate CBT techniques for this specific case (e.g., cognitive restructuring, behavioral activation, exposure therapy, mindfulness, ABC model, problem-solving)
+
+2. EVIDENCE-BASED RATIONALE: Explain why these techniques are suitable based on:
+   - The identified cognitive patterns and distortions
+   - The emotional state and behavioral patterns
+   - The client's specific situation and needs
+   - The techniques already tried with this patient
+
+3. APPLICATION STRATEGY: Detail how each technique should be adapted to this patient's specific situation
+
+Summarize the technique application recommendations in few paragraphs not exceeding 300 words.""",
+        ),
+        (
+            "human",
+            """Clinical formulation: ###{assessment}###
+
+Current patient message: {message}""",
+        ),
+    ]
+)
+
+# Step 3: Rich Context Response Generation with Retrieved Responses
+action_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are a professional CBT therapist creating a compassionate, evidence-based therapeutic response.
+
+You will be given the conversation context, example therapeutic responses from experienced therapists to take references from, your clinical formulation of the patient, CBT technique recommendations and the patient's original message.
+
+Create a rich, contextual therapeutic response that:
+
+CONVERSATION AWARENESS:
+- Review the conversation context to understand where you are in the therapeutic relationship
+- If this is a continuation of an ongoing conversation, respond naturally without greeting the patient again
+- Only provide initial greetings if this appears to be the very first interaction
+- Build upon previous topics and insights from the conversation history
+
+THERAPEUTIC COMMUNICATION:
+- Model your tone and style on the professional response examples provided
+- Respond as if speaking directly to the patient with warmth and understanding
+- Acknowledge and validate their feelings and experiences
+- Never provide medical diagnoses or advice
+- Maintain conversational continuity based on the session history
+
+INTEGRATION OF CBT TECHNIQUES:
+- Seamlessly weave the recommended techniques into natural conversation
+- Don't explicitly name techniques - integrate them organically
+- Use language and approaches demonstrated in the example responses
+- Apply techniques in a way that feels natural and supportive
+
+ACTIONABLE GUIDANCE:
+- Provide specific, manageable next steps based on the technique recommendations
+- Draw inspiration from the therapeutic response examples
+- Offer practical tools or exercises that align with the clinical formulation
+- Make suggestions feel collaborative rather than prescriptive
+
+CONVERSATIONAL FLOW:
+- End with an open-ended question that encourages further exploration
+- Maintain hope and emphasize the patient's strengths and agency
+- Keep the response conversational and accessible, not clinical
+- Show empathy while gently introducing therapeutic perspectives
+- Continue the natural flow of conversation without unnecessary introductions
+
+IMPORTANT: If the conversation context shows previous exchanges, do NOT greet the patient again. Simply continue the therapeutic conversation naturally.
+
+Use the example therapeutic responses to inform your communication style and ensure your response reflects evidence-based therapeutic practice.""",
+        ),
+        (
+            "human",
+            """Conversation context (summary and recent history):
+{conversation_context}
+
+Example therapeutic responses from experienced therapists:
+{retrieved_responses}
+
+Clinical formulation: ###{assessment}###
+
+CBT technique recommendations: ###{techniques_application}###
+
+Original patient message: {message}""",
+        ),
+    ]
+)
+
+# Degraded path: a single response grounded in the retrieved examples,
+# used when the latency budget cannot cover assessment and technique planning
+grounded_response_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are a professional CBT therapist responding to your patient with warmth and evidence-based care.
+
+You will be given the conversation context, example therapeutic responses from experienced therapists to take references from, and the patient's original message.
+
+Write a compassionate, conversational response that:
+- Acknowledges and validates the patient's feelings
+- Gently introduces a helpful CBT perspective without naming techniques
+- Offers one small, practical next step
+- Ends with an open-ended question
+- Does NOT greet the patient again if the conversation is ongoing
+- Never provides medical diagnoses or advice""",
+        ),
+        (
+            "human",
+            """Conversation context (summary and recent history):
+{conversation_context}
+
+Example therapeutic responses from experienced therapists:
+{retrieved_responses}
+
+Original patient message: {message}""",
+        ),
+    ]
+)
+
+
+def emit_stage(inputs, stage):
+    """Report stage progress to an optional "on_event" listener in the chain inputs"""
+    on_event = inputs.get("on_event")
+    if on_event:
+        on_event({"type": "stage", "stage": stage})
+
+
+def update_formulation(formulation: Formulation, inputs) -> str:
+    """Merge what the new message adds to the session's formulation and render it"""
+    delta = (formulation_prompt | formulation_llm).invoke(
+        {
+            "formulation": formulation.render(),
+            "previous_reply": inputs.get("previous_reply") or "(none yet)",
+            "message": inputs["message"],
+        }
+    )
+    try:
+        added = formulation.merge(parse_formulation_delta(delta.content))
+        metrics.increment("formulation.updates", result="merged")
+        metrics.observe("formulation.items_added", added)
+    except ValueError as e:
+        logger.warning("Error parsing formulation delta", extra={"stage": "formulation", "error": str(e)})
+        metrics.increment("formulation.updates", result="unparsed")
+    return formulation.render()
+
+
+def select_techniques(inputs) -> str:
+    """Techniques for this turn from the knowledge base, or from the LLM when none match"""
+    if TECHNIQUE_SELECTOR == "local":
+        try:
+            techniques = technique_selector.select(f"{inputs['assessment']}\n\n{inputs['message']}")
+            if techniques:
+                metrics.increment("technique_selector.decisions", source="local")
+                trace.get_current_span().set_attribute("technique.source", "local")
+                return format_techniques(techniques)
+        except Exception as e:
+            logger.warning("Error in local technique selector", extra={"stage": "technique", "error": str(e)})
+
+    metrics.increment("technique_selector.decisions", source="llm")
+    trace.get_current_span().set_attribute("technique.source", "llm")
+    return (technique_prompt | technique_llm).invoke(inputs).content
+
 
 # Create CBT Sequential Chain with RAG Integration
 def create_cbt_sequential_chain():
@@ -27,10 +279,25 @@ def create_cbt_sequential_chain():
         conversation_context = inputs.get("conversation_context", "")
         assessment = inputs["assessment"]
         techniques_application = inputs["techniques_application"]
+        deadline = inputs.get("deadline")
 
         # Retrieve relevant therapist responses from the dataset
         # Use the specialized method to get actual therapeutic responses
-        therapist_responses = rag_engine.retrieve_therapist_responses(message, k=4)
+        if deadline and not deadline.can_cover("retrieval", "response"):
+            deadline.degrade("budget_before_retrieval")
+            therapist_responses = []
+        else:
+            emit_stage(inputs, "retrieval")
+            started = time.perf_counter()
+            timeout = RETRIEVAL_TIMEOUT_SECONDS
+            if deadline:
+                timeout = min(timeout, deadline.remaining())
+            with stage_span("retrieval") as span:
+                therapist_responses = rag_engine.retrieve_therapist_responses(
+                    message, k=4, timeout=timeout
+                )
+                span.set_attribute("retrieval.responses", len(therapist_responses))
+            stage_latency.record("retrieval", time.perf_counter() - started)
 
         # Format the responses for the prompt
         formatted_responses = []
@@ -43,134 +310,61 @@ def create_cbt_sequential_chain():
             "assessment": assessment,
             "techniques_application": techniques_application,
             "retrieved_responses": "\n\n".join(formatted_responses),
+            "deadline": deadline,
+            "on_event": inputs.get("on_event"),
         }
 
-    # Step 1: Initial Assessment and Validation
-    assessment_prompt = ChatPromptTemplate.from_template(
-        """
-        You are a professional CBT therapist conducting an ongoing assessment. Your task is to analyze the patient's input within the context of your ongoing therapeutic relationship.
-
-        Current patient message: {message}
-
-        Conversation context (summary and recent history):
-        {conversation_context}
-
-        Based on the patient's current message and conversation history based on the following:
-
-        1. CONVERSATION STATE: Determine if this is a first interaction or continuation of an ongoing therapeutic relationship
-        2. EMOTIONAL STATE: What emotions are being expressed in this message and how do they relate to previous sessions?
-        3. COGNITIVE PATTERNS: What thought patterns, beliefs, or cognitive distortions are evident? Any patterns from previous conversations?
-        4. BEHAVIORAL ASPECTS: What behaviors or avoidance patterns are described? Any changes from earlier discussions?
-        5. TRIGGERS & CONTEXT: What situations or events seem to trigger these responses? Connection to previous sessions?
-        6. THERAPEUTIC PROGRESS: How does this message show progress or challenges compared to earlier conversations?
-        7. SEVERITY & IMPACT: How significantly is this affecting their daily functioning?
-
-        IMPORTANT: Pay special attention to the conversation context to determine:
-        - Is this the patient's first message in the session?
-        - Are they continuing a previous topic or introducing something new?
-        - What therapeutic rapport has already been established?
-        
-        Summarize the assessment not exceeding 300 words.
-        """,
-    )
-
-    # Step 2: CBT Technique Application
-    technique_prompt = ChatPromptTemplate.from_template(
-        """
-        You are a professional CBT therapist selecting and planning evidence-based interventions.
-
-        Assessment: ###{assessment}###
-
-        Based on the assessment, identify appropriate CBT techniques:
-
-        1. TECHNIQUE SELECTION: Identify 2-3 most appropriate CBT techniques for this specific case (e.g., cognitive restructuring, behavioral activation, exposure therapy, mindfulness, ABC model, problem-solving)
-
-        2. EVIDENCE-BASED RATIONALE: Explain why these techniques are suitable based on:
-           - The identified cognitive patterns and distortions
-           - The emotional state and behavioral patterns
-           - The client's specific situation and needs
-
-        3. APPLICATION STRATEGY: Detail how each technique should be adapted to this patient's specific situation
-
-        Summarize the technique application recommendations in few paragraphs not exceeding 300 words.
-        """,
-    )
-
-    # Step 3: Rich Context Response Generation with Retrieved Responses
-    action_prompt = ChatPromptTemplate.from_template(
-        """
-        You are a professional CBT therapist creating a compassionate, evidence-based therapeutic response.
-
-        Original patient message: {message}
-
-        Assessment findings: ###{assessment}###
-
-        CBT technique recommendations: ###{techniques_application}###
-
-        Conversation context (summary and recent history):
-        {conversation_context}
-
-        Take references from the following example therapeutic responses from experienced therapists:
-        {retrieved_responses}
-
-        Create a rich, contextual therapeutic response that:
-
-        CONVERSATION AWARENESS:
-        - Review the conversation context to understand where you are in the therapeutic relationship
-        - If this is a continuation of an ongoing conversation, respond naturally without greeting the patient again
-        - Only provide initial greetings if this appears to be the very first interaction
-        - Build upon previous topics and insights from the conversation history
-
-        THERAPEUTIC COMMUNICATION:
-        - Model your tone and style on the professional response examples provided
-        - Respond as if speaking directly to the patient with warmth and understanding
-        - Acknowledge and validate their feelings and experiences
-        - Never provide medical diagnoses or advice
-        - Maintain conversational continuity based on the session history
-
-        INTEGRATION OF CBT TECHNIQUES:
-        - Seamlessly weave the recommended techniques into natural conversation
-        - Don't explicitly name techniques - integrate them organically
-        - Use language and approaches demonstrated in the example responses
-        - Apply techniques in a way that feels natural and supportive
-
-        ACTIONABLE GUIDANCE:
-        - Provide specific, manageable next steps based on the technique recommendations
-        - Draw inspiration from the therapeutic response examples
-        - Offer practical tools or exercises that align with the assessment findings
-        - Make suggestions feel collaborative rather than prescriptive
-
-        CONVERSATIONAL FLOW:
-        - End with an open-ended question that encourages further exploration
-        - Maintain hope and emphasize the patient's strengths and agency
-        - Keep the response conversational and accessible, not clinical
-        - Show empathy while gently introducing therapeutic perspectives
-        - Continue the natural flow of conversation without unnecessary introductions
-
-        IMPORTANT: If the conversation context shows previous exchanges, do NOT greet the patient again. Simply continue the therapeutic conversation naturally.
-
-        Use the example therapeutic responses to inform your communication style and ensure your response reflects evidence-based therapeutic practice.
-        """,
-    )
-
     # Create the chain without initial RAG integration
-    # Step 1: Assessment without context
+    # Step 1: Assessment (skipped when the deadline is too close); with an
+    # incremental formulation in the inputs, a delta update of it
     def run_assessment(inputs):
-        assessment_result = (assessment_prompt | llm_model).invoke(inputs)
+        deadline = inputs.get("deadline")
+        assessment = None
+        if deadline and not deadline.can_cover(
+            "assessment", "technique", "retrieval", "response"
+        ):
+            deadline.degrade("budget_before_assessment")
+        else:
+            emit_stage(inputs, "assessment")
+            started = time.perf_counter()
+            formulation = inputs.get("formulation")
+            incremental = CLINICAL_FORMULATION == "incremental" and formulation is not None
+            with stage_span("assessment", **{"assessment.mode": "incremental" if incremental else "full"}):
+                if incremental:
+                    assessment = update_formulation(formulation, inputs)
+                else:
+                    assessment = (assessment_prompt | assessment_llm).invoke(inputs).content
+            stage_latency.record("assessment", time.perf_counter() - started)
         return {
             "message": inputs["message"],
             "conversation_context": inputs["conversation_context"],
-            "assessment": assessment_result.content,
+            "assessment": assessment,
+            "deadline": deadline,
+            "on_event": inputs.get("on_event"),
         }
 
-    # Step 2: Technique application without context
+    # Step 2: Technique application without context, selected locally from the
+    # knowledge base when TECHNIQUE_SELECTOR is "local"
     def run_technique_application(inputs):
-        technique_result = (technique_prompt | llm_model).invoke(inputs)
+        deadline = inputs.get("deadline")
+        techniques_application = None
+        if inputs["assessment"] is None:
+            pass
+        elif deadline and not deadline.can_cover("technique", "retrieval", "response"):
+            deadline.degrade("budget_before_technique")
+        else:
+            emit_stage(inputs, "technique")
+            started = time.perf_counter()
+            with stage_span("technique"):
+                techniques_application = select_techniques(inputs)
+            stage_latency.record("technique", time.perf_counter() - started)
         return {
             "message": inputs["message"],
             "conversation_context": inputs["conversation_context"],
             "assessment": inputs["assessment"],
-            "techniques_application": technique_result.content,
+            "techniques_application": techniques_application,
+            "deadline": deadline,
+            "on_event": inputs.get("on_event"),
         }
 
     # Step 3: RAG context retrieval for response generation
@@ -178,7 +372,25 @@ def create_cbt_sequential_chain():
 
     # Step 4: Final therapeutic response with retrieved context
     def run_therapeutic_response(inputs):
-        response_result = (action_prompt | llm_model | StrOutputParser()).invoke(inputs)
+        if inputs["assessment"] is None or inputs["techniques_application"] is None:
+            prompt = grounded_response_prompt
+        else:
+            prompt = action_prompt
+        emit_stage(inputs, "response")
+        started = time.perf_counter()
+        chain = prompt | response_llm | StrOutputParser()
+        on_event = inputs.get("on_event")
+        with stage_span("response", **{"response.streamed": bool(on_event)}):
+            if on_event:
+                # Stream token deltas to listeners as they arrive
+                chunks = []
+                for delta in chain.stream(inputs):
+                    chunks.append(delta)
+                    on_event({"type": "token", "delta": delta})
+                response_result = "".join(chunks)
+            else:
+                response_result = chain.invoke(inputs)
+        stage_latency.record("response", time.perf_counter() - started)
         return response_result
 
     assessment_step = RunnableLambda(run_assessment)
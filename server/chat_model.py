@@ -1,6 +1,10 @@
-from pydantic import BaseModel
+from datetime import datetime
+
+from pydantic import BaseModel, Field
 from typing import List, Dict, Optional
 
+from server.config import MAX_REQUEST_DEADLINE_SECONDS
+
 
 class ChatMessage(BaseModel):
     role: str  # "user" or "assistant"
@@ -11,9 +15,52 @@ class ChatRequest(BaseModel):
     message: str
     session_id: str
     end_session: bool = False  # Flag to indicate session ending
+    deadline_seconds: Optional[float] = Field(
+        None, gt=0, le=MAX_REQUEST_DEADLINE_SECONDS
+    )  # Latency budget; server default if unset
+    client_message_id: Optional[str] = None  # Idempotency key if no Idempotency-Key header
+
+
+class ConclusionInfo(BaseModel):
+    source: str  # "draft" (used as is), "draft_delta" (draft updated) or "full"
+    stale_messages: int = 0  # Messages the draft had not seen when the session ended
+    draft_age_seconds: Optional[float] = None  # Time since the draft was written
 
 
 class ChatResponse(BaseModel):
     response: str
     session_id: str
     is_session_ended: bool = False  # Flag to indicate if session has ended
+    classification: Optional[str] = None  # Path the message took through the pipeline
+    degraded_reason: Optional[str] = None  # Why stages were skipped to meet the deadline
+    follow_up_pending: bool = False  # A follow-up message is being generated in the background
+    conclusion: Optional[ConclusionInfo] = None  # How the session conclusion was produced
+
+
+class HistoryMessage(BaseModel):
+    index: int  # Position in the session; stable, since messages are append-only
+    role: str
+    content: str
+
+
+class SessionMessagesResponse(BaseModel):
+    session_id: str
+    messages: List[HistoryMessage]  # Oldest first
+    next_cursor: Optional[int] = None  # Pass as `before` for the previous page; None at the start
+    message_count: int  # Messages in the session when the page was read
+
+
+class SessionInfoResponse(BaseModel):
+    session_id: str
+    message_count: int
+    summary: str
+    created_at: datetime
+    last_updated: datetime
+    ended_at: Optional[datetime] = None
+    is_session_ended: bool = False
+
+
+class PendingMessagesResponse(BaseModel):
+    session_id: str
+    messages: List[str]  # Follow-up messages generated since the last poll
+    in_progress: bool  # More follow-ups are still being generated
@@ -1,7 +1,9 @@
+import json
 import os
 from dotenv import load_dotenv
 
 
+# Defaults for every stage; server/model_routing.json overrides them per stage
 MODEL_CONFIG = {
     "model": "gpt-4.1-nano",
     "temperature": 0.3,  # Lower temperature for more consistent, professional responses
@@ -13,8 +15,136 @@ load_dotenv(override=True)
 
 # Configure OpenAI API Key
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Optional OpenAI-compatible endpoint (e.g. a local stand-in for load testing)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
 
 # Configure Pinecone API Key
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_ENVIRONMENT = os.getenv("PINECONE_ENVIRONMENT", "us-east1-gcp")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "therapy-simulator")
+
+# Embedding model used for the vector index and local classification
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")  # 1536 dimensions
+# Output dimensions for models that support shortening (text-embedding-3-*); empty for the model default
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS") or 0) or None
+
+# Active index pointer written by `manage_indexes.py migrate`: when present, its index
+# name, embedding model and dimensions replace the three settings above
+ACTIVE_INDEX_PATH = os.getenv(
+    "ACTIVE_INDEX_PATH", os.path.join(os.path.dirname(__file__), "active_index.json")
+)
+if os.path.exists(ACTIVE_INDEX_PATH):
+    with open(ACTIVE_INDEX_PATH, encoding="utf-8") as f:
+        _active_index = json.load(f)
+    PINECONE_INDEX_NAME = _active_index["index_name"]
+    EMBEDDING_MODEL = _active_index["embedding_model"]
+    EMBEDDING_DIMENSIONS = _active_index.get("dimensions")
+
+# Query embeddings arriving within this window (or up to the max batch) share one API call; 0 disables
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "64"))
+
+# Vector store backend: "pinecone" or "memory" (in-process, for offline runs)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone").lower()
+# Optional JSONL file of counseling conversations used to seed the in-memory store
+VECTOR_STORE_SEED_PATH = os.getenv("VECTOR_STORE_SEED_PATH") or None
+# Chunking of documents added to the vector store (characters)
+RAG_CHUNK_SIZE = int(os.getenv("RAG_CHUNK_SIZE", "500"))
+RAG_CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "50"))
+# Retrieval of example responses: per-query deadline (no examples when missed) and hedging, which
+# sends a second query once the first is slower than this percentile of recent queries (0 disables)
+RETRIEVAL_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_TIMEOUT_SECONDS", "2"))
+RETRIEVAL_HEDGE_PERCENTILE = float(os.getenv("RETRIEVAL_HEDGE_PERCENTILE", "95"))
+RETRIEVAL_HEDGE_MIN_DELAY_MS = float(os.getenv("RETRIEVAL_HEDGE_MIN_DELAY_MS", "50"))
+
+# Admission control for LLM-bound work
+MAX_CONCURRENT_LLM_REQUESTS = int(os.getenv("MAX_CONCURRENT_LLM_REQUESTS", "8"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "32"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+
+# Shared client-side rate limiting for OpenAI calls
+OPENAI_RPM_LIMIT = float(os.getenv("OPENAI_RPM_LIMIT", "500"))
+OPENAI_TPM_LIMIT = float(os.getenv("OPENAI_TPM_LIMIT", "200000"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+RATE_LIMIT_BURST_SECONDS = float(os.getenv("RATE_LIMIT_BURST_SECONDS", "1"))
+RATE_LIMIT_BASE_BACKOFF = float(os.getenv("RATE_LIMIT_BASE_BACKOFF", "0.5"))
+RATE_LIMIT_MAX_BACKOFF = float(os.getenv("RATE_LIMIT_MAX_BACKOFF", "30"))
+# Optional file shared by several server processes to pool the same limits
+RATE_LIMIT_STATE_PATH = os.getenv("RATE_LIMIT_STATE_PATH") or None
+
+# Per-request latency budget; the therapeutic chain degrades when it runs short
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "90"))
+DEADLINE_SAFETY_FACTOR = float(os.getenv("DEADLINE_SAFETY_FACTOR", "1.2"))
+# Largest budget a client may ask for with deadline_seconds
+MAX_REQUEST_DEADLINE_SECONDS = float(os.getenv("MAX_REQUEST_DEADLINE_SECONDS", "300"))
+
+# Message classification: "knn" (local, LLM fallback on low margin) or "llm"
+MESSAGE_CLASSIFIER = os.getenv("MESSAGE_CLASSIFIER", "knn").lower()
+CLASSIFIER_K = int(os.getenv("CLASSIFIER_K", "5"))
+CLASSIFIER_MARGIN_THRESHOLD = float(os.getenv("CLASSIFIER_MARGIN_THRESHOLD", "0.3"))
+
+# Crisis pre-screen: cosine similarity to crisis exemplars that triggers the fast path
+CRISIS_SIMILARITY_THRESHOLD = float(os.getenv("CRISIS_SIMILARITY_THRESHOLD", "0.9"))
+
+# Worker threads for background work (e.g. crisis follow-ups)
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", "4"))
+
+# Pre-generated replies for simple turns; set RESPONSE_BANK_PATH to "" to always use the LLM
+RESPONSE_BANK_PATH = os.getenv(
+    "RESPONSE_BANK_PATH", os.path.join(os.path.dirname(__file__), "response_bank.json")
+)
+# Cosine similarity to a bank cue needed to serve a message from the bank
+RESPONSE_BANK_MIN_SIMILARITY = float(os.getenv("RESPONSE_BANK_MIN_SIMILARITY", "0.88"))
+
+# Speculative session conclusion: keep a draft refreshed in the background once a
+# session reaches this many messages or the latest message looks like an ending
+CONCLUSION_DRAFT_MIN_MESSAGES = int(os.getenv("CONCLUSION_DRAFT_MIN_MESSAGES", "8"))
+CONCLUSION_DRAFT_REFRESH_MESSAGES = int(os.getenv("CONCLUSION_DRAFT_REFRESH_MESSAGES", "4"))
+# SESSION_END share of the classifier's neighbour vote that counts as an ending signal
+CONCLUSION_DRAFT_END_SIGNAL = float(os.getenv("CONCLUSION_DRAFT_END_SIGNAL", "0.3"))
+
+# Per-stage model, temperature, output cap and stop sequences ("" for MODEL_CONFIG everywhere)
+MODEL_ROUTING_PATH = os.getenv(
+    "MODEL_ROUTING_PATH", os.path.join(os.path.dirname(__file__), "model_routing.json")
+)
+MODEL_ROUTING_PROFILE = os.getenv("MODEL_ROUTING_PROFILE", "baseline")
+
+# Session history API page sizes
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "100"))
+
+# Idempotency keys: how long a completed turn is replayed for a repeated key, and how many keys to keep
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+
+# Per-session memory: earlier turns most similar to the latest message added to long-session
+# context (0 disables), the similarity they need and the characters kept per message
+SESSION_MEMORY_TOP_K = int(os.getenv("SESSION_MEMORY_TOP_K", "3"))
+SESSION_MEMORY_MIN_SIMILARITY = float(os.getenv("SESSION_MEMORY_MIN_SIMILARITY", "0.3"))
+SESSION_MEMORY_MAX_CHARS = int(os.getenv("SESSION_MEMORY_MAX_CHARS", "400"))
+
+# Clinical formulation: "incremental" keeps a structured per-session formulation updated by a
+# short delta call each therapeutic turn; "full" re-assesses from the conversation every turn
+CLINICAL_FORMULATION = os.getenv("CLINICAL_FORMULATION", "incremental").lower()
+# Most recent items kept per formulation field (distortions, triggers, emotions, techniques)
+FORMULATION_MAX_ITEMS = int(os.getenv("FORMULATION_MAX_ITEMS", "8"))
+
+# Technique selection: "local" (knowledge-base similarity, LLM fallback when nothing matches) or "llm"
+TECHNIQUE_SELECTOR = os.getenv("TECHNIQUE_SELECTOR", "local").lower()
+TECHNIQUE_SELECTOR_K = int(os.getenv("TECHNIQUE_SELECTOR_K", "2"))
+TECHNIQUE_SELECTOR_MIN_SIMILARITY = float(os.getenv("TECHNIQUE_SELECTOR_MIN_SIMILARITY", "0.75"))
+
+# Structured JSON logging: level, share of requests whose debug records are kept, whether
+# records may include the start of message contents (redacted by default), and the
+# capacity of the queue feeding the writer thread (records are dropped when it is full)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+LOG_MESSAGE_CONTENT = os.getenv("LOG_MESSAGE_CONTENT", "false").lower() == "true"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# OpenTelemetry tracing: "otlp" (to TRACING_OTLP_ENDPOINT), "console", "file" (JSON lines at
+# TRACING_FILE_PATH) or "none"
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACING_FILE_PATH = os.getenv("TRACING_FILE_PATH", "traces.jsonl")
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "therapy-simulator-server")
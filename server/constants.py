@@ -1 +1,13 @@
 SERVER_NAME = "Therapy Simulator API"
+SERVER_BUSY_MESSAGE = "The therapist is busy with other sessions. Please retry shortly."
+
+CRISIS_SAFETY_RESPONSE = """I'm really glad you told me this, and I'm taking what you've shared seriously. You deserve support right now, and you don't have to go through this alone.
+
+If you are in immediate danger or feel you might act on these thoughts, please call your local emergency number (911 in the US) or go to the nearest emergency department.
+
+You can also reach trained crisis counselors any time, free and confidential:
+- **US:** call or text **988** (Suicide & Crisis Lifeline), or text **HOME** to **741741** (Crisis Text Line)
+- **UK & Ireland:** call Samaritans on **116 123**
+- **Elsewhere:** find a local helpline at **findahelpline.com**
+
+If you can, consider reaching out to someone you trust and letting them know how you're feeling. I'm still here with you, and I'll share a few more thoughts in a moment."""
@@ -0,0 +1,181 @@
+import logging
+import re
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from server.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Phrases that indicate suicidal ideation or self-harm on their own. Each must
+# read as a crisis in any sentence ("take an overdose", not "overdose"), since a
+# match skips the therapy pipeline; indirect statements are left to the
+# embedding check.
+CRISIS_PHRASES = [
+    "suicide",
+    "suicidal",
+    "kill myself",
+    "killing myself",
+    "end my life",
+    "ending my life",
+    "take my own life",
+    "taking my own life",
+    "want to die",
+    "wanna die",
+    "wish i was dead",
+    "wish i were dead",
+    "better off dead",
+    "better off without me",
+    "no reason to live",
+    "nothing to live for",
+    "not worth living",
+    "don't want to be alive",
+    "dont want to be alive",
+    "don't want to live",
+    "dont want to live",
+    "end it all",
+    "hurt myself",
+    "hurting myself",
+    "harm myself",
+    "self harm",
+    "self-harm",
+    "cut myself",
+    "cutting myself",
+    "take an overdose",
+    "taking an overdose",
+    "jump off a bridge",
+    "ending things for good",
+    "end things for good",
+    "can't go on living",
+    "cant go on living",
+]
+
+# Exemplars for the embedding-similarity check, catching paraphrases
+CRISIS_EXEMPLARS = [
+    "I don't see any point in living anymore",
+    "Everyone would be better off if I wasn't here",
+    "I've been thinking about ending things",
+    "I have a plan to end my life",
+    "I keep thinking about disappearing forever",
+    "I've been looking up ways to die",
+    "I just want everything to stop permanently",
+    "I've started hurting myself again to cope",
+    "I wrote goodbye letters to my family",
+    "I don't think I'll be around much longer",
+    "There's no way out except dying",
+    "I want to go to sleep and never wake up",
+]
+
+
+def normalise(text: str) -> str:
+    """Lowercase, map punctuation to spaces and pad, so phrases match on word boundaries"""
+    text = text.lower().replace("’", "'")
+    text = re.sub(r"[^a-z0-9' -]+", " ", text)
+    return f" {' '.join(text.split())} "
+
+
+class PhraseAutomaton:
+    """Aho-Corasick automaton matching many phrases in one pass over the text"""
+
+    def __init__(self, phrases: List[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[str]] = [[]]
+        for phrase in phrases:
+            self._add(normalise(phrase), phrase)
+        self._build_failure_links()
+
+    def _add(self, pattern: str, phrase: str):
+        state = 0
+        for char in pattern:
+            if char not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][char] = len(self.goto) - 1
+            state = self.goto[state][char]
+        self.output[state].append(phrase)
+
+    def _build_failure_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                candidate = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = candidate if candidate != next_state else 0
+                self.output[next_state] += self.output[self.fail[next_state]]
+
+    def find(self, text: str) -> Optional[str]:
+        """Return the first phrase found in the text, or None"""
+        state = 0
+        for char in normalise(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            if self.output[state]:
+                return self.output[state][0]
+        return None
+
+
+class CrisisScreen:
+    """Local pre-screen for crisis content, run before message classification.
+
+    A phrase automaton catches explicit statements; an embedding-similarity
+    check against crisis exemplars catches paraphrases. The message embedding
+    is shared with the classifier and retrieval through the query cache.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        similarity_threshold: float,
+        phrases: List[str] = CRISIS_PHRASES,
+        exemplars: List[str] = CRISIS_EXEMPLARS,
+    ):
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.automaton = PhraseAutomaton(phrases)
+        self.exemplars = exemplars
+        self._matrix = None
+
+    def _exemplar_matrix(self):
+        if self._matrix is None:
+            matrix = np.array(self.embeddings.embed_documents(self.exemplars), dtype=np.float32)
+            self._matrix = matrix / np.maximum(
+                np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12
+            )
+        return self._matrix
+
+    def max_similarity(self, message: str) -> float:
+        query = np.array(self.embeddings.embed_query(message), dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        return float(np.max(self._exemplar_matrix() @ query))
+
+    def screen(self, message: str, use_embeddings: bool = True) -> Optional[str]:
+        """Return what triggered the screen ("phrase:..." / "similarity:...") or None"""
+        started = time.perf_counter()
+        trigger = None
+
+        phrase = self.automaton.find(message)
+        if phrase:
+            trigger = f"phrase:{phrase}"
+        elif use_embeddings:
+            try:
+                similarity = self.max_similarity(message)
+                if similarity >= self.similarity_threshold:
+                    trigger = f"similarity:{similarity:.3f}"
+            except Exception as e:
+                logger.warning("Error in crisis similarity check", extra={"stage": "crisis_screen", "error": str(e)})
+
+        metrics.observe("crisis.screen_seconds", time.perf_counter() - started)
+        if trigger:
+            metrics.increment("crisis.triggered", source=trigger.split(":")[0])
+        return trigger
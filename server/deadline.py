@@ -0,0 +1,72 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from server.config import *
+from server.metrics import metrics
+from server.structured_logging import elapsed_ms
+
+logger = logging.getLogger(__name__)
+
+# Starting per-stage latency estimates (seconds) until real timings come in
+DEFAULT_STAGE_SECONDS = {
+    "classification": 2.0,
+    "assessment": 6.0,
+    "technique": 6.0,
+    "retrieval": 1.0,
+    "response": 8.0,
+}
+
+
+class StageLatencyTracker:
+    """Exponentially weighted moving average of how long each pipeline stage takes"""
+
+    def __init__(self, defaults: Dict[str, float], alpha: float = 0.2):
+        self._lock = threading.Lock()
+        self.alpha = alpha
+        self.estimates = dict(defaults)
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            previous = self.estimates.get(stage, seconds)
+            self.estimates[stage] = (1 - self.alpha) * previous + self.alpha * seconds
+        metrics.observe("pipeline.stage_seconds", seconds, stage=stage)
+        logger.debug("Stage finished", extra={"stage": stage, "duration_ms": round(seconds * 1000, 1)})
+
+    def estimate(self, *stages: str) -> float:
+        with self._lock:
+            return sum(self.estimates.get(stage, 0.0) for stage in stages)
+
+
+stage_latency = StageLatencyTracker(DEFAULT_STAGE_SECONDS)
+
+
+class Deadline:
+    """Latency budget for one request, checked at each pipeline stage boundary.
+
+    When the remaining budget cannot cover the stages still to run, the
+    pipeline degrades and the first reason is recorded here.
+    """
+
+    def __init__(self, budget_seconds: float):
+        self.budget = budget_seconds
+        self.started = time.perf_counter()
+        self.expires_at = time.monotonic() + budget_seconds
+        self.degraded_reason: Optional[str] = None
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def can_cover(self, *stages: str) -> bool:
+        needed = stage_latency.estimate(*stages) * DEADLINE_SAFETY_FACTOR
+        return self.remaining() >= needed
+
+    def degrade(self, reason: str):
+        if self.degraded_reason is None:
+            self.degraded_reason = reason
+            metrics.increment("pipeline.degraded", reason=reason)
+            logger.warning(
+                "Degrading pipeline",
+                extra={"reason": reason, "duration_ms": elapsed_ms(self.started)},
+            )
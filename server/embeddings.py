@@ -0,0 +1,135 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from server.config import *
+from server.llm_clients import create_embeddings
+from server.metrics import metrics
+
+
+class _QueryBatch:
+    """Query texts collected during one batching window, each with a future for its vector"""
+
+    def __init__(self):
+        self.futures: Dict[str, Future] = {}
+        self.full = threading.Event()
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """Embeddings wrapper that coalesces concurrent embed_query calls.
+
+    The first query to arrive opens a batch. If another embedding call is
+    already in flight it waits up to `window_seconds` (less if the batch
+    reaches `max_batch` texts first), otherwise it goes straight away, so an
+    idle server adds no delay. Every text collected is embedded with one
+    embed_documents call and each waiting caller gets its own vector. Under
+    concurrent load this replaces many single-text calls, each paying the
+    provider's per-request overhead and counting against its request rate
+    limit, with a few batched ones. A window of 0 disables batching.
+    """
+
+    def __init__(self, embeddings: Embeddings, window_seconds: float, max_batch: int):
+        self.embeddings = embeddings
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self._batch: Optional[_QueryBatch] = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.window_seconds <= 0 or self.max_batch <= 1:
+            return self.embeddings.embed_query(text)
+
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _QueryBatch()
+                busy = self._in_flight > 0
+            future = batch.futures.get(text)
+            if future is None:
+                future = batch.futures[text] = Future()
+                if len(batch.futures) >= self.max_batch:
+                    # Full: later queries open a new batch
+                    self._batch = None
+                    batch.full.set()
+
+        if leader:
+            if busy:
+                batch.full.wait(self.window_seconds)
+            with self._lock:
+                if self._batch is batch:
+                    self._batch = None
+                self._in_flight += 1
+            try:
+                self._flush(batch)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+        return future.result()
+
+    def _flush(self, batch: _QueryBatch):
+        """Embed a closed batch with one call and resolve its futures"""
+        texts = list(batch.futures)
+        metrics.observe("embeddings.batch_size", len(texts))
+        try:
+            vectors = self.embeddings.embed_documents(texts)
+        except Exception as e:
+            for future in batch.futures.values():
+                future.set_exception(e)
+            return
+        for text, vector in zip(texts, vectors):
+            batch.futures[text].set_result(vector)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper with an LRU cache for query embeddings.
+
+    A user message is embedded once per turn: the local classifier and the
+    retrieval step both call embed_query with the same text.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_size: int = 1024):
+        self.embeddings = embeddings
+        self.max_size = max_size
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._lock:
+            if text in self._cache:
+                self._cache.move_to_end(text)
+                metrics.increment("embeddings.query_cache", result="hit")
+                return self._cache[text]
+        metrics.increment("embeddings.query_cache", result="miss")
+
+        vector = self.embeddings.embed_query(text)
+        with self._lock:
+            self._cache[text] = vector
+            if len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+
+# Shared embedding client for retrieval and local classification; cache misses
+# from concurrent requests are embedded together
+shared_embeddings = CachedQueryEmbeddings(
+    MicroBatchingEmbeddings(
+        create_embeddings(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS),
+        window_seconds=EMBEDDING_BATCH_WINDOW_MS / 1000.0,
+        max_batch=EMBEDDING_MAX_BATCH,
+    )
+)
@@ -0,0 +1,68 @@
+import json
+import re
+import threading
+from typing import Dict, List
+
+# Sections of the formulation, in the order they are rendered
+FORMULATION_FIELDS = ("distortions", "triggers", "emotions", "techniques_tried")
+FIELD_LABELS = {
+    "distortions": "Cognitive distortions",
+    "triggers": "Triggers",
+    "emotions": "Emotions",
+    "techniques_tried": "Techniques already tried",
+}
+
+JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def parse_formulation_delta(text: str) -> Dict[str, List[str]]:
+    """Items to add per field from a delta call's JSON reply; ValueError if there is none"""
+    match = JSON_OBJECT.search(text)
+    if not match:
+        raise ValueError("no JSON object in formulation delta")
+    data = json.loads(match.group(0))
+    if not isinstance(data, dict):
+        raise ValueError("formulation delta is not a JSON object")
+    return {
+        field: [str(item).strip() for item in data[field] if str(item).strip()]
+        for field in FORMULATION_FIELDS
+        if isinstance(data.get(field), list)
+    }
+
+
+class Formulation:
+    """Structured CBT case formulation of one session, built up turn by turn.
+
+    Each therapeutic turn merges the few items a short delta call found new,
+    instead of re-deriving the whole picture from the conversation. Every
+    field keeps its most recent `max_items` entries.
+    """
+
+    def __init__(self, max_items: int = 8):
+        self.max_items = max_items
+        self.fields: Dict[str, List[str]] = {field: [] for field in FORMULATION_FIELDS}
+        self.updates = 0
+        self._lock = threading.Lock()
+
+    def merge(self, delta: Dict[str, List[str]]) -> int:
+        """Add new items, skipping ones already present; returns how many were added"""
+        added = 0
+        with self._lock:
+            for field, items in delta.items():
+                current = self.fields[field]
+                known = {item.lower() for item in current}
+                for item in items:
+                    if item.lower() not in known:
+                        current.append(item)
+                        known.add(item.lower())
+                        added += 1
+                del current[: max(0, len(current) - self.max_items)]
+            self.updates += 1
+        return added
+
+    def render(self) -> str:
+        with self._lock:
+            return "\n".join(
+                f"{FIELD_LABELS[field]}: {'; '.join(self.fields[field]) or 'none noted yet'}"
+                for field in FORMULATION_FIELDS
+            )
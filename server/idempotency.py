@@ -0,0 +1,79 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, Tuple
+
+from server.config import *
+from server.metrics import metrics
+
+
+class IdempotencyConflict(Exception):
+    """Raised when a key is reused for a different request; maps to HTTP 422"""
+
+
+class IdempotencyCache:
+    """Runs each idempotency key's computation once and shares its result.
+
+    The first request with a key starts the computation as its own task, so
+    it keeps running if that client disconnects. Duplicates arriving while it
+    runs wait for the same task; later ones get the cached result until it
+    expires after `ttl_seconds`. A failed computation is forgotten straight
+    away so that a retry runs it again. Must be used from a single event loop.
+    """
+
+    def __init__(self, ttl_seconds: float, max_keys: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        # key -> (request fingerprint, created at, task), oldest first
+        self._entries: "OrderedDict[Hashable, Tuple[Hashable, float, asyncio.Task]]" = (
+            OrderedDict()
+        )
+
+    def _evict(self, now: float):
+        while self._entries:
+            _, created_at, task = next(iter(self._entries.values()))
+            expired = task.done() and now - created_at > self.ttl_seconds
+            if not expired and len(self._entries) <= self.max_keys:
+                break
+            self._entries.popitem(last=False)
+
+    def _forget_failure(self, key: Hashable, task: asyncio.Task):
+        entry = self._entries.get(key)
+        if entry is not None and entry[2] is task and (task.cancelled() or task.exception()):
+            del self._entries[key]
+
+    async def run(
+        self,
+        key: Hashable,
+        fingerprint: Hashable,
+        compute: Callable[[], Awaitable],
+    ) -> Tuple[object, bool]:
+        """Return (result, replayed); replayed is True when another request computed it"""
+        now = time.time()
+        self._evict(now)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] != fingerprint:
+                metrics.increment("idempotency.requests", result="conflict")
+                raise IdempotencyConflict(
+                    "Idempotency key was already used for a different request"
+                )
+            task = entry[2]
+            metrics.increment(
+                "idempotency.requests", result="replayed" if task.done() else "in_flight"
+            )
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(compute())
+        task.add_done_callback(lambda done: self._forget_failure(key, done))
+        self._entries[key] = (fingerprint, now, task)
+        metrics.increment("idempotency.requests", result="new")
+        # Shielded so a disconnecting client does not cancel work others may wait on
+        return await asyncio.shield(task), False
+
+
+# Global cache of chat turns by (session id, idempotency key)
+idempotency_cache = IdempotencyCache(
+    ttl_seconds=IDEMPOTENCY_TTL_SECONDS, max_keys=IDEMPOTENCY_MAX_KEYS
+)
@@ -0,0 +1,130 @@
+import time
+from typing import List, Optional
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from server.config import *
+from server.metrics import metrics
+from server.model_routing import model_routing
+from server.rate_limiter import (
+    AsyncRateLimitedTransport,
+    RateLimitedTransport,
+    openai_rate_limiter,
+)
+
+# Pooled HTTP clients shared by every OpenAI client in the process. Retries on
+# 429 happen in the transport against the shared limiter, so the SDK's own
+# per-client retries are disabled.
+_timeout = httpx.Timeout(600.0, connect=5.0)
+http_client = httpx.Client(
+    transport=RateLimitedTransport(openai_rate_limiter, OPENAI_MAX_RETRIES),
+    timeout=_timeout,
+)
+http_async_client = httpx.AsyncClient(
+    transport=AsyncRateLimitedTransport(openai_rate_limiter, OPENAI_MAX_RETRIES),
+    timeout=_timeout,
+)
+
+
+def _streamed_usage(response) -> dict:
+    """Token usage of a streamed call, from the usage metadata of its final message"""
+    try:
+        usage = response.generations[0][0].message.usage_metadata or {}
+    except (IndexError, AttributeError):
+        return {}
+    return {
+        "prompt_tokens": usage.get("input_tokens", 0),
+        "completion_tokens": usage.get("output_tokens", 0),
+        "prompt_tokens_details": {
+            "cached_tokens": (usage.get("input_token_details") or {}).get("cache_read", 0)
+        },
+    }
+
+
+class StageUsageCallback(BaseCallbackHandler):
+    """Count calls, token usage and prompt-cache hits of one pipeline stage"""
+
+    def __init__(self, stage: str, model: str):
+        self.stage = stage
+        self.model = model
+        self._started = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._started.pop(run_id, None)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        usage = (response.llm_output or {}).get("token_usage") or _streamed_usage(response)
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        cache = "hit" if cached else "miss"
+
+        metrics.increment("llm.calls", stage=self.stage, model=self.model)
+        metrics.increment("llm.prompt_cache", stage=self.stage, result=cache)
+        for kind, value in (
+            ("prompt", usage.get("prompt_tokens", 0)),
+            ("cached", cached),
+            ("completion", usage.get("completion_tokens", 0)),
+        ):
+            metrics.increment("llm.tokens", value, stage=self.stage, kind=kind)
+        if started is not None:
+            metrics.observe(
+                "llm.call_seconds",
+                time.perf_counter() - started,
+                stage=self.stage,
+                cache=cache,
+            )
+
+
+def create_chat_model(
+    temperature: float,
+    model: str = MODEL_CONFIG["model"],
+    max_tokens: Optional[int] = None,
+    stop: Optional[List[str]] = None,
+    callbacks: Optional[list] = None,
+):
+    """Create a ChatOpenAI client that goes through the shared rate limiter"""
+    return ChatOpenAI(
+        api_key=OPENAI_API_KEY,
+        base_url=OPENAI_BASE_URL,
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stop=stop,
+        callbacks=callbacks,
+        stream_usage=True,
+        max_retries=0,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+
+
+def create_stage_model(stage: str):
+    """Create the chat model configured for a pipeline stage by the routing profile"""
+    settings = model_routing[stage]
+    return create_chat_model(
+        temperature=settings["temperature"],
+        model=settings["model"],
+        max_tokens=settings["max_tokens"],
+        stop=settings["stop"],
+        callbacks=[StageUsageCallback(stage, settings["model"])],
+    )
+
+
+def create_embeddings(model: str = "text-embedding-ada-002", dimensions: Optional[int] = None):
+    """Create an OpenAIEmbeddings client that goes through the shared rate limiter"""
+    return OpenAIEmbeddings(
+        model=model,
+        dimensions=dimensions,
+        api_key=OPENAI_API_KEY,
+        base_url=OPENAI_BASE_URL,
+        # Local stand-ins expect raw text rather than tiktoken token ids
+        check_embedding_ctx_length=OPENAI_BASE_URL is None,
+        max_retries=0,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
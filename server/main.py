@@ -1,97 +1,321 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import hashlib
+import logging
+from typing import Optional, Tuple
+
+import openai
+from fastapi import (
+    FastAPI,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.concurrency import run_in_threadpool
+from opentelemetry.trace import SpanKind
+from pydantic import ValidationError
 
 from server.chat_model import *
+from server.config import *
 from server.constants import *
-from server.cbt_chain import create_cbt_sequential_chain
+from server.admission import AdmissionRejected, admission_controller
+from server.idempotency import IdempotencyConflict, idempotency_cache
+from server.metrics import metrics
+from server.session_events import session_events
 from server.session_manager import session_manager
+from server.pipeline import (
+    process_chat_turn,
+    request_deadline,
+    request_priority,
+    wait_for_follow_up,
+)
+from server.structured_logging import configure_logging, log_context, new_request_id
+from server.tracing import configure_tracing, current_trace_id, extract_context, tracer
+
+configure_logging()
+configure_tracing()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title=SERVER_NAME)
 
 
-# Initialize the CBT sequential chain
-cbt_chain = create_cbt_sequential_chain()
+@app.middleware("http")
+async def bind_request_id(request: Request, call_next):
+    """Tag the request's log records with its X-Request-ID (generated when absent) and echo it back.
 
+    FastAPI's own server span continues the client's trace from the traceparent
+    header; its trace id is added to the records too.
+    """
+    request_id = request.headers.get("x-request-id") or new_request_id()
+    with log_context(request_id=request_id, trace_id=current_trace_id()):
+        response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
 
-@app.post("/chat", response_model=ChatResponse)
-def chat_with_llm(request: ChatRequest):
+
+async def run_chat_turn(
+    request: ChatRequest, idempotency_key: Optional[str] = None
+) -> Tuple[ChatResponse, bool]:
+    """Run a turn at most once per idempotency key.
+
+    Returns the response and whether it was replayed from an earlier request
+    with the same key (the header, else the request's client_message_id).
+    """
+    key = idempotency_key or request.client_message_id
+    if key is None:
+        return await admit_chat_turn(request), False
     try:
-        # Handle session ending request
-        if request.end_session:
-            # Generate final conclusion
-            conclusion = session_manager.generate_session_conclusion(request.session_id)
-
-            # Add the final user message and conclusion to session
-            session_manager.add_message(request.session_id, "user", request.message)
-            session_manager.add_message(request.session_id, "assistant", conclusion)
-
-            return ChatResponse(
-                response=conclusion,
-                session_id=request.session_id,
-                is_session_ended=True,
-            )
+        return await idempotency_cache.run(
+            (request.session_id, key),
+            (request.message, request.end_session),
+            lambda: admit_chat_turn(request),
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+async def admit_chat_turn(request: ChatRequest) -> ChatResponse:
+    """Admit a turn and run it through the pipeline, raising HTTPException on failure"""
+    try:
+        # The latency budget starts now, so time spent queued counts against it
+        deadline = request_deadline(request)
+
+        # A crisis follow-up for the session is written first; wait without
+        # holding an LLM slot, which the follow-up itself needs
+        await run_in_threadpool(wait_for_follow_up, request, deadline)
 
-        # Add user message to session first (always track what user says)
-        session_manager.add_message(request.session_id, "user", request.message)
+        # Wait for an LLM slot; the pipeline itself is blocking, so run it in a thread
+        async with admission_controller.admit(
+            request_priority(request), timeout=deadline.remaining()
+        ):
+            return await run_in_threadpool(process_chat_turn, request, deadline)
 
-        # Classify the message to determine response strategy
-        message_classification = session_manager.classify_message(
-            request.message, request.session_id
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=SERVER_BUSY_MESSAGE,
+            headers={"Retry-After": str(e.retry_after)},
         )
-        print(
-            f"Message classification: {message_classification} for message: '{request.message[:50]}...'"
+    except openai.RateLimitError as e:
+        logger.warning("OpenAI rate limit", extra={"error": str(e)})
+        metrics.increment("openai.rate_limited")
+        raise HTTPException(
+            status_code=429,
+            detail=SERVER_BUSY_MESSAGE,
+            headers={"Retry-After": str(admission_controller.retry_after())},
         )
+    except Exception as e:
+        logger.error("CBT Chain error", extra={"error": str(e)})
+        raise HTTPException(status_code=500, detail=f"LLM API error: {str(e)}")
 
-        # Handle session end detection
-        if message_classification == "SESSION_END":
-            print("Natural session end detected")
-            # Generate final conclusion
-            conclusion = session_manager.generate_session_conclusion(request.session_id)
-            session_manager.add_message(request.session_id, "assistant", conclusion)
-
-            return ChatResponse(
-                response=conclusion,
-                session_id=request.session_id,
-                is_session_ended=True,
-            )
 
-        # For simple messages, use lightweight response (no RAG/CBT chain)
-        if message_classification in ["GREETING", "PROCEDURAL", "SMALL_TALK"]:
-            print(f"Using simple response for {message_classification}")
-            simple_response = session_manager.generate_simple_response(
-                request.message, request.session_id, message_classification
-            )
-            session_manager.add_message(
-                request.session_id, "assistant", simple_response
-            )
+@app.post("/chat", response_model=ChatResponse)
+async def chat_with_llm(
+    request: ChatRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+):
+    chat_response, replayed = await run_chat_turn(request, idempotency_key)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return chat_response
 
-            return ChatResponse(response=simple_response, session_id=request.session_id)
 
-        # For therapeutic content, use full CBT chain with RAG
-        if message_classification == "THERAPEUTIC":
-            print("Using full CBT chain with RAG")
-            # Get conversation context for more cost-effective processing
-            conversation_context = session_manager.get_conversation_context(
-                request.session_id
-            )
+async def forward_session_events(websocket: WebSocket, events: asyncio.Queue):
+    while True:
+        await websocket.send_json(await events.get())
+
 
-            # Use the CBT sequential chain with conversation context
-            llm_response = cbt_chain.invoke(
+async def run_socket_turn(
+    request: ChatRequest,
+    turn_id: Optional[str],
+    trace_context: Optional[dict],
+    events: asyncio.Queue,
+    turn_lock: asyncio.Lock,
+):
+    """Run one WebSocket turn and queue its result events.
+
+    Turns on a connection run one at a time, in the order they arrived.
+    """
+    async with turn_lock:
+        try:
+            with tracer.start_as_current_span(
+                "WS user_turn",
+                context=extract_context(trace_context),
+                kind=SpanKind.SERVER,
+                attributes={"session.id": request.session_id},
+            ), log_context(
+                request_id=new_request_id(), trace_id=current_trace_id()
+            ), session_events.turn(turn_id):
+                response, replayed = await run_chat_turn(request)
+        except HTTPException as e:
+            events.put_nowait(
                 {
-                    "message": request.message,
-                    "conversation_context": conversation_context,
+                    "type": "error",
+                    "turn_id": turn_id,
+                    "status": e.status_code,
+                    "detail": e.detail,
+                    "retry_after": (e.headers or {}).get("Retry-After"),
                 }
             )
+            return
 
-            # Add assistant response to session
-            session_manager.add_message(request.session_id, "assistant", llm_response)
+    metrics.increment("websocket.turns")
+    events.put_nowait(
+        {
+            "type": "turn_complete",
+            "turn_id": turn_id,
+            "replayed": replayed,
+            **response.model_dump(),
+        }
+    )
+    if response.is_session_ended:
+        events.put_nowait({"type": "session_ended", "turn_id": turn_id})
 
-            return ChatResponse(response=llm_response, session_id=request.session_id)
 
-    except Exception as e:
-        print(f"CBT Chain error: {str(e)}")  # Add logging
-        raise HTTPException(status_code=500, detail=f"LLM API error: {str(e)}")
+@app.websocket("/ws/{session_id}")
+async def session_socket(websocket: WebSocket, session_id: str):
+    """Session channel: user turns in; stage, token, turn and push events out.
+
+    Client -> server: {"type": "user_turn", "message", "end_session"?,
+    "deadline_seconds"?, "client_message_id"?, "turn_id"?} or {"type": "ping"}.
+    Server -> client: stage, token, turn_complete, session_ended, follow_up,
+    follow_up_failed, summary_updated, conclusion_draft, error and pong events.
+    Turns run as tasks, so pings and queued turns are read while one is running.
+    """
+    await websocket.accept()
+    events = session_events.subscribe(session_id)
+    sender = asyncio.create_task(forward_session_events(websocket, events))
+    turn_lock = asyncio.Lock()
+    turns = set()
+    metrics.increment("websocket.connections")
+    try:
+        while True:
+            data = await websocket.receive_json()
+            if data.get("type") == "ping":
+                events.put_nowait({"type": "pong"})
+                continue
+            if data.get("type") != "user_turn":
+                events.put_nowait(
+                    {"type": "error", "status": 400, "detail": "Unknown message type"}
+                )
+                continue
+
+            turn_id = data.get("turn_id")
+            try:
+                request = ChatRequest(
+                    message=data.get("message"),
+                    session_id=session_id,
+                    end_session=data.get("end_session", False),
+                    deadline_seconds=data.get("deadline_seconds"),
+                    client_message_id=data.get("client_message_id"),
+                )
+            except ValidationError as e:
+                events.put_nowait(
+                    {"type": "error", "turn_id": turn_id, "status": 422, "detail": str(e)}
+                )
+                continue
+
+            events.put_nowait({"type": "stage", "stage": "queued", "turn_id": turn_id})
+            turn = asyncio.create_task(
+                run_socket_turn(request, turn_id, data.get("trace_context"), events, turn_lock)
+            )
+            turns.add(turn)
+            turn.add_done_callback(turns.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session_events.unsubscribe(session_id, events)
+        sender.cancel()
+        for turn in turns:
+            turn.cancel()
+
+
+def session_etag(*parts) -> str:
+    return '"' + hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()[:16] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header covers the current ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+@app.get("/sessions/{session_id}", response_model=SessionInfoResponse)
+def get_session_info(session_id: str, request: Request, response: Response):
+    session = session_manager.sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    etag = session_etag(session.created_at.timestamp(), session.version)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return SessionInfoResponse(
+        session_id=session_id,
+        message_count=len(session),
+        summary=session.summary,
+        created_at=session.created_at,
+        last_updated=session.last_updated,
+        ended_at=session.ended_at,
+        is_session_ended=session.ended_at is not None,
+    )
+
+
+@app.get("/sessions/{session_id}/messages", response_model=SessionMessagesResponse)
+def get_session_messages(
+    session_id: str,
+    request: Request,
+    response: Response,
+    before: Optional[int] = Query(None, ge=0),
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+):
+    """A page of session history, newest page first; follow next_cursor for older pages"""
+    page = session_manager.get_message_page(session_id, before, limit)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    start, messages, message_count = page
+
+    # Messages are append-only, so a page's range within a session identifies its
+    # messages; the body also carries message_count, so that is part of the tag too
+    created_at = session_manager.sessions[session_id].created_at.timestamp()
+    etag = session_etag(created_at, start, start + len(messages), message_count)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return SessionMessagesResponse(
+        session_id=session_id,
+        messages=[
+            HistoryMessage(index=start + offset, role=message.role, content=message.content)
+            for offset, message in enumerate(messages)
+        ],
+        next_cursor=start if start > 0 else None,
+        message_count=message_count,
+    )
+
+
+@app.get("/sessions/{session_id}/pending", response_model=PendingMessagesResponse)
+def get_pending_messages(session_id: str):
+    pending = session_manager.pop_pending_messages(session_id)
+    if pending is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    messages, in_progress = pending
+    return PendingMessagesResponse(
+        session_id=session_id, messages=messages, in_progress=in_progress
+    )
 
 
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "service": SERVER_NAME}
+
+
+@app.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
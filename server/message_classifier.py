@@ -0,0 +1,148 @@
+import threading
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Labelled exemplar bank for nearest-neighbour classification
+CLASSIFIER_EXEMPLARS = {
+    "GREETING": [
+        "Hi doctor",
+        "Hello",
+        "Hey there",
+        "Good morning",
+        "Good afternoon doctor",
+        "Nice to meet you",
+        "Hi, how are you?",
+        "Hello, it's good to see you again",
+        "Hey doc, how's it going?",
+        "Hi, I'm here for my session",
+        "Good evening",
+        "Hello there, pleased to meet you",
+    ],
+    "PROCEDURAL": [
+        "Should we start?",
+        "How does this work?",
+        "What do we do now?",
+        "How long is the session?",
+        "What should I talk about?",
+        "Where do we begin?",
+        "Is everything I say confidential?",
+        "What happens in a CBT session?",
+        "Do I need to prepare anything?",
+        "Can we get started?",
+        "What's the plan for today?",
+        "How many sessions will I need?",
+    ],
+    "SMALL_TALK": [
+        "I am doing great, how are you doing?",
+        "Any plans for the weekend?",
+        "The weather has been lovely this week",
+        "Traffic was terrible on the way here",
+        "I just got back from a trip to the coast",
+        "Did you watch the game last night?",
+        "Nice office you have",
+        "I had a really good coffee this morning",
+        "It's so cold outside today",
+        "I'm fine thanks, and you?",
+        "Busy week at work but nothing special",
+        "My neighbour got a new puppy",
+    ],
+    "SESSION_END": [
+        "Have a good day doc",
+        "See you soon",
+        "I think I feel ok now",
+        "That's all for today",
+        "I should go",
+        "Thanks for today",
+        "Ready to end the session",
+        "Thank you, see you next week",
+        "I think that's enough for now, bye",
+        "I have to leave now, thanks for listening",
+        "Let's stop here for today",
+        "Goodbye, this was helpful",
+    ],
+    "THERAPEUTIC": [
+        "I've been feeling really anxious lately",
+        "I can't stop thinking that I'm a failure",
+        "I don't want to get out of bed anymore",
+        "My partner and I keep fighting and I feel hopeless",
+        "I panic whenever I have to speak in public",
+        "I feel so lonely since I moved here",
+        "I've been having thoughts of hurting myself",
+        "Nothing I do ever seems good enough",
+        "I get angry at my kids and then feel guilty",
+        "I can't sleep because my mind keeps racing",
+        "I'm worried all the time about my health",
+        "I feel numb and nothing matters to me",
+        "Work stress is making me cry every night",
+        "I avoid my friends because I think they don't like me",
+        "I keep replaying a mistake I made and I feel ashamed",
+    ],
+}
+
+
+class NearestNeighbourClassifier:
+    """k-NN message classifier over an embedded exemplar bank.
+
+    Neighbours vote with their cosine similarity. The margin is the gap between
+    the winning label's vote share and the runner-up's, so callers can fall
+    back to the LLM when the local decision is not clear-cut.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        exemplars: Dict[str, List[str]] = CLASSIFIER_EXEMPLARS,
+        k: int = 5,
+    ):
+        self.embeddings = embeddings
+        self.exemplars = exemplars
+        self.k = k
+        self._labels: List[str] = []
+        self._matrix = None
+        self._lock = threading.Lock()
+
+    def _ensure_index(self):
+        """Embed the exemplar bank once, on first use"""
+        if self._matrix is not None:
+            return
+        with self._lock:
+            if self._matrix is not None:
+                return
+            labels, texts = [], []
+            for label, examples in self.exemplars.items():
+                labels.extend([label] * len(examples))
+                texts.extend(examples)
+            matrix = np.array(self.embeddings.embed_documents(texts), dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            self._labels = labels
+            self._matrix = matrix / np.maximum(norms, 1e-12)
+
+    def label_shares(self, message: str) -> Dict[str, float]:
+        """Share of the neighbour vote each label receives for a message"""
+        self._ensure_index()
+        query = np.array(self.embeddings.embed_query(message), dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        similarities = self._matrix @ query
+        neighbours = np.argsort(-similarities)[: self.k]
+
+        votes = defaultdict(float)
+        for index in neighbours:
+            votes[self._labels[index]] += max(float(similarities[index]), 0.0)
+        total = sum(votes.values())
+        if total <= 0:
+            return {}
+        return {label: vote / total for label, vote in votes.items()}
+
+    def classify(self, message: str) -> Tuple[str, float]:
+        """Return (label, margin) for a message"""
+        shares = self.label_shares(message)
+        if not shares:
+            return "THERAPEUTIC", 0.0
+
+        ranked = sorted(shares.items(), key=lambda item: item[1], reverse=True)
+        runner_up_share = ranked[1][1] if len(ranked) > 1 else 0.0
+        return ranked[0][0], ranked[0][1] - runner_up_share
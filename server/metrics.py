@@ -0,0 +1,76 @@
+import threading
+from collections import deque
+from typing import Dict
+
+
+class Metrics:
+    """Minimal in-process metrics registry: counters, gauges and latency histograms.
+
+    Histograms keep a bounded window of recent observations so percentiles
+    reflect current behaviour. A snapshot is served as JSON from GET /metrics.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._window = window
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[str, deque] = {}
+        self.histogram_totals: Dict[str, list] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict) -> str:
+        if not labels:
+            return name
+        label_text = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+        return f"{name}{{{label_text}}}"
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = deque(maxlen=self._window)
+                self.histogram_totals[key] = [0, 0.0]
+            self.histograms[key].append(value)
+            self.histogram_totals[key][0] += 1
+            self.histogram_totals[key][1] += value
+
+    @staticmethod
+    def _percentile(ordered, pct: float) -> float:
+        if not ordered:
+            return 0.0
+        index = min(len(ordered) - 1, int(round((len(ordered) - 1) * pct / 100.0)))
+        return ordered[index]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            histograms = {}
+            for key, values in self.histograms.items():
+                ordered = sorted(values)
+                count, total = self.histogram_totals[key]
+                histograms[key] = {
+                    "count": count,
+                    "sum": round(total, 4),
+                    "p50": round(self._percentile(ordered, 50), 4),
+                    "p95": round(self._percentile(ordered, 95), 4),
+                    "p99": round(self._percentile(ordered, 99), 4),
+                }
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": histograms,
+            }
+
+
+# Global metrics registry
+metrics = Metrics()
@@ -0,0 +1,67 @@
+import json
+import logging
+from typing import Dict, Optional
+
+from server.config import *
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages that make their own LLM calls
+STAGES = (
+    "classification",
+    "assessment",
+    "formulation",
+    "technique",
+    "response",
+    "simple_response",
+    "summary",
+    "conclusion",
+    "conclusion_update",
+)
+
+SETTING_KEYS = ("model", "temperature", "max_tokens", "stop")
+
+
+def default_stage_settings() -> Dict:
+    return {
+        "model": MODEL_CONFIG["model"],
+        "temperature": MODEL_CONFIG["temperature"],
+        "max_tokens": MODEL_CONFIG["max_tokens"],
+        "stop": None,
+    }
+
+
+def load_model_routing(path: Optional[str], profile: str) -> Dict[str, Dict]:
+    """Resolve per-stage model settings from a routing profile.
+
+    A profile maps stage names to any of model, temperature, max_tokens and
+    stop; "*" sets values for every stage. Anything left unset falls back to
+    MODEL_CONFIG.
+    """
+    routing = {stage: default_stage_settings() for stage in STAGES}
+    if not path:
+        return routing
+
+    with open(path, encoding="utf-8") as f:
+        profiles = json.load(f)["profiles"]
+    if profile not in profiles:
+        raise ValueError(
+            f"Unknown model routing profile '{profile}' in {path} "
+            f"(available: {', '.join(profiles)})"
+        )
+
+    overrides = profiles[profile]
+    for stage in overrides:
+        if stage != "*" and stage not in STAGES:
+            logger.warning(
+                f"Ignoring unknown stage '{stage}' in model routing profile '{profile}'",
+                extra={"stage": stage},
+            )
+    for stage, settings in routing.items():
+        for source in (overrides.get("*", {}), overrides.get(stage, {})):
+            settings.update({k: v for k, v in source.items() if k in SETTING_KEYS})
+    return routing
+
+
+# Per-stage settings for the active profile, resolved once at startup
+model_routing = load_model_routing(MODEL_ROUTING_PATH, MODEL_ROUTING_PROFILE)
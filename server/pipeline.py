@@ -0,0 +1,321 @@
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from server.admission import (
+    PRIORITY_CONCLUSION,
+    PRIORITY_DEFAULT,
+    PRIORITY_THERAPEUTIC,
+    AdmissionRejected,
+    admission_controller,
+)
+from server.chat_model import *
+from server.config import *
+from server.constants import *
+from server.crisis_screen import CrisisScreen
+from server.deadline import Deadline, stage_latency
+from server.cbt_chain import create_cbt_sequential_chain
+from server.embeddings import shared_embeddings
+from server.metrics import metrics
+from server.session_events import session_events
+from server.session_manager import session_manager
+from server.structured_logging import elapsed_ms, log_context, log_fields, new_request_id
+from server.tracing import stage_span, tracer
+
+logger = logging.getLogger(__name__)
+
+
+# Initialize the CBT sequential chain
+cbt_chain = create_cbt_sequential_chain()
+
+# Local crisis pre-screen, run before classification
+crisis_screen = CrisisScreen(shared_embeddings, CRISIS_SIMILARITY_THRESHOLD)
+
+# Work that should not hold up the response the user is waiting for
+background_executor = ThreadPoolExecutor(
+    max_workers=BACKGROUND_WORKERS, thread_name_prefix="background"
+)
+
+
+def request_priority(request: ChatRequest) -> int:
+    """Admission priority for a request, decided before any LLM work"""
+    if request.end_session:
+        return PRIORITY_CONCLUSION
+    session = session_manager.sessions.get(request.session_id)
+    if session and session.therapeutic_turns > 0:
+        return PRIORITY_THERAPEUTIC
+    return PRIORITY_DEFAULT
+
+
+def run_crisis_follow_up(session_id: str, message: str, expected_length: int):
+    """Run the full CBT chain after a crisis safety response and queue its reply.
+
+    The session's next turn waits for this job, so the reply lands straight
+    after the safety response. If that turn stopped waiting at its deadline,
+    or the session ended, the reply is dropped rather than appended out of order.
+    """
+    session = session_manager.get_session(session_id)
+    pending = None
+    try:
+        # The chain holds an admission slot like any other turn
+        with admission_controller.admit_from_thread(PRIORITY_THERAPEUTIC):
+            conversation_context = session_manager.get_conversation_context(session_id)
+            with stage_span("crisis_follow_up"):
+                follow_up = cbt_chain.invoke(
+                    {
+                        "message": message,
+                        "conversation_context": conversation_context,
+                        **session_manager.formulation_inputs(session_id),
+                    }
+                )
+        with session.lock:
+            stale = session.ended_at is not None or len(session) != expected_length
+            if not stale:
+                session_manager.add_message(session_id, "assistant", follow_up)
+        if stale:
+            logger.warning("Dropping crisis follow-up for a session that moved on", extra={"stage": "crisis_follow_up"})
+            metrics.increment("crisis.follow_up_dropped")
+            session_events.publish(session_id, {"type": "follow_up_failed"})
+        elif session_events.has_subscribers(session_id):
+            session_events.publish(session_id, {"type": "follow_up", "message": follow_up})
+        else:
+            pending = follow_up
+    except Exception as e:
+        logger.error("Error generating crisis follow-up", extra={"stage": "crisis_follow_up", "error": str(e)})
+        session_events.publish(session_id, {"type": "follow_up_failed"})
+    finally:
+        session.finish_background_task(pending)
+
+
+def schedule_conclusion_draft(session_id: str, message: str):
+    """Refresh the speculative conclusion draft in the background when it is due"""
+    try:
+        shares = session_manager.message_classifier.label_shares(message)
+        ending_signal = shares.get("SESSION_END", 0.0) >= CONCLUSION_DRAFT_END_SIGNAL
+    except Exception as e:
+        logger.warning("Error checking for ending signals", extra={"stage": "conclusion_draft", "error": str(e)})
+        ending_signal = False
+
+    if session_manager.conclusion_draft_due(session_id, ending_signal):
+        session_manager.get_session(session_id).conclusion_refreshing = True
+        submit_background(run_conclusion_draft, session_id)
+
+
+def run_conclusion_draft(session_id: str):
+    """Refresh the conclusion draft in an admission slot; skipped when admission is refused"""
+    try:
+        with admission_controller.admit_from_thread(PRIORITY_CONCLUSION):
+            session_manager.refresh_conclusion_draft(session_id)
+    except AdmissionRejected as e:
+        logger.info("Skipping conclusion draft", extra={"stage": "conclusion_draft", "reason": e.reason})
+        metrics.increment("conclusion.drafts_skipped", reason=e.reason)
+        session = session_manager.sessions.get(session_id)
+        if session is not None:
+            session.conclusion_refreshing = False
+
+
+def submit_background(function, *args):
+    """Run work on the background executor, keeping the request's log context"""
+    background_executor.submit(contextvars.copy_context().run, function, *args)
+
+
+def remember_turn(session_id: str):
+    """Index the latest user message in session memory, in the background"""
+    if SESSION_MEMORY_TOP_K:
+        index = session_manager.get_session(session_id).last_index("user")
+        submit_background(session_manager.remember_turn, session_id, index)
+
+
+def wait_for_follow_up(request: ChatRequest, deadline: Deadline):
+    """Hold a turn until the session's pending crisis follow-up has been written"""
+    session = session_manager.sessions.get(request.session_id)
+    if session is None:
+        return
+    if not session.wait_for_background_tasks(deadline.remaining()):
+        logger.warning("Crisis follow-up still running at the deadline", extra={"stage": "crisis_follow_up"})
+
+
+def emit_stage(session_id: str, stage: str):
+    session_events.publish(session_id, {"type": "stage", "stage": stage})
+
+
+def request_deadline(request: ChatRequest) -> Deadline:
+    if request.deadline_seconds is None:
+        return Deadline(REQUEST_DEADLINE_SECONDS)
+    return Deadline(request.deadline_seconds)
+
+
+def process_chat_turn(request: ChatRequest, deadline: Deadline = None) -> ChatResponse:
+    """Run one chat turn through classification and the matching response path.
+
+    Shared by the HTTP API and in-process runners such as simulate_sessions.py.
+    The deadline starts when the request arrives; the therapeutic chain skips
+    stages it can no longer afford. Every record logged during the turn
+    carries its request and session ids, and its stages are traced as
+    children of one "chat_turn" span.
+    """
+    request_id = log_fields().get("request_id") or new_request_id()
+    with tracer.start_as_current_span(
+        "chat_turn", attributes={"session.id": request.session_id, "request.id": request_id}
+    ) as span, log_context(request_id=request_id, session_id=request.session_id):
+        started = time.perf_counter()
+        response = _run_turn(request, deadline)
+        span.set_attribute("classification", response.classification)
+        if response.degraded_reason:
+            span.set_attribute("degraded_reason", response.degraded_reason)
+        logger.info(
+            "Turn complete",
+            extra={
+                "classification": response.classification,
+                "duration_ms": elapsed_ms(started),
+                "reason": response.degraded_reason,
+            },
+        )
+        return response
+
+
+def _run_turn(request: ChatRequest, deadline: Deadline = None) -> ChatResponse:
+    if deadline is None:
+        deadline = request_deadline(request)
+    wait_for_follow_up(request, deadline)
+
+    # Handle session ending request
+    if request.end_session:
+        emit_stage(request.session_id, "conclusion")
+        # Generate final conclusion, from the background draft when there is one
+        with stage_span("conclusion"):
+            conclusion, conclusion_info = session_manager.conclude_session(
+                request.session_id
+            )
+
+        # Add the final user message and conclusion to session
+        session_manager.add_message(request.session_id, "user", request.message)
+        session_manager.add_message(request.session_id, "assistant", conclusion)
+
+        return ChatResponse(
+            response=conclusion,
+            session_id=request.session_id,
+            is_session_ended=True,
+            classification="SESSION_END",
+            conclusion=conclusion_info,
+        )
+
+    # Add user message to session first (always track what user says)
+    session_manager.add_message(request.session_id, "user", request.message)
+
+    # Crisis content gets an immediate safety response; the full chain runs in the background
+    with stage_span("crisis_screen") as span:
+        crisis_trigger = crisis_screen.screen(request.message)
+        span.set_attribute("crisis.triggered", bool(crisis_trigger))
+    if crisis_trigger:
+        logger.warning(
+            "Crisis pre-screen triggered",
+            extra={"stage": "crisis_screen", "source": crisis_trigger.split(":")[0]},
+        )
+        session = session_manager.get_session(request.session_id)
+        session_manager.add_message(
+            request.session_id, "assistant", CRISIS_SAFETY_RESPONSE
+        )
+        session.therapeutic_turns += 1
+        remember_turn(request.session_id)
+        session.begin_background_task()
+        submit_background(
+            run_crisis_follow_up, request.session_id, request.message, len(session)
+        )
+
+        return ChatResponse(
+            response=CRISIS_SAFETY_RESPONSE,
+            session_id=request.session_id,
+            classification="CRISIS",
+            follow_up_pending=True,
+        )
+
+    # Classify the message to determine response strategy
+    emit_stage(request.session_id, "classification")
+    started = time.perf_counter()
+    with stage_span("classification") as span:
+        message_classification = session_manager.classify_message(
+            request.message, request.session_id
+        )
+        span.set_attribute("classification", message_classification)
+    stage_latency.record("classification", time.perf_counter() - started)
+    logger.info(
+        "Message classified",
+        extra={
+            "stage": "classification",
+            "classification": message_classification,
+            "duration_ms": elapsed_ms(started),
+            "content": request.message,
+        },
+    )
+
+    # Handle session end detection
+    if message_classification == "SESSION_END":
+        emit_stage(request.session_id, "conclusion")
+        # Generate final conclusion, from the background draft when there is one
+        with stage_span("conclusion"):
+            conclusion, conclusion_info = session_manager.conclude_session(
+                request.session_id
+            )
+        session_manager.add_message(request.session_id, "assistant", conclusion)
+
+        return ChatResponse(
+            response=conclusion,
+            session_id=request.session_id,
+            is_session_ended=True,
+            classification="SESSION_END",
+            conclusion=conclusion_info,
+        )
+
+    # For simple messages, use lightweight response (no RAG/CBT chain)
+    if message_classification in ["GREETING", "PROCEDURAL", "SMALL_TALK"]:
+        emit_stage(request.session_id, "simple_response")
+        with stage_span("simple_response"):
+            simple_response = session_manager.generate_simple_response(
+                request.message, request.session_id, message_classification
+            )
+        session_manager.add_message(request.session_id, "assistant", simple_response)
+        schedule_conclusion_draft(request.session_id, request.message)
+
+        return ChatResponse(
+            response=simple_response,
+            session_id=request.session_id,
+            classification=message_classification,
+        )
+
+    # For therapeutic content, use full CBT chain with RAG; only these turns are
+    # kept in session memory for recall
+    session_manager.get_session(request.session_id).therapeutic_turns += 1
+    remember_turn(request.session_id)
+    # Get conversation context for more cost-effective processing
+    conversation_context = session_manager.get_conversation_context(
+        request.session_id
+    )
+
+    # Use the CBT sequential chain with conversation context; stage progress and
+    # token deltas go to WebSocket listeners when any are connected
+    on_event = None
+    if session_events.has_subscribers(request.session_id):
+        on_event = partial(session_events.publish, request.session_id)
+    llm_response = cbt_chain.invoke(
+        {
+            "message": request.message,
+            "conversation_context": conversation_context,
+            "deadline": deadline,
+            "on_event": on_event,
+            **session_manager.formulation_inputs(request.session_id),
+        }
+    )
+
+    # Add assistant response to session
+    session_manager.add_message(request.session_id, "assistant", llm_response)
+    schedule_conclusion_draft(request.session_id, request.message)
+
+    return ChatResponse(
+        response=llm_response,
+        session_id=request.session_id,
+        classification=message_classification,
+        degraded_reason=deadline.degraded_reason,
+    )
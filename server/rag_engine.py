@@ -1,45 +1,73 @@
 import os
+import json
 from typing import List, Dict, Optional
 from pinecone import Pinecone
 from datasets import load_dataset
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_pinecone import PineconeVectorStore
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from langchain.chains import RetrievalQA
 from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import InMemoryVectorStore
 
 from server.config import *
+from server.embeddings import shared_embeddings
+from server.llm_clients import create_chat_model
+from server.technique_selector import CBT_TECHNIQUES
+from server.vector_query import HedgedVectorQuery
 
 
 class RAGEngine:
-    def __init__(self):
-        """Initialize RAG Engine with Pinecone vector store"""
-        self.index_name = PINECONE_INDEX_NAME
-        self.pc = Pinecone(api_key=PINECONE_API_KEY)
-        self.embeddings = OpenAIEmbeddings(
-            model="text-embedding-ada-002",  # 1536 dimensions
-            api_key=OPENAI_API_KEY,
-        )
+    def __init__(self, index_name: Optional[str] = None):
+        """Initialize RAG Engine with Pinecone (or in-memory) vector store"""
+        self.index_name = index_name or PINECONE_INDEX_NAME
+        self.embeddings = shared_embeddings
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=50,
-        )
-        self.llm = ChatOpenAI(
-            api_key=OPENAI_API_KEY,
-            model=MODEL_CONFIG["model"],
-            temperature=MODEL_CONFIG["temperature"],
+            chunk_size=RAG_CHUNK_SIZE,
+            chunk_overlap=RAG_CHUNK_OVERLAP,
         )
+        self.llm = create_chat_model(temperature=MODEL_CONFIG["temperature"])
 
         # Initialize vector store
-        self._setup_index()
-        self.vectorstore = PineconeVectorStore(
-            index=self.index, embedding=self.embeddings, text_key="text"
+        if VECTOR_STORE_BACKEND == "memory":
+            self.pc = None
+            self.index = None
+            self.vectorstore = InMemoryVectorStore(embedding=self.embeddings)
+            if VECTOR_STORE_SEED_PATH:
+                self.load_conversations_from_file(VECTOR_STORE_SEED_PATH)
+        else:
+            self.pc = Pinecone(api_key=PINECONE_API_KEY)
+            self._setup_index()
+            self.vectorstore = PineconeVectorStore(
+                index=self.index, embedding=self.embeddings, text_key="text"
+            )
+
+        # Query path for retrieval at request time: one pooled async client,
+        # deadline-bounded and hedged
+        self._async_index = None
+        self.vector_query = HedgedVectorQuery(
+            self._query_matches,
+            hedge_percentile=RETRIEVAL_HEDGE_PERCENTILE,
+            min_hedge_delay_seconds=RETRIEVAL_HEDGE_MIN_DELAY_MS / 1000.0,
+            store="memory" if self.index is None else "pinecone",
         )
 
     def _setup_index(self):
         """Connect to existing Pinecone index"""
-        self.index = self.pc.Index(self.index_name)
+        self.host = self.pc.describe_index(self.index_name).host
+        self.index = self.pc.Index(host=self.host)
+
+    async def _query_matches(self, vector: List[float], k: int) -> List[Dict]:
+        """Metadata of the k nearest documents; runs on the vector query loop"""
+        if self.index is None:
+            docs = await self.vectorstore.asimilarity_search_by_vector(vector, k=k)
+            return [doc.metadata for doc in docs]
+        if self._async_index is None:
+            self._async_index = self.pc.IndexAsyncio(host=self.host)
+        response = await self._async_index.query(
+            vector=vector, top_k=k, include_metadata=True
+        )
+        return [match.metadata or {} for match in response.matches]
 
     def add_documents(
         self, documents: List[str], metadatas: Optional[List[Dict]] = None
@@ -58,55 +86,56 @@ class RAGEngine:
 
     def add_cbt_knowledge_base(self):
         """Add CBT-specific knowledge to the vector store"""
-        cbt_techniques = [
-            {
-                "text": """ABC Model (Activating Event, Belief, Consequence): This foundational CBT technique helps identify the connection between situations, thoughts, and emotional responses. The Activating Event is the trigger situation, the Belief is the thought or interpretation about the event, and the Consequence is the emotional and behavioral response. By examining these three components, clients can identify how their interpretations of events (rather than the events themselves) create their emotional distress. This technique is particularly effective for anxiety, depression, and anger management.""",
-                "metadata": {
-                    "technique": "ABC Model",
-                    "category": "cognitive restructuring",
-                },
-            },
-            {
-                "text": """Cognitive Restructuring: This technique involves identifying and challenging negative thought patterns and cognitive distortions. Common distortions include all-or-nothing thinking, catastrophizing, mind reading, and overgeneralization. The process involves: 1) Identifying the negative thought, 2) Examining evidence for and against the thought, 3) Developing balanced, realistic alternative thoughts, 4) Testing these new thoughts behaviorally. This technique is central to treating depression, anxiety disorders, and low self-esteem.""",
-                "metadata": {
-                    "technique": "Cognitive Restructuring",
-                    "category": "cognitive restructuring",
-                },
-            },
-            {
-                "text": """Behavioral Activation: This technique focuses on increasing engagement in meaningful, pleasurable, or mastery-oriented activities. It's based on the principle that behavior influences mood. The process involves: identifying values and goals, scheduling pleasant activities, monitoring mood changes, and gradually increasing activity levels. Behavioral activation is particularly effective for depression, as it helps break the cycle of withdrawal and inactivity that maintains depressive symptoms.""",
-                "metadata": {
-                    "technique": "Behavioral Activation",
-                    "category": "behavioral intervention",
-                },
-            },
-            {
-                "text": """Exposure Therapy: A behavioral technique used primarily for anxiety disorders, phobias, and PTSD. It involves gradual, controlled exposure to feared situations or objects in a safe environment. The exposure can be imaginal (visualizing the feared situation) or in vivo (real-life exposure). The process helps clients learn that their feared consequences are unlikely to occur and that anxiety naturally decreases over time. Systematic desensitization and graded exposure hierarchies are common variations.""",
-                "metadata": {
-                    "technique": "Exposure Therapy",
-                    "category": "behavioral intervention",
-                },
-            },
-            {
-                "text": """Mindfulness and Acceptance Strategies: These techniques, borrowed from third-wave CBT approaches, help clients observe thoughts and feelings without judgment. Mindfulness practices include breathing exercises, body scans, and present-moment awareness. Acceptance strategies involve acknowledging difficult emotions without trying to change them immediately. These techniques are effective for anxiety, depression, chronic pain, and emotional regulation difficulties.""",
-                "metadata": {
-                    "technique": "Mindfulness",
-                    "category": "acceptance-based",
-                },
-            },
-            {
-                "text": """Problem-Solving Therapy: A structured approach to addressing specific life problems that contribute to emotional distress. The steps include: 1) Problem identification and definition, 2) Goal setting, 3) Brainstorming solutions, 4) Evaluating pros and cons of each solution, 5) Implementing the chosen solution, 6) Evaluating outcomes. This technique is useful for clients facing concrete life challenges alongside their emotional difficulties.""",
-                "metadata": {
-                    "technique": "Problem-Solving",
-                    "category": "behavioral intervention",
-                },
-            },
-        ]
-
-        documents = [item["text"] for item in cbt_techniques]
-        metadatas = [item["metadata"] for item in cbt_techniques]
+        documents = [item["text"] for item in CBT_TECHNIQUES]
+        metadatas = [item["metadata"] for item in CBT_TECHNIQUES]
         self.add_documents(documents, metadatas)
 
+    def _conversation_documents(self, records, source: str):
+        """Turn counseling records ('Context'/'Response' fields) into documents and metadata"""
+        documents = []
+        metadatas = []
+
+        for item in records:
+            # This dataset typically has 'Context' and 'Response' fields
+            # We'll combine them to create meaningful therapy examples
+            context = item.get("Context", "")
+            response = item.get("Response", "")
+
+            if context and response:
+                # Create a conversation format
+                conversation_text = f"Client: {context}\nTherapist: {response}"
+                documents.append(conversation_text)
+                metadatas.append(
+                    {
+                        "source": source,
+                        "type": "therapy_conversation",
+                        "client_message": context,
+                        "therapist_response": response,
+                    }
+                )
+            elif context:
+                # If only context available, still useful for understanding client concerns
+                documents.append(f"Client concern: {context}")
+                metadatas.append(
+                    {
+                        "source": source,
+                        "type": "client_concern",
+                        "content": context,
+                    }
+                )
+            elif response:
+                # If only response available, useful for therapeutic response patterns
+                documents.append(f"Therapeutic response: {response}")
+                metadatas.append(
+                    {
+                        "source": source,
+                        "type": "therapeutic_response",
+                        "content": response,
+                    }
+                )
+
+        return documents, metadatas
+
     def load_mental_health_conversations(self, limit: Optional[int] = 300):
         """Load the specific mental health counseling conversations dataset"""
         dataset_name = "Amod/mental_health_counseling_conversations"
@@ -117,47 +146,7 @@ class RAGEngine:
             if limit:
                 dataset = dataset.select(range(min(limit, len(dataset))))
 
-            documents = []
-            metadatas = []
-
-            for item in dataset:
-                # This dataset typically has 'Context' and 'Response' fields
-                # We'll combine them to create meaningful therapy examples
-                context = item.get("Context", "")
-                response = item.get("Response", "")
-
-                if context and response:
-                    # Create a conversation format
-                    conversation_text = f"Client: {context}\nTherapist: {response}"
-                    documents.append(conversation_text)
-                    metadatas.append(
-                        {
-                            "source": dataset_name,
-                            "type": "therapy_conversation",
-                            "client_message": context,
-                            "therapist_response": response,
-                        }
-                    )
-                elif context:
-                    # If only context available, still useful for understanding client concerns
-                    documents.append(f"Client concern: {context}")
-                    metadatas.append(
-                        {
-                            "source": dataset_name,
-                            "type": "client_concern",
-                            "content": context,
-                        }
-                    )
-                elif response:
-                    # If only response available, useful for therapeutic response patterns
-                    documents.append(f"Therapeutic response: {response}")
-                    metadatas.append(
-                        {
-                            "source": dataset_name,
-                            "type": "therapeutic_response",
-                            "content": response,
-                        }
-                    )
+            documents, metadatas = self._conversation_documents(dataset, dataset_name)
 
             if documents:
                 self.add_documents(documents, metadatas)
@@ -173,6 +162,26 @@ class RAGEngine:
             print(f"Error loading dataset {dataset_name}: {str(e)}")
             return 0
 
+    def load_conversations_from_file(self, path: str, limit: Optional[int] = None):
+        """Load counseling conversations from a local JSONL file in the dataset's format"""
+        try:
+            records = []
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        records.append(json.loads(line))
+            if limit:
+                records = records[:limit]
+
+            documents, metadatas = self._conversation_documents(records, path)
+            if documents:
+                self.add_documents(documents, metadatas)
+            return len(documents)
+
+        except Exception as e:
+            print(f"Error loading conversations from {path}: {str(e)}")
+            return 0
+
     def load_therapy_dataset(self, dataset_name: str, limit: Optional[int] = 100):
         """Load therapy-related dataset from HuggingFace"""
         try:
@@ -225,18 +234,24 @@ class RAGEngine:
             search_type="similarity", search_kwargs={"k": k}
         )
 
-    def retrieve_therapist_responses(self, query: str, k: int = 4) -> List[str]:
-        """Retrieve therapist responses specifically for response generation"""
-        retriever = self.get_retriever(k=k)
-        docs = retriever.invoke(query)
-
-        therapist_responses = []
+    def retrieve_therapist_responses(
+        self, query: str, k: int = 4, timeout: Optional[float] = None
+    ) -> List[str]:
+        """Retrieve therapist responses specifically for response generation.
 
-        for doc in docs:
-
-            content = doc.metadata["therapist_response"]
-
-            # Include other therapeutic knowledge as-is
-            therapist_responses.append(content)
+        Returns no responses when the vector store does not answer within the
+        timeout (RETRIEVAL_TIMEOUT_SECONDS by default), so a slow query cannot
+        stall the turn.
+        """
+        vector = self.embeddings.embed_query(query)
+        matches = self.vector_query.query(
+            vector, k, RETRIEVAL_TIMEOUT_SECONDS if timeout is None else timeout
+        )
+        if matches is None:
+            return []
 
+        # Knowledge-base chunks have no therapist response and are skipped
+        therapist_responses = [
+            match["therapist_response"] for match in matches if "therapist_response" in match
+        ]
         return therapist_responses[:k]  # Return up to k responses
@@ -0,0 +1,286 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import httpx
+
+from server.config import *
+from server.metrics import metrics
+
+# Completion budget assumed when a request does not set max_tokens
+DEFAULT_COMPLETION_TOKENS = 512
+
+
+def estimate_request_tokens(payload: Dict) -> int:
+    """Estimate the tokens an OpenAI request will count against the TPM limit.
+
+    Uses roughly four characters per token for prompts and embedding inputs,
+    plus the requested (or assumed) completion budget for chat requests.
+    """
+    if "messages" in payload:
+        chars = sum(len(str(message.get("content", ""))) for message in payload["messages"])
+        completion = payload.get("max_tokens") or payload.get("max_completion_tokens")
+        return chars // 4 + 1 + (completion or DEFAULT_COMPLETION_TOKENS)
+
+    inputs = payload.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    tokens = 0
+    for item in inputs:
+        # Embedding inputs may already be token id arrays
+        tokens += len(item) if isinstance(item, list) else len(str(item)) // 4 + 1
+    return max(tokens, 1)
+
+
+class LocalLimiterState:
+    """Bucket state shared by every client in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict = {}
+
+    @contextmanager
+    def locked(self):
+        with self._lock:
+            yield self._data
+
+
+class FileLimiterState:
+    """Bucket state shared across processes through a lock-protected JSON file (POSIX only)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def locked(self):
+        # Imported here so the in-process limiter still works where fcntl is missing (Windows)
+        import fcntl
+
+        with self._lock, open(self.path, "a+", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                data = json.loads(raw) if raw.strip() else {}
+                yield data
+                f.seek(0)
+                f.truncate()
+                json.dump(data, f)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class RateLimiter:
+    """Token-bucket limiter for requests per minute and tokens per minute.
+
+    Both buckets refill continuously and hold at most `burst_seconds` worth of
+    capacity, since providers enforce per-minute limits over shorter windows.
+    A 429 from the provider pauses every caller sharing the limiter.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        burst_seconds: float = 1.0,
+        state=None,
+    ):
+        self.request_rate = requests_per_minute / 60.0
+        self.token_rate = tokens_per_minute / 60.0
+        self.request_capacity = max(1.0, self.request_rate * burst_seconds)
+        self.token_capacity = max(1.0, self.token_rate * burst_seconds)
+        self.state = state or LocalLimiterState()
+
+    def _refill(self, data: Dict, now: float):
+        if "updated" not in data:
+            data.update(
+                requests=self.request_capacity,
+                tokens=self.token_capacity,
+                updated=now,
+                blocked_until=0.0,
+            )
+        elapsed = max(0.0, now - data["updated"])
+        data["requests"] = min(
+            self.request_capacity, data["requests"] + elapsed * self.request_rate
+        )
+        data["tokens"] = min(
+            self.token_capacity, data["tokens"] + elapsed * self.token_rate
+        )
+        data["updated"] = now
+
+    def cost(self, tokens: int) -> float:
+        """Tokens charged for a request; clamped so oversized requests can still run"""
+        return min(float(tokens), self.token_capacity)
+
+    def try_acquire(self, tokens: int) -> float:
+        """Take capacity for one request if available; otherwise return seconds to wait"""
+        cost = self.cost(tokens)
+        with self.state.locked() as data:
+            now = time.time()
+            self._refill(data, now)
+            if data["blocked_until"] > now:
+                return data["blocked_until"] - now
+            if data["requests"] >= 1.0 and data["tokens"] >= cost:
+                data["requests"] -= 1.0
+                data["tokens"] -= cost
+                return 0.0
+            request_wait = max(0.0, 1.0 - data["requests"]) / self.request_rate
+            token_wait = max(0.0, cost - data["tokens"]) / self.token_rate
+            return max(request_wait, token_wait)
+
+    def acquire(self, tokens: int) -> float:
+        """Wait for capacity and return the tokens charged, for reconcile()"""
+        started = time.perf_counter()
+        while (wait := self.try_acquire(tokens)) > 0:
+            time.sleep(wait)
+        self._record_wait(started)
+        return self.cost(tokens)
+
+    async def aacquire(self, tokens: int) -> float:
+        started = time.perf_counter()
+        while (wait := self.try_acquire(tokens)) > 0:
+            await asyncio.sleep(wait)
+        self._record_wait(started)
+        return self.cost(tokens)
+
+    def _record_wait(self, started: float):
+        metrics.observe("rate_limiter.wait_seconds", time.perf_counter() - started)
+
+    def reconcile(self, charged: float, actual: int):
+        """Charge (or refund) the difference between the tokens charged and reported usage"""
+        with self.state.locked() as data:
+            self._refill(data, time.time())
+            data["tokens"] = min(self.token_capacity, data["tokens"] + charged - actual)
+
+    def pause(self, seconds: float):
+        """Hold back every caller after the provider reports a rate limit"""
+        with self.state.locked() as data:
+            now = time.time()
+            self._refill(data, now)
+            data["blocked_until"] = max(data["blocked_until"], now + seconds)
+
+
+def retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Backoff for a 429: the provider's hint if given, else exponential, with jitter"""
+    delay = RATE_LIMIT_BASE_BACKOFF * (2**attempt)
+    hint = response.headers.get("retry-after-ms")
+    if hint:
+        delay = max(delay, float(hint) / 1000.0)
+    elif response.headers.get("retry-after"):
+        try:
+            delay = max(delay, float(response.headers["retry-after"]))
+        except ValueError:
+            pass
+    delay = min(delay, RATE_LIMIT_MAX_BACKOFF)
+    return delay * random.uniform(0.5, 1.5)
+
+
+def _request_tokens(request: httpx.Request) -> int:
+    try:
+        return estimate_request_tokens(json.loads(request.read() or b"{}"))
+    except (ValueError, TypeError):
+        return 1
+
+
+def _response_tokens(response: httpx.Response) -> Optional[int]:
+    if "application/json" not in response.headers.get("content-type", ""):
+        return None
+    try:
+        usage = json.loads(response.read()).get("usage") or {}
+    except (ValueError, AttributeError):
+        return None
+    return usage.get("total_tokens")
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """httpx transport that paces OpenAI calls through the shared limiter and retries 429s"""
+
+    def __init__(self, limiter: RateLimiter, max_retries: int):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self._transport = httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        estimated = _request_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            charged = self.limiter.acquire(estimated)
+            response = self._transport.handle_request(request)
+            if response.status_code != 429:
+                break
+            # A rejected attempt used no tokens; refund them before retrying
+            self.limiter.reconcile(charged, 0)
+            if attempt == self.max_retries:
+                break
+            response.read()
+            response.close()
+            delay = retry_delay(response, attempt)
+            metrics.increment("rate_limiter.retries")
+            self.limiter.pause(delay)
+
+        if response.status_code == 429:
+            metrics.increment("rate_limiter.exhausted")
+        else:
+            actual = _response_tokens(response)
+            if actual is not None:
+                self.limiter.reconcile(charged, actual)
+        return response
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of RateLimitedTransport sharing the same limiter"""
+
+    def __init__(self, limiter: RateLimiter, max_retries: int):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self._transport = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        estimated = _request_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            charged = await self.limiter.aacquire(estimated)
+            response = await self._transport.handle_async_request(request)
+            if response.status_code != 429:
+                break
+            self.limiter.reconcile(charged, 0)
+            if attempt == self.max_retries:
+                break
+            await response.aread()
+            await response.aclose()
+            delay = retry_delay(response, attempt)
+            metrics.increment("rate_limiter.retries")
+            self.limiter.pause(delay)
+
+        if response.status_code == 429:
+            metrics.increment("rate_limiter.exhausted")
+        elif "application/json" in response.headers.get("content-type", ""):
+            await response.aread()
+            actual = _response_tokens(response)
+            if actual is not None:
+                self.limiter.reconcile(charged, actual)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def create_rate_limiter() -> RateLimiter:
+    state = FileLimiterState(RATE_LIMIT_STATE_PATH) if RATE_LIMIT_STATE_PATH else None
+    return RateLimiter(
+        requests_per_minute=OPENAI_RPM_LIMIT,
+        tokens_per_minute=OPENAI_TPM_LIMIT,
+        burst_seconds=RATE_LIMIT_BURST_SECONDS,
+        state=state,
+    )
+
+
+# Global limiter shared by every OpenAI model and embedding client in the process
+openai_rate_limiter = create_rate_limiter()
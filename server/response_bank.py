@@ -0,0 +1,109 @@
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from server.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Conversation states a bank reply can be written for
+FIRST_TURN = "first_turn"
+ONGOING = "ongoing"
+
+
+class ResponseBank:
+    """Pre-generated replies for GREETING, PROCEDURAL and SMALL_TALK turns.
+
+    The bank file maps each classification to intents; an intent has cue
+    messages it covers and pools of replies per conversation state. A message
+    is served from the bank when its embedding is close enough to a cue of the
+    same classification; otherwise the caller falls back to the LLM. Replies
+    rotate across sessions and are never repeated within a session.
+    """
+
+    def __init__(self, path: str, embeddings: Embeddings, min_similarity: float):
+        self.path = path
+        self.embeddings = embeddings
+        self.min_similarity = min_similarity
+        with open(path, encoding="utf-8") as f:
+            self.bank: Dict[str, List[Dict]] = json.load(f)
+        self._cue_owners: Dict[str, List[int]] = {}
+        self._matrices: Dict[str, np.ndarray] = {}
+        self._rotation = defaultdict(int)
+        self._results = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def _ensure_index(self):
+        """Embed the cue messages once, on first use"""
+        if self._matrices:
+            return
+        with self._lock:
+            if self._matrices:
+                return
+            matrices, owners = {}, {}
+            for classification, intents in self.bank.items():
+                texts, owner = [], []
+                for index, intent in enumerate(intents):
+                    texts.extend(intent["cues"])
+                    owner.extend([index] * len(intent["cues"]))
+                matrix = np.array(self.embeddings.embed_documents(texts), dtype=np.float32)
+                matrices[classification] = matrix / np.maximum(
+                    np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12
+                )
+                owners[classification] = owner
+            self._cue_owners = owners
+            self._matrices = matrices
+
+    def match_intent(self, message: str, classification: str) -> Optional[Dict]:
+        """Return the closest intent for the message, or None if outside coverage"""
+        if classification not in self.bank:
+            return None
+        self._ensure_index()
+        query = np.array(self.embeddings.embed_query(message), dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        similarities = self._matrices[classification] @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.min_similarity:
+            return None
+        return self.bank[classification][self._cue_owners[classification][best]]
+
+    def select(
+        self, message: str, classification: str, state: str, used: Set[str]
+    ) -> Optional[str]:
+        """Pick a reply the session has not seen yet, or None to fall back to the LLM"""
+        try:
+            intent = self.match_intent(message, classification)
+        except Exception as e:
+            logger.warning("Error matching response bank", extra={"stage": "simple_response", "error": str(e)})
+            intent = None
+        if intent is None:
+            self._record("uncovered")
+            return None
+
+        replies = intent["replies"].get(state, [])
+        key = f"{classification}:{intent['intent']}:{state}"
+        chosen = None
+        with self._lock:
+            start = self._rotation[key]
+            for offset in range(len(replies)):
+                reply = replies[(start + offset) % len(replies)]
+                if reply not in used:
+                    self._rotation[key] = start + offset + 1
+                    chosen = reply
+                    break
+
+        self._record("hit" if chosen else "exhausted")
+        return chosen
+
+    def _record(self, result: str):
+        """Count a lookup and publish the share of simple turns served without the LLM"""
+        metrics.increment("response_bank.lookups", result=result)
+        with self._lock:
+            self._results[result] += 1
+            share = self._results["hit"] / sum(self._results.values())
+        metrics.set_gauge("response_bank.served_share", share)
@@ -0,0 +1,73 @@
+import asyncio
+import contextlib
+import contextvars
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# WebSocket turn whose work is publishing events; its id is added to them
+_current_turn: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "current_turn", default=None
+)
+
+
+class SessionEventHub:
+    """Fan-out of per-session events to connected WebSocket clients.
+
+    Pipeline and background work run in worker threads, so publish() hands each
+    event to the subscriber's event loop thread-safely. Without subscribers it
+    is a no-op, which keeps the HTTP path unchanged.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+
+    def subscribe(self, session_id: str) -> asyncio.Queue:
+        """Register a queue for a session's events; call from the event loop"""
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(session_id, []).append(
+                (asyncio.get_running_loop(), queue)
+            )
+        return queue
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = [
+                entry for entry in self._subscribers.get(session_id, []) if entry[1] is not queue
+            ]
+            if subscribers:
+                self._subscribers[session_id] = subscribers
+            else:
+                self._subscribers.pop(session_id, None)
+
+    def has_subscribers(self, session_id: str) -> bool:
+        with self._lock:
+            return bool(self._subscribers.get(session_id))
+
+    @contextlib.contextmanager
+    def turn(self, turn_id: Optional[str]):
+        """Tag events published inside the block (and work it starts) with turn_id"""
+        token = _current_turn.set(turn_id)
+        try:
+            yield
+        finally:
+            _current_turn.reset(token)
+
+    def publish(self, session_id: str, event: Dict):
+        """Send an event to every subscriber of the session, from any thread"""
+        turn_id = _current_turn.get()
+        if turn_id is not None and "turn_id" not in event:
+            event = {**event, "turn_id": turn_id}
+        with self._lock:
+            subscribers = list(self._subscribers.get(session_id, []))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The subscriber's loop has already closed
+                pass
+
+
+# Global event hub shared by the pipeline and the WebSocket endpoint
+session_events = SessionEventHub()
@@ -1,100 +1,300 @@
-from typing import Dict, List, Optional
-from datetime import datetime
-from langchain_openai import ChatOpenAI
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
 from langchain.prompts import ChatPromptTemplate
 from server.config import *
-from server.chat_model import ChatMessage
+from server.chat_model import ChatMessage, ConclusionInfo
+from server.embeddings import shared_embeddings
+from server.llm_clients import create_stage_model
+from server.message_classifier import NearestNeighbourClassifier
+from server.metrics import metrics
+from server.response_bank import FIRST_TURN, ONGOING, ResponseBank
+from server.session_events import session_events
+from server.structured_logging import elapsed_ms
+from server.tracing import stage_span
+from server.session_record import FULL_HISTORY_MESSAGES, RECENT_MESSAGES, SessionRecord
+
+logger = logging.getLogger(__name__)
+
+
+# Prompt templates, built once at import. The static instructions form a
+# byte-identical system message and the per-call variables follow it, so the
+# provider can reuse the cached prompt prefix across calls.
+classification_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are a CBT therapist assistant that classifies patient messages to optimize response strategy.
+
+Classify the patient message into ONE of these categories:
+
+GREETING: Simple hellos, introductions, pleasantries (e.g., "Hi doctor", "Nice to meet you", "How are you?")
+
+PROCEDURAL: Questions about the session process (e.g., "Should we start?", "How does this work?", "What do we do now?")
+
+SESSION_END: Patient wants to end the session (e.g., "Have a good day doc", "See you soon", "I think I feel ok now", "Ready to end", "That's all for today", "I should go", "Thanks for today")
+
+THERAPEUTIC: Meaningful emotional/psychological content that requires full CBT analysis (e.g., sharing feelings, problems, thoughts, experiences, concerns, sucidal thoughts, etc)
+
+SMALL_TALK: Casual conversation not requiring therapeutic intervention (e.g., comments about weather, general life updates without emotional content)
+Examples of SMALL_TALK: 'I am doing great, How are you doing?', 'Any plans for the weekend?' etc
+
+Respond with ONLY the category name: GREETING, PROCEDURAL, SESSION_END, THERAPEUTIC, or SMALL_TALK""",
+        ),
+        (
+            "human",
+            'Conversation context:\n{context}\n\nPatient message: "{message}"',
+        ),
+    ]
+)
+
+SIMPLE_RESPONSE_INSTRUCTIONS = {
+    "GREETING": """You are a warm, professional CBT therapist responding to a patient's greeting.
+
+Provide a brief, warm greeting response that:
+- Acknowledges their greeting warmly
+- Maintains professional therapeutic boundaries
+- Respond with small talk initiations
+- Is contextually appropriate (don't re-introduce yourself if already met)
+
+Keep it brief and natural (1-2 sentences).""",
+    "PROCEDURAL": """You are a CBT therapist responding to a patient's procedural question.
+
+Provide a brief, helpful response that:
+- Answers their procedural question
+- Reassures them about the process
+- Encourages them to share what's on their mind
+- Maintains a supportive, professional tone
+
+Keep it brief and encouraging (1-3 sentences).""",
+    "SMALL_TALK": """You are a CBT therapist responding to casual conversation.
+
+Provide a brief response that:
+- Acknowledges their comment politely
+- Gently redirects toward therapeutic topics
+- Shows interest in their wellbeing
+- Maintains professional therapeutic focus
+
+Keep it brief and gently redirecting (1-2 sentences).""",
+}
+
+simple_response_prompts = {
+    response_type: ChatPromptTemplate.from_messages(
+        [
+            ("system", instructions),
+            ("human", 'Conversation context: {context}\n\nPatient message: "{message}"'),
+        ]
+    )
+    for response_type, instructions in SIMPLE_RESPONSE_INSTRUCTIONS.items()
+}
+
+summary_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are a professional CBT therapist creating a therapeutic summary of a conversation.
+
+Create a concise therapeutic summary covering:
+1. KEY CONCERNS: Main issues the patient has discussed
+2. EMOTIONAL PATTERNS: Primary emotions and mood patterns observed
+3. COGNITIVE PATTERNS: Thought patterns, beliefs, and cognitive distortions identified
+4. BEHAVIORAL PATTERNS: Behaviors, coping mechanisms, and avoidance patterns
+5. THERAPEUTIC PROGRESS: CBT techniques applied and patient's responses
+6. IMPORTANT CONTEXT: Key background information and triggers mentioned
+
+Keep the summary clinical but empathetic, focusing on information that would help continue effective therapy.
+Maximum 300 words.""",
+        ),
+        ("human", "Conversation to summarize:\n{conversation}"),
+    ]
+)
+
+conclusion_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are a professional CBT therapist providing a final session summary and therapeutic conclusion.
+
+Provide a warm, professional session conclusion that includes:
+
+1. ACKNOWLEDGMENT: Recognize the patient's openness and courage in sharing
+2. KEY INSIGHTS: Summarize the main patterns and insights discovered
+3. PROGRESS NOTED: Highlight any positive steps or awareness gained
+4. THERAPEUTIC RECOMMENDATIONS: Suggest continued focus areas (without being prescriptive)
+5. ENCOURAGEMENT: Offer hope and validation for their therapeutic journey
+
+Guidelines:
+- Be warm, supportive, and professional
+- Avoid clinical jargon - use accessible language
+- Do NOT provide medical diagnoses
+- Do NOT ask questions - this is a conclusion
+- End with encouragement about their therapeutic journey
+- Keep it concise but meaningful (200-300 words)
+
+This is the final message of the session, so provide closure and hope.""",
+        ),
+        ("human", "Session context:\n{context}"),
+    ]
+)
+
+conclusion_update_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """You are a professional CBT therapist finishing a session conclusion you drafted earlier.
+
+Write ONE short paragraph (at most 60 words) acknowledging anything new or important from the messages exchanged after the draft that the draft does not already cover. It will be inserted before the draft's closing paragraph. Do NOT ask questions. If there is nothing new to add, respond with exactly: NONE""",
+        ),
+        (
+            "human",
+            """Draft conclusion:
+{draft}
+
+Messages exchanged after the draft was written:
+{new_conversation}""",
+        ),
+    ]
+)
 
 
 class SessionManager:
     def __init__(self):
-        self.sessions: Dict[str, Dict] = {}
-        self.llm = ChatOpenAI(
-            api_key=OPENAI_API_KEY,
-            model=MODEL_CONFIG["model"],
-            temperature=0.1,  # Lower temperature for more consistent summaries
+        self.sessions: Dict[str, SessionRecord] = {}
+        # Per-stage models; temperatures and output caps come from the routing profile
+        self.classification_llm = create_stage_model("classification")
+        self.simple_response_llm = create_stage_model("simple_response")
+        self.summary_llm = create_stage_model("summary")
+        self.conclusion_llm = create_stage_model("conclusion")
+        self.conclusion_update_llm = create_stage_model("conclusion_update")
+        self.message_classifier = NearestNeighbourClassifier(
+            shared_embeddings, k=CLASSIFIER_K
+        )
+        self.response_bank = (
+            ResponseBank(
+                RESPONSE_BANK_PATH, shared_embeddings, RESPONSE_BANK_MIN_SIMILARITY
+            )
+            if RESPONSE_BANK_PATH
+            else None
         )
 
-    def get_session(self, session_id: str) -> Dict:
+    def get_session(self, session_id: str) -> SessionRecord:
         """Get or create a session"""
         if session_id not in self.sessions:
-            self.sessions[session_id] = {
-                "messages": [],
-                "summary": "",
-                "created_at": datetime.now(),
-                "last_updated": datetime.now(),
-                "message_count": 0,
-            }
+            self.sessions[session_id] = SessionRecord()
         return self.sessions[session_id]
 
     def add_message(self, session_id: str, role: str, content: str):
         """Add a message to the session"""
         session = self.get_session(session_id)
-        session["messages"].append(ChatMessage(role=role, content=content))
-        session["last_updated"] = datetime.now()
-        session["message_count"] += 1
+        session.append(role, content)
 
         # Update summary every 6 messages to keep context manageable
-        if session["message_count"] % 6 == 0:
-            session["summary"] = self._generate_summary(session_id)
+        if len(session) % 6 == 0:
+            started = time.perf_counter()
+            with stage_span("summary", **{"session.messages": len(session)}):
+                session.set_summary(self._generate_summary(session_id))
+            logger.info("Session summary updated", extra={"stage": "summary", "duration_ms": elapsed_ms(started)})
+            session_events.publish(session_id, {"type": "summary_updated"})
 
     def get_conversation_context(self, session_id: str) -> str:
-        """Get conversation context for the LLM - either summary + recent messages or all messages if few"""
-        session = self.get_session(session_id)
-        messages = session["messages"]
+        """Get conversation context for the LLM - either summary + recent messages or all messages if few.
 
-        if len(messages) <= 6:
+        Built once per session version; short transcripts come pre-rendered
+        from the session record.
+        """
+        session = self.get_session(session_id)
+        version = session.version
+        if session.context_cache is not None and session.context_cache[0] == version:
+            metrics.increment("context.builds", result="cached")
+            return session.context_cache[1]
+
+        message_count = len(session)
+        full_history = session.full_history
+        if full_history is not None and message_count <= FULL_HISTORY_MESSAGES:
             # If conversation is short, use all messages
-            context = "Full conversation history:\n"
-            for msg in messages:
-                context += f"{msg.role.title()}: {msg.content}\n"
+            context = full_history
         else:
-            # Use summary + last 4 messages for cost efficiency
-            context = f"Conversation Summary: {session['summary']}\n\n"
-            context += "Recent conversation:\n"
-            for msg in messages[-4:]:
-                context += f"{msg.role.title()}: {msg.content}\n"
+            # Use summary + earlier turns relevant to the latest message + last 4
+            # messages, so the context stays the same size however long the session
+            recent_start = max(message_count - RECENT_MESSAGES, 0)
+            context = f"Conversation Summary: {session.summary}\n\n"
+            relevant = self._recall_relevant_turns(session, recent_start)
+            if relevant:
+                context += f"Relevant earlier conversation:\n{relevant}\n"
+            context += "Recent conversation:\n" + session.render(recent_start, message_count)
 
         # Add conversation state information
-        if len(messages) == 0:
+        if message_count == 0:
             context += "\nCONVERSATION STATE: This is the very first interaction with this patient. A greeting is appropriate."
-        elif len(messages) >= 2:
-            context += f"\nCONVERSATION STATE: This is an ongoing conversation with {len(messages)//2} previous exchanges. The therapeutic relationship is already established. Do NOT greet the patient again."
+        elif message_count >= 2:
+            context += f"\nCONVERSATION STATE: This is an ongoing conversation with {message_count//2} previous exchanges. The therapeutic relationship is already established. Do NOT greet the patient again."
 
+        session.context_cache = (version, context)
+        metrics.increment("context.builds", result="built")
         return context
 
-    def classify_message(self, message: str, session_id: str) -> str:
-        """Classify user message to determine response strategy"""
-        conversation_context = self.get_conversation_context(session_id)
-
-        classification_prompt = ChatPromptTemplate.from_template(
-            """
-            You are a CBT therapist assistant that classifies patient messages to optimize response strategy.
-
-            Patient message: "{message}"
-            
-            Conversation context:
-            {context}
+    def remember_turn(self, session_id: str, index: int):
+        """Store the embedding of the user turn at `index` for recall in later turns.
 
-            Classify this message into ONE of these categories:
+        Called off the request path for therapeutic turns; the crisis screen and
+        classifier have usually embedded the message already, so the embedding
+        comes from the query cache.
+        """
+        session = self.get_session(session_id)
+        try:
+            session.memory.add(index, shared_embeddings.embed_query(session.contents[index]))
+        except Exception as e:
+            logger.warning("Error embedding turn for session memory", extra={"error": str(e)})
 
-            GREETING: Simple hellos, introductions, pleasantries (e.g., "Hi doctor", "Nice to meet you", "How are you?")
-            
-            PROCEDURAL: Questions about the session process (e.g., "Should we start?", "How does this work?", "What do we do now?")
-            
-            SESSION_END: Patient wants to end the session (e.g., "Have a good day doc", "See you soon", "I think I feel ok now", "Ready to end", "That's all for today", "I should go", "Thanks for today")
-            
-            THERAPEUTIC: Meaningful emotional/psychological content that requires full CBT analysis (e.g., sharing feelings, problems, thoughts, experiences, concerns, sucidal thoughts, etc)
+    def _recall_relevant_turns(self, session: SessionRecord, before: int) -> str:
+        """Earlier exchanges most similar to the latest user message, oldest first"""
+        latest = session.last_index("user")
+        if not SESSION_MEMORY_TOP_K or latest is None or not len(session.memory):
+            return ""
+        try:
+            query = shared_embeddings.embed_query(session.contents[latest])
+        except Exception as e:
+            logger.warning("Error embedding query for session memory", extra={"error": str(e)})
+            return ""
+        indices = session.memory.search(
+            query, before, SESSION_MEMORY_TOP_K, SESSION_MEMORY_MIN_SIMILARITY
+        )
+        metrics.observe("session_memory.recalled_turns", len(indices))
+        return session.render_exchanges(indices, before, SESSION_MEMORY_MAX_CHARS)
 
-            SMALL_TALK: Casual conversation not requiring therapeutic intervention (e.g., comments about weather, general life updates without emotional content)
-            Examples of SMALL_TALK: 'I am doing great, How are you doing?', 'Any plans for the weekend?' etc
+    def formulation_inputs(self, session_id: str) -> Dict:
+        """The session's formulation and the therapist's latest reply, for the CBT chain"""
+        session = self.get_session(session_id)
+        previous = session.last_index("assistant")
+        return {
+            "formulation": session.formulation,
+            "previous_reply": session.contents[previous] if previous is not None else "",
+        }
 
-            Respond with ONLY the category name: GREETING, PROCEDURAL, SESSION_END, THERAPEUTIC, or SMALL_TALK
-            """
-        )
+    def classify_message(self, message: str, session_id: str) -> str:
+        """Classify user message to determine response strategy.
+
+        Uses the local nearest-neighbour classifier and only calls the LLM when
+        the local margin is below CLASSIFIER_MARGIN_THRESHOLD.
+        """
+        if MESSAGE_CLASSIFIER == "knn":
+            try:
+                classification, margin = self.message_classifier.classify(message)
+                if margin >= CLASSIFIER_MARGIN_THRESHOLD:
+                    metrics.increment("classifier.decisions", source="local")
+                    return classification
+            except Exception as e:
+                logger.warning("Error in local classifier", extra={"stage": "classification", "error": str(e)})
+
+        metrics.increment("classifier.decisions", source="llm")
+        return self.classify_message_with_llm(message, session_id)
+
+    def classify_message_with_llm(self, message: str, session_id: str) -> str:
+        """Classify user message with an LLM call"""
+        conversation_context = self.get_conversation_context(session_id)
 
         try:
-            classification_result = (classification_prompt | self.llm).invoke(
+            classification_result = (classification_prompt | self.classification_llm).invoke(
                 {"message": message, "context": conversation_context}
             )
             classification = classification_result.content.strip().upper()
@@ -114,157 +314,199 @@ class SessionManager:
                 return "THERAPEUTIC"
 
         except Exception as e:
-            print(f"Error classifying message: {e}")
+            logger.error("Error classifying message", extra={"stage": "classification", "error": str(e)})
             # Default to THERAPEUTIC to be safe
             return "THERAPEUTIC"
 
     def generate_simple_response(
         self, message: str, session_id: str, response_type: str
     ) -> str:
-        """Generate simple responses for non-therapeutic messages"""
+        """Generate simple responses for non-therapeutic messages.
+
+        Served from the pre-generated response bank when the message is within
+        its coverage; otherwise an LLM call writes the reply.
+        """
+        reply = self._bank_response(message, session_id, response_type)
+        if reply:
+            metrics.increment("simple_responses", source="bank")
+            return reply
+        metrics.increment("simple_responses", source="llm")
+
         conversation_context = self.get_conversation_context(session_id)
 
-        if response_type == "GREETING":
-            prompt_template = """
-            You are a warm, professional CBT therapist responding to a patient's greeting.
-            
-            Patient message: "{message}"
-            Conversation context: {context}
-            
-            Provide a brief, warm greeting response that:
-            - Acknowledges their greeting warmly
-            - Maintains professional therapeutic boundaries
-            - Respond with small talk initiations
-            - Is contextually appropriate (don't re-introduce yourself if already met)
-            
-            Keep it brief and natural (1-2 sentences).
-            """
-
-        elif response_type == "PROCEDURAL":
-            prompt_template = """
-            You are a CBT therapist responding to a patient's procedural question.
-            
-            Patient message: "{message}"
-            Conversation context: {context}
-            
-            Provide a brief, helpful response that:
-            - Answers their procedural question
-            - Reassures them about the process
-            - Encourages them to share what's on their mind
-            - Maintains a supportive, professional tone
-            
-            Keep it brief and encouraging (1-3 sentences).
-            """
-
-        elif response_type == "SMALL_TALK":
-            prompt_template = """
-            You are a CBT therapist responding to casual conversation.
-            
-            Patient message: "{message}"
-            Conversation context: {context}
-            
-            Provide a brief response that:
-            - Acknowledges their comment politely
-            - Gently redirects toward therapeutic topics
-            - Shows interest in their wellbeing
-            - Maintains professional therapeutic focus
-            
-            Keep it brief and gently redirecting (1-2 sentences).
-            """
-
-        simple_prompt = ChatPromptTemplate.from_template(prompt_template)
+        simple_prompt = simple_response_prompts[response_type]
 
         try:
-            response_result = (simple_prompt | self.llm).invoke(
+            response_result = (simple_prompt | self.simple_response_llm).invoke(
                 {"message": message, "context": conversation_context}
             )
             return response_result.content
         except Exception as e:
-            print(f"Error generating simple response: {e}")
+            logger.error("Error generating simple response", extra={"stage": "simple_response", "error": str(e)})
             return (
                 "Thank you for sharing that. What would you like to talk about today?"
             )
 
+    def _bank_response(
+        self, message: str, session_id: str, response_type: str
+    ) -> Optional[str]:
+        """Pick a response bank reply for this turn, or None if not covered"""
+        if self.response_bank is None:
+            return None
+        session = self.get_session(session_id)
+        state = ONGOING if session.has_role("assistant") else FIRST_TURN
+        reply = self.response_bank.select(
+            message, response_type, state, session.bank_replies_used
+        )
+        if reply:
+            session.bank_replies_used.add(reply)
+        return reply
+
     def _generate_summary(self, session_id: str) -> str:
         """Generate a therapeutic summary of the conversation"""
         session = self.get_session(session_id)
-        messages = session["messages"]
 
         # Create conversation text
-        conversation_text = ""
-        for msg in messages:
-            conversation_text += f"{msg.role.title()}: {msg.content}\n"
-
-        summary_prompt = ChatPromptTemplate.from_template(
-            """
-            You are a professional CBT therapist creating a therapeutic summary of a conversation.
-            
-            Conversation to summarize:
-            {conversation}
-            
-            Create a concise therapeutic summary covering:
-            1. KEY CONCERNS: Main issues the patient has discussed
-            2. EMOTIONAL PATTERNS: Primary emotions and mood patterns observed
-            3. COGNITIVE PATTERNS: Thought patterns, beliefs, and cognitive distortions identified
-            4. BEHAVIORAL PATTERNS: Behaviors, coping mechanisms, and avoidance patterns
-            5. THERAPEUTIC PROGRESS: CBT techniques applied and patient's responses
-            6. IMPORTANT CONTEXT: Key background information and triggers mentioned
-            
-            Keep the summary clinical but empathetic, focusing on information that would help continue effective therapy.
-            Maximum 300 words.
-            """
-        )
+        conversation_text = session.render()
 
         try:
-            summary_result = (summary_prompt | self.llm).invoke(
+            summary_result = (summary_prompt | self.summary_llm).invoke(
                 {"conversation": conversation_text}
             )
             return summary_result.content
         except Exception as e:
-            print(f"Error generating summary: {e}")
+            logger.error("Error generating summary", extra={"stage": "summary", "error": str(e)})
             # Fallback to basic summary
-            return f"Patient has discussed various concerns over {len(messages)} messages. Key themes include emotional and behavioral challenges that require continued therapeutic support."
+            return f"Patient has discussed various concerns over {len(session)} messages. Key themes include emotional and behavioral challenges that require continued therapeutic support."
 
     def generate_session_conclusion(self, session_id: str) -> str:
         """Generate a final conclusion/diagnosis for the session"""
-        session = self.get_session(session_id)
         context = self.get_conversation_context(session_id)
 
-        conclusion_prompt = ChatPromptTemplate.from_template(
-            """
-            You are a professional CBT therapist providing a final session summary and therapeutic conclusion.
-            
-            Session context:
-            {context}
-            
-            Provide a warm, professional session conclusion that includes:
-            
-            1. ACKNOWLEDGMENT: Recognize the patient's openness and courage in sharing
-            2. KEY INSIGHTS: Summarize the main patterns and insights discovered
-            3. PROGRESS NOTED: Highlight any positive steps or awareness gained
-            4. THERAPEUTIC RECOMMENDATIONS: Suggest continued focus areas (without being prescriptive)
-            5. ENCOURAGEMENT: Offer hope and validation for their therapeutic journey
-            
-            Guidelines:
-            - Be warm, supportive, and professional
-            - Avoid clinical jargon - use accessible language
-            - Do NOT provide medical diagnoses
-            - Do NOT ask questions - this is a conclusion
-            - End with encouragement about their therapeutic journey
-            - Keep it concise but meaningful (200-300 words)
-            
-            This is the final message of the session, so provide closure and hope.
-            """
+        try:
+            return self._write_conclusion(context)
+        except Exception as e:
+            logger.error("Error generating conclusion", extra={"stage": "conclusion", "error": str(e)})
+            return "Thank you for sharing so openly today. Your willingness to explore your thoughts and feelings shows real courage. Continue to be patient and kind with yourself as you work through these challenges. Remember that growth takes time, and you're taking important steps forward."
+
+    def _write_conclusion(self, context: str) -> str:
+        """Write a full session conclusion from the conversation context"""
+
+        conclusion_result = (conclusion_prompt | self.conclusion_llm).invoke({"context": context})
+        return conclusion_result.content
+
+    def conclusion_draft_due(self, session_id: str, ending_signal: bool) -> bool:
+        """Whether the background conclusion draft should be (re)written now"""
+        session = self.get_session(session_id)
+        if session.conclusion_refreshing:
+            return False
+        message_count = len(session)
+        draft = session.conclusion_draft
+        if draft and draft["message_count"] == message_count:
+            return False
+        if ending_signal:
+            return True
+        if not CONCLUSION_DRAFT_MIN_MESSAGES or message_count < CONCLUSION_DRAFT_MIN_MESSAGES:
+            return False
+        return (
+            draft is None
+            or message_count - draft["message_count"] >= CONCLUSION_DRAFT_REFRESH_MESSAGES
         )
 
+    def refresh_conclusion_draft(self, session_id: str):
+        """Write a draft conclusion in the background so ending the session is quick"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return
         try:
-            conclusion_result = (conclusion_prompt | self.llm).invoke(
-                {"context": context}
+            message_count = len(session)
+            context = self.get_conversation_context(session_id)
+            session.conclusion_draft = {
+                "text": self._write_conclusion(context),
+                "message_count": message_count,
+                "created_at": time.time(),
+            }
+            metrics.increment("conclusion.drafts")
+            session_events.publish(
+                session_id, {"type": "conclusion_draft", "message_count": message_count}
             )
-            return conclusion_result.content
         except Exception as e:
-            print(f"Error generating conclusion: {e}")
-            return "Thank you for sharing so openly today. Your willingness to explore your thoughts and feelings shows real courage. Continue to be patient and kind with yourself as you work through these challenges. Remember that growth takes time, and you're taking important steps forward."
+            logger.error("Error refreshing conclusion draft", extra={"stage": "conclusion_draft", "error": str(e)})
+        finally:
+            session.conclusion_refreshing = False
+
+    def conclude_session(self, session_id: str) -> Tuple[str, ConclusionInfo]:
+        """Conclude the session from its draft when there is one.
+
+        Messages the draft has not seen are folded in with a short delta call
+        instead of regenerating the whole conclusion.
+        """
+        session = self.get_session(session_id)
+        session.mark_ended()
+        draft = session.conclusion_draft
+        if draft is None:
+            metrics.increment("conclusion.source", source="full")
+            return self.generate_session_conclusion(session_id), ConclusionInfo(
+                source="full"
+            )
+
+        stale_messages = len(session) - draft["message_count"]
+        info = ConclusionInfo(
+            source="draft_delta" if stale_messages else "draft",
+            stale_messages=stale_messages,
+            draft_age_seconds=round(time.time() - draft["created_at"], 2),
+        )
+        conclusion = draft["text"]
+        if stale_messages:
+            try:
+                conclusion = self._update_conclusion(
+                    draft["text"], session.render(draft["message_count"])
+                )
+            except Exception as e:
+                logger.error("Error updating conclusion draft", extra={"stage": "conclusion", "error": str(e)})
+
+        metrics.increment("conclusion.source", source=info.source)
+        metrics.observe("conclusion.draft_stale_messages", stale_messages)
+        return conclusion, info
+
+    def _update_conclusion(self, draft: str, new_conversation: str) -> str:
+        """Fold messages written after the draft into it with a short addendum"""
+        addendum = (
+            (conclusion_update_prompt | self.conclusion_update_llm)
+            .invoke({"draft": draft, "new_conversation": new_conversation})
+            .content.strip()
+        )
+        if not addendum or addendum.upper() == "NONE":
+            return draft
+
+        paragraphs = draft.strip().split("\n\n")
+        if len(paragraphs) < 2:
+            return f"{draft.strip()}\n\n{addendum}"
+        return "\n\n".join(paragraphs[:-1] + [addendum, paragraphs[-1]])
+
+    def get_message_page(
+        self, session_id: str, before: Optional[int], limit: int
+    ) -> Optional[Tuple[int, List[ChatMessage], int]]:
+        """Up to `limit` messages ending just before index `before` (latest page if None).
+
+        Returns the index of the first message, the page and the session's
+        message count, or None for an unknown session. Messages are
+        append-only, so an index is a stable cursor.
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        total = len(session)
+        end = total if before is None else max(0, min(before, total))
+        start = max(0, end - limit)
+        return start, session.messages(start, end), total
+
+    def pop_pending_messages(self, session_id: str):
+        """Take follow-up messages generated in the background since the last call"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        return session.take_pending_messages()
 
     def clear_session(self, session_id: str):
         """Clear a session (optional - for cleanup)"""
@@ -0,0 +1,54 @@
+import threading
+from typing import List
+
+import numpy as np
+
+
+class TurnMemory:
+    """In-process vector memory of one session's user turns.
+
+    Each user message is stored under its message index with its normalized
+    embedding, the same query embedding the classifier and retrieval use, so
+    remembering a turn costs no extra embedding call. search() returns the
+    indices of the earlier turns most similar to a query.
+    """
+
+    def __init__(self):
+        self._indices: List[int] = []
+        self._vectors: List[np.ndarray] = []
+        self._matrix = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+    def add(self, index: int, vector: List[float]):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        with self._lock:
+            self._indices.append(index)
+            self._vectors.append(vector / norm if norm else vector)
+            self._matrix = None
+
+    def search(
+        self, vector: List[float], before: int, k: int, min_similarity: float
+    ) -> List[int]:
+        """Message indices of up to k stored turns before `before`, most similar first"""
+        with self._lock:
+            if self._matrix is None and self._vectors:
+                self._matrix = np.vstack(self._vectors)
+            matrix, indices = self._matrix, list(self._indices)
+        if matrix is None or k <= 0:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm:
+            return []
+        scores = matrix @ (query / norm)
+        ranked = np.argsort(-scores)
+        return [
+            indices[i]
+            for i in ranked
+            if indices[i] < before and scores[i] >= min_similarity
+        ][:k]
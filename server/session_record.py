@@ -0,0 +1,165 @@
+import threading
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from server.chat_model import ChatMessage
+from server.config import FORMULATION_MAX_ITEMS
+from server.formulation import Formulation
+from server.session_memory import TurnMemory
+
+# Roles are interned: each message stores a one-byte index into ROLES
+ROLES = ("user", "assistant")
+ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+ROLE_PREFIXES = tuple(f"{role.title()}: " for role in ROLES)
+
+# Short conversations go into the context whole; longer ones as summary + recent messages
+FULL_HISTORY_MESSAGES = 6
+RECENT_MESSAGES = 4
+FULL_HISTORY_HEADER = "Full conversation history:\n"
+
+
+class SessionRecord:
+    """State of one therapy session.
+
+    Messages are held column-wise (an array of role codes next to a list of
+    contents) rather than as one object per message. `version` increases on
+    every change that affects the rendered context or the history API, so
+    both can be cached per version. While the conversation is short enough to
+    go into the context whole, its rendered transcript is extended as each
+    message is appended instead of being rebuilt.
+    """
+
+    __slots__ = (
+        "roles",
+        "contents",
+        "summary",
+        "created_at",
+        "last_updated",
+        "ended_at",
+        "version",
+        "therapeutic_turns",
+        "pending_messages",
+        "background_tasks",
+        "bank_replies_used",
+        "conclusion_draft",
+        "conclusion_refreshing",
+        "full_history",
+        "context_cache",
+        "memory",
+        "formulation",
+        "lock",
+        "background_idle",
+    )
+
+    def __init__(self):
+        self.roles = array("B")
+        self.contents: List[str] = []
+        self.summary = ""
+        self.created_at = datetime.now()
+        self.last_updated = self.created_at
+        self.ended_at: Optional[datetime] = None
+        self.version = 0
+        self.therapeutic_turns = 0
+        self.pending_messages: List[str] = []
+        self.background_tasks = 0
+        self.bank_replies_used: Set[str] = set()
+        self.conclusion_draft: Optional[Dict] = None
+        self.conclusion_refreshing = False
+        # Rendered transcript while it fits FULL_HISTORY_MESSAGES, then None
+        self.full_history: Optional[str] = FULL_HISTORY_HEADER
+        # (version, rendered context) of the last context built
+        self.context_cache: Optional[Tuple[int, str]] = None
+        # Embeddings of user turns, for recalling relevant earlier exchanges
+        self.memory = TurnMemory()
+        # Structured case formulation, updated on each therapeutic turn
+        self.formulation = Formulation(FORMULATION_MAX_ITEMS)
+        # Guards state shared with background jobs (pending_messages, background_tasks)
+        self.lock = threading.Lock()
+        # Notified when the last background job finishes
+        self.background_idle = threading.Condition(self.lock)
+
+    def begin_background_task(self):
+        with self.lock:
+            self.background_tasks += 1
+
+    def finish_background_task(self, message: Optional[str] = None):
+        """Count a background job as done, queueing its reply for /pending if it has one"""
+        with self.lock:
+            if message is not None:
+                self.pending_messages.append(message)
+            self.background_tasks -= 1
+            if not self.background_tasks:
+                self.background_idle.notify_all()
+
+    def wait_for_background_tasks(self, timeout: float) -> bool:
+        """Wait until no background job is writing to the session; False on timeout"""
+        with self.lock:
+            return self.background_idle.wait_for(lambda: not self.background_tasks, timeout)
+
+    def take_pending_messages(self) -> Tuple[List[str], bool]:
+        """Queued replies, and whether background jobs that may add more are still running"""
+        with self.lock:
+            messages = self.pending_messages
+            self.pending_messages = []
+            return messages, self.background_tasks > 0
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
+    def append(self, role: str, content: str):
+        code = ROLE_CODES[role]
+        # Role first, so a reader bounded by len(contents) never sees a missing role
+        self.roles.append(code)
+        self.contents.append(content)
+        if self.full_history is not None:
+            if len(self.contents) <= FULL_HISTORY_MESSAGES:
+                self.full_history += f"{ROLE_PREFIXES[code]}{content}\n"
+            else:
+                self.full_history = None
+        self.last_updated = datetime.now()
+        self.version += 1
+
+    def set_summary(self, summary: str):
+        self.summary = summary
+        self.version += 1
+
+    def mark_ended(self):
+        self.ended_at = datetime.now()
+        self.version += 1
+
+    def has_role(self, role: str) -> bool:
+        return ROLE_CODES[role] in self.roles
+
+    def last_index(self, role: str) -> Optional[int]:
+        code = ROLE_CODES[role]
+        for i in range(len(self.contents) - 1, -1, -1):
+            if self.roles[i] == code:
+                return i
+        return None
+
+    def messages(self, start: int = 0, end: Optional[int] = None) -> List[ChatMessage]:
+        """Messages in [start, end) as ChatMessage objects, for API responses"""
+        end = len(self.contents) if end is None else end
+        return [
+            ChatMessage(role=ROLES[self.roles[i]], content=self.contents[i])
+            for i in range(start, end)
+        ]
+
+    def render_exchanges(self, indices: List[int], before: int, max_chars: int) -> str:
+        """Each user message at `indices` with the reply after it, clipped to max_chars"""
+        lines = []
+        for start in sorted(indices):
+            for i in range(start, min(start + 2, before)):
+                content = self.contents[i]
+                if len(content) > max_chars:
+                    content = content[:max_chars].rstrip() + "..."
+                lines.append(f"{ROLE_PREFIXES[self.roles[i]]}{content}\n")
+        return "".join(lines)
+
+    def render(self, start: int = 0, end: Optional[int] = None) -> str:
+        """Messages in [start, end) as "Role: content" lines"""
+        end = len(self.contents) if end is None else end
+        return "".join(
+            f"{ROLE_PREFIXES[self.roles[i]]}{self.contents[i]}\n" for i in range(start, end)
+        )
@@ -0,0 +1,138 @@
+import atexit
+import contextlib
+import contextvars
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from server.config import *
+from server.metrics import metrics
+
+# Fields bound for the current request (request_id, session_id); copied into every record
+_log_fields: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar(
+    "log_fields", default={}
+)
+
+# Structured fields a record may carry through `extra`, in output order
+RECORD_FIELDS = ("stage", "duration_ms", "classification", "source", "reason", "error", "content")
+# Fields holding user or model text, redacted unless LOG_MESSAGE_CONTENT is on
+CONTENT_FIELDS = ("content",)
+CONTENT_PREVIEW_CHARS = 50
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def log_fields() -> Dict[str, str]:
+    return _log_fields.get()
+
+
+@contextlib.contextmanager
+def log_context(**fields):
+    """Bind correlation fields (request_id, session_id) to every record logged inside the block"""
+    token = _log_fields.set({**_log_fields.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_fields.reset(token)
+
+
+def redact(value, include_content: bool) -> object:
+    text = str(value)
+    if include_content:
+        return text[:CONTENT_PREVIEW_CHARS]
+    return f"<redacted {len(text)} chars>"
+
+
+class ContextFilter(logging.Filter):
+    """Attach the bound correlation fields and sample debug records, on the calling thread.
+
+    Debug records are kept for a LOG_DEBUG_SAMPLE_RATE share of requests,
+    decided per request id so a sampled request keeps all of its debug lines.
+    """
+
+    def __init__(self, debug_sample_rate: float):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        fields = _log_fields.get()
+        if record.levelno <= logging.DEBUG and self.debug_sample_rate < 1:
+            request_id = fields.get("request_id")
+            sample = zlib.crc32(request_id.encode()) / 0xFFFFFFFF if request_id else random.random()
+            if sample >= self.debug_sample_rate:
+                return False
+        record.log_fields = fields
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener thread; drops them rather than block when the queue is full"""
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.increment("logging.dropped")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, formatted on the listener thread"""
+
+    def __init__(self, include_content: bool):
+        super().__init__()
+        self.include_content = include_content
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+            **getattr(record, "log_fields", {}),
+        }
+        for field in RECORD_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = (
+                    redact(value, self.include_content) if field in CONTENT_FIELDS else value
+                )
+        return json.dumps(entry, default=str)
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging():
+    """Route the server's log records through a bounded queue to a JSON stdout writer thread"""
+    global _listener
+    if _listener is not None:
+        return
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(ContextFilter(LOG_DEBUG_SAMPLE_RATE))
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter(LOG_MESSAGE_CONTENT))
+    _listener = QueueListener(log_queue, output)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    logger = logging.getLogger("server")
+    logger.setLevel(LOG_LEVEL)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+
+def elapsed_ms(started: float) -> float:
+    """Milliseconds since a time.perf_counter() reading, for the duration_ms field"""
+    return round((time.perf_counter() - started) * 1000, 1)
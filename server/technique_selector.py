@@ -0,0 +1,119 @@
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from server.metrics import metrics
+
+# CBT knowledge base: technique descriptions with their technique and category
+CBT_TECHNIQUES = [
+    {
+        "text": """ABC Model (Activating Event, Belief, Consequence): This foundational CBT technique helps identify the connection between situations, thoughts, and emotional responses. The Activating Event is the trigger situation, the Belief is the thought or interpretation about the event, and the Consequence is the emotional and behavioral response. By examining these three components, clients can identify how their interpretations of events (rather than the events themselves) create their emotional distress. This technique is particularly effective for anxiety, depression, and anger management.""",
+        "metadata": {
+            "technique": "ABC Model",
+            "category": "cognitive restructuring",
+        },
+    },
+    {
+        "text": """Cognitive Restructuring: This technique involves identifying and challenging negative thought patterns and cognitive distortions. Common distortions include all-or-nothing thinking, catastrophizing, mind reading, and overgeneralization. The process involves: 1) Identifying the negative thought, 2) Examining evidence for and against the thought, 3) Developing balanced, realistic alternative thoughts, 4) Testing these new thoughts behaviorally. This technique is central to treating depression, anxiety disorders, and low self-esteem.""",
+        "metadata": {
+            "technique": "Cognitive Restructuring",
+            "category": "cognitive restructuring",
+        },
+    },
+    {
+        "text": """Behavioral Activation: This technique focuses on increasing engagement in meaningful, pleasurable, or mastery-oriented activities. It's based on the principle that behavior influences mood. The process involves: identifying values and goals, scheduling pleasant activities, monitoring mood changes, and gradually increasing activity levels. Behavioral activation is particularly effective for depression, as it helps break the cycle of withdrawal and inactivity that maintains depressive symptoms.""",
+        "metadata": {
+            "technique": "Behavioral Activation",
+            "category": "behavioral intervention",
+        },
+    },
+    {
+        "text": """Exposure Therapy: A behavioral technique used primarily for anxiety disorders, phobias, and PTSD. It involves gradual, controlled exposure to feared situations or objects in a safe environment. The exposure can be imaginal (visualizing the feared situation) or in vivo (real-life exposure). The process helps clients learn that their feared consequences are unlikely to occur and that anxiety naturally decreases over time. Systematic desensitization and graded exposure hierarchies are common variations.""",
+        "metadata": {
+            "technique": "Exposure Therapy",
+            "category": "behavioral intervention",
+        },
+    },
+    {
+        "text": """Mindfulness and Acceptance Strategies: These techniques, borrowed from third-wave CBT approaches, help clients observe thoughts and feelings without judgment. Mindfulness practices include breathing exercises, body scans, and present-moment awareness. Acceptance strategies involve acknowledging difficult emotions without trying to change them immediately. These techniques are effective for anxiety, depression, chronic pain, and emotional regulation difficulties.""",
+        "metadata": {
+            "technique": "Mindfulness",
+            "category": "acceptance-based",
+        },
+    },
+    {
+        "text": """Problem-Solving Therapy: A structured approach to addressing specific life problems that contribute to emotional distress. The steps include: 1) Problem identification and definition, 2) Goal setting, 3) Brainstorming solutions, 4) Evaluating pros and cons of each solution, 5) Implementing the chosen solution, 6) Evaluating outcomes. This technique is useful for clients facing concrete life challenges alongside their emotional difficulties.""",
+        "metadata": {
+            "technique": "Problem-Solving",
+            "category": "behavioral intervention",
+        },
+    },
+]
+
+
+class TechniqueSelector:
+    """Local CBT technique selection over the knowledge base.
+
+    The technique descriptions are embedded once; a turn's assessment is
+    scored against them by cosine similarity and the best matches are taken
+    with at most one technique per category, so a cognitive technique is
+    paired with a behavioural or acceptance-based one rather than a close
+    variant of itself. Returns None when nothing is similar enough, so the
+    caller can fall back to the LLM.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        techniques: List[Dict] = CBT_TECHNIQUES,
+        k: int = 2,
+        min_similarity: float = 0.75,
+    ):
+        self.embeddings = embeddings
+        self.techniques = techniques
+        self.k = k
+        self.min_similarity = min_similarity
+        self._matrix = None
+        self._lock = threading.Lock()
+
+    def _ensure_index(self):
+        """Embed the technique descriptions once, on first use"""
+        if self._matrix is not None:
+            return
+        with self._lock:
+            if self._matrix is not None:
+                return
+            matrix = np.array(
+                self.embeddings.embed_documents([t["text"] for t in self.techniques]),
+                dtype=np.float32,
+            )
+            self._matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    def select(self, assessment: str) -> Optional[List[Dict]]:
+        """Up to k techniques for an assessment, best first, or None if none is close enough"""
+        self._ensure_index()
+        query = np.array(self.embeddings.embed_query(assessment), dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        similarities = self._matrix @ query
+
+        selected, categories = [], set()
+        for index in np.argsort(-similarities):
+            if similarities[index] < self.min_similarity or len(selected) == self.k:
+                break
+            technique = self.techniques[index]
+            category = technique["metadata"]["category"]
+            if category not in categories:
+                categories.add(category)
+                selected.append(technique)
+        if not selected:
+            return None
+        for technique in selected:
+            metrics.increment("technique_selector.selected", technique=technique["metadata"]["technique"])
+        return selected
+
+
+def format_techniques(techniques: List[Dict]) -> str:
+    """Selected technique descriptions, as the technique recommendations for action_prompt"""
+    return "\n\n".join(technique["text"] for technique in techniques)
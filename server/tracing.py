@@ -0,0 +1,76 @@
+import contextlib
+import json
+import threading
+from typing import Dict, Optional
+
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+
+from server.config import *
+
+tracer = trace.get_tracer("therapy-simulator.server")
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends finished spans to a file, one JSON object per line, for offline analysis"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans) -> SpanExportResult:
+        lines = "".join(json.dumps(json.loads(span.to_json())) + "\n" for span in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+def create_span_exporter(exporter: str, otlp_endpoint: str, file_path: str) -> Optional[SpanExporter]:
+    """Span exporter for TRACING_EXPORTER: "otlp", "console", "file" or "none" (tracing off)"""
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter(endpoint=otlp_endpoint)
+    if exporter == "console":
+        return ConsoleSpanExporter()
+    if exporter == "file":
+        return JsonLinesSpanExporter(file_path)
+    return None
+
+
+def configure_tracing():
+    """Install the tracer provider; without an exporter spans stay no-ops"""
+    exporter = create_span_exporter(TRACING_EXPORTER, TRACING_OTLP_ENDPOINT, TRACING_FILE_PATH)
+    if exporter is None:
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": TRACING_SERVICE_NAME}))
+    # Spans are exported in batches from a background thread, off the request path
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+
+def extract_context(carrier: Optional[Dict[str, str]]):
+    """Trace context sent by the client (W3C traceparent), or None to start a new trace"""
+    return propagate.extract(carrier) if carrier else None
+
+
+@contextlib.contextmanager
+def stage_span(stage: str, **attributes):
+    """Span for one pipeline stage, named after it"""
+    with tracer.start_as_current_span(stage, attributes={"stage": stage, **attributes}) as span:
+        yield span
+
+
+def current_trace_id() -> Optional[str]:
+    context = trace.get_current_span().get_span_context()
+    return format(context.trace_id, "032x") if context.is_valid else None
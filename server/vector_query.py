@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from opentelemetry.trace import Span, Status, StatusCode
+
+from server.metrics import metrics
+from server.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Async function running one vector query: (vector, k) -> metadata of the matches
+QueryFunction = Callable[[List[float], int], Awaitable[List[Dict]]]
+
+# Recent query latencies needed before the hedge delay follows their percentile
+MIN_HEDGE_SAMPLES = 20
+
+
+class HedgedVectorQuery:
+    """Deadline-bounded vector queries with optional hedging.
+
+    Queries run on one long-lived event loop in a background thread, so a
+    single async client and its connection pool serve every request thread.
+    query() blocks the caller for at most the timeout and returns None when
+    no answer arrived in time. With hedging on, a second identical query is
+    sent once the first has been outstanding longer than the given
+    percentile of recent query latencies, and whichever answers first wins.
+    """
+
+    def __init__(
+        self,
+        query_function: QueryFunction,
+        hedge_percentile: float = 95,
+        min_hedge_delay_seconds: float = 0.05,
+        window: int = 200,
+        store: str = "pinecone",
+    ):
+        self.query_function = query_function
+        self.store = store
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay_seconds
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="vector-query", daemon=True).start()
+
+    def hedge_delay(self) -> Optional[float]:
+        """How long to wait before hedging, or None when hedging is off or still warming up"""
+        if not self.hedge_percentile:
+            return None
+        with self._lock:
+            if len(self._latencies) < MIN_HEDGE_SAMPLES:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100.0))
+        return max(ordered[index], self.min_hedge_delay)
+
+    def query(
+        self, vector: List[float], k: int, timeout: Optional[float]
+    ) -> Optional[List[Dict]]:
+        """Matches for a vector, or None if the query failed or missed its deadline (None waits)"""
+        started = time.perf_counter()
+        with tracer.start_as_current_span(
+            "vector_store.query", attributes={"db.system": self.store, "k": k}
+        ) as span:
+            future = asyncio.run_coroutine_threadsafe(self._hedged(vector, k, span), self.loop)
+            try:
+                matches = future.result(timeout)
+                result = "ok"
+            except FutureTimeoutError:
+                future.cancel()
+                matches, result = None, "timeout"
+                # Counted at the timeout, so a slow tail raises the hedge delay
+                # instead of dropping out of the window
+                self._record_latency(timeout)
+            except Exception as e:
+                logger.warning("Error querying vector store", extra={"stage": "retrieval", "error": str(e)})
+                matches, result = None, "error"
+            span.set_attribute("result", result)
+            if result != "ok":
+                span.set_status(Status(StatusCode.ERROR, result))
+        metrics.increment("retrieval.queries", result=result)
+        metrics.observe("retrieval.query_seconds", time.perf_counter() - started)
+        return matches
+
+    def _record_latency(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    async def _timed(self, vector: List[float], k: int) -> List[Dict]:
+        started = time.perf_counter()
+        matches = await self.query_function(vector, k)
+        self._record_latency(time.perf_counter() - started)
+        return matches
+
+    async def _hedged(self, vector: List[float], k: int, span: Span) -> List[Dict]:
+        tasks = {asyncio.ensure_future(self._timed(vector, k))}
+        delay = self.hedge_delay()
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    metrics.increment("retrieval.hedges")
+                    span.add_event("hedge", {"delay_seconds": delay})
+                    tasks.add(asyncio.ensure_future(self._timed(vector, k)))
+
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
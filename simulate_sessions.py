@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Headless batch simulation runner.
+Runs scripted patient transcripts through the therapy pipeline in-process
+(SessionManager + CBT sequential chain) without Streamlit or HTTP.
+
+Input is JSONL, one transcript per line:
+  {"id": "anxiety-01", "turns": ["Hi doctor", "I've been anxious..."], "end_session": true}
+
+Sessions run concurrently (bounded by --concurrency) while the turns of each
+session stay in order. Results are appended to the output JSONL as each session
+finishes, and re-running with the same output skips transcripts already completed.
+
+Usage:
+  python simulate_sessions.py transcripts.jsonl --output sessions.jsonl --concurrency 8
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from server.chat_model import ChatRequest
+from server.pipeline import process_chat_turn
+from server.session_manager import session_manager
+
+
+def load_transcripts(path):
+    """Load transcripts from JSONL, normalising turns to plain strings"""
+    transcripts = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            turns = [
+                turn["content"] if isinstance(turn, dict) else str(turn)
+                for turn in item.get("turns", [])
+                if not isinstance(turn, dict) or turn.get("role", "user") == "user"
+            ]
+            transcripts.append(
+                {
+                    "id": str(item.get("id", line_number)),
+                    "turns": turns,
+                    "end_session": item.get("end_session", False),
+                }
+            )
+    return transcripts
+
+
+def load_completed_ids(path):
+    """Collect transcript ids that already have a completed result in the output file"""
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A partially written last line from an interrupted run
+                continue
+            if result.get("status") == "completed":
+                completed.add(result["id"])
+    return completed
+
+
+async def wait_for_follow_ups(session_id, poll_interval=0.5):
+    """Collect follow-up messages generated in the background for a turn"""
+    follow_ups = []
+    while True:
+        messages, in_progress = session_manager.pop_pending_messages(session_id)
+        follow_ups.extend(messages)
+        if not in_progress:
+            return follow_ups
+        await asyncio.sleep(poll_interval)
+
+
+async def simulate_transcript(transcript):
+    """Run one transcript's turns in order and return its result record"""
+    session_id = f"sim-{transcript['id']}-{uuid.uuid4().hex[:8]}"
+    started = time.perf_counter()
+    exchanges = []
+    ended = False
+
+    try:
+        for message in transcript["turns"]:
+            response = await asyncio.to_thread(
+                process_chat_turn, ChatRequest(message=message, session_id=session_id)
+            )
+            exchanges.append(
+                {
+                    "user": message,
+                    "assistant": response.response,
+                    "classification": response.classification,
+                }
+            )
+            if response.follow_up_pending:
+                exchanges[-1]["follow_ups"] = await wait_for_follow_ups(session_id)
+            if response.is_session_ended:
+                ended = True
+                break
+
+        if transcript["end_session"] and not ended:
+            message = "Please provide a session conclusion."
+            response = await asyncio.to_thread(
+                process_chat_turn,
+                ChatRequest(message=message, session_id=session_id, end_session=True),
+            )
+            exchanges.append(
+                {
+                    "user": message,
+                    "assistant": response.response,
+                    "classification": response.classification,
+                }
+            )
+            ended = True
+
+        status, error = "completed", None
+    except Exception as e:
+        status, error = "error", str(e)
+    finally:
+        session_manager.clear_session(session_id)
+
+    return {
+        "id": transcript["id"],
+        "session_id": session_id,
+        "status": status,
+        "error": error,
+        "is_session_ended": ended,
+        "exchanges": exchanges,
+        "elapsed_s": round(time.perf_counter() - started, 2),
+    }
+
+
+async def run_batch(transcripts, output_path, concurrency):
+    """Simulate transcripts with bounded concurrency, appending results as they finish"""
+    semaphore = asyncio.Semaphore(concurrency)
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=concurrency)
+    )
+    started = time.perf_counter()
+    counts = {"completed": 0, "error": 0}
+
+    async def bounded(transcript):
+        async with semaphore:
+            return await simulate_transcript(transcript)
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        for next_result in asyncio.as_completed([bounded(t) for t in transcripts]):
+            result = await next_result
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+
+            counts[result["status"]] += 1
+            done = counts["completed"] + counts["error"]
+            minutes = (time.perf_counter() - started) / 60
+            icon = "✅" if result["status"] == "completed" else "⚠️"
+            print(
+                f"{icon} [{done}/{len(transcripts)}] {result['id']} "
+                f"({len(result['exchanges'])} turns, {result['elapsed_s']}s) "
+                f"- {done / minutes:.1f} sessions/min"
+            )
+
+    return counts, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scripted therapy sessions in-process")
+    parser.add_argument("transcripts", help="JSONL file of transcripts")
+    parser.add_argument("--output", default="simulated_sessions.jsonl")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    transcripts = load_transcripts(args.transcripts)
+    completed = load_completed_ids(args.output)
+    pending = [t for t in transcripts if t["id"] not in completed]
+    if args.limit:
+        pending = pending[: args.limit]
+
+    print(
+        f"🚀 Simulating {len(pending)} sessions "
+        f"({len(completed)} already completed in {args.output}, concurrency={args.concurrency})"
+    )
+    if not pending:
+        return
+
+    counts, elapsed = asyncio.run(run_batch(pending, args.output, args.concurrency))
+    rate = (counts["completed"] + counts["error"]) / (elapsed / 60) if elapsed else 0.0
+    print(
+        f"\n🎉 Done: {counts['completed']} completed, {counts['error']} failed "
+        f"in {elapsed:.1f}s ({rate:.1f} sessions/min)"
+    )
+
+
+if __name__ == "__main__":
+    main()